@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.core.exceptions import FieldDoesNotExist
-from .models import Truss
+from .models import LabelJob, Truss
 
 
 def has_field(model, name: str) -> bool:
@@ -77,4 +77,12 @@ class TrussAdmin(admin.ModelAdmin):
     readonly_fields = tuple(READONLY_FIELDS)
     fieldsets = tuple(FIELDSETS)
     list_per_page = 50
-    save_on_top = True
\ No newline at end of file
+    save_on_top = True
+
+
+@admin.register(LabelJob)
+class LabelJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "solicitado_por", "processados", "total", "etiquetas", "created_at", "finished_at")
+    list_filter = ("status",)
+    readonly_fields = ("created_at", "started_at", "heartbeat_at", "finished_at")
+    ordering = ("-created_at",)
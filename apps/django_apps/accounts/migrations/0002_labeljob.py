@@ -0,0 +1,40 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabelJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('executando', 'Executando'), ('concluido', 'Concluído'), ('erro', 'Erro'), ('cancelado', 'Cancelado')], db_index=True, default='pendente', max_length=20)),
+                ('filtros', models.JSONField(blank=True, default=dict)),
+                ('opcoes', models.JSONField(blank=True, default=dict)),
+                ('solicitado_por', models.CharField(blank=True, default='', max_length=150)),
+                ('total', models.IntegerField(default=0)),
+                ('processados', models.IntegerField(default=0)),
+                ('etiquetas', models.IntegerField(default=0)),
+                ('cancelar', models.BooleanField(default=False)),
+                ('worker', models.CharField(blank=True, default='', max_length=100)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('pdf_path', models.CharField(blank=True, default='', max_length=500)),
+                ('zip_path', models.CharField(blank=True, default='', max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Label job',
+                'verbose_name_plural': 'Label jobs',
+                'ordering': ('-created_at',),
+            },
+        ),
+    ]
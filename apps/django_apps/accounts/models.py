@@ -22,4 +22,52 @@ class Truss(models.Model):
         ordering = ("-updated_at", "-id")
 
     def __str__(self):
-        return f"{self.truss_number} ({self.job_number})"
\ No newline at end of file
+        return f"{self.truss_number} ({self.job_number})"
+
+
+class LabelJob(models.Model):
+    """Lote de etiquetas pedido pela API e processado pelo comando label_worker."""
+
+    PENDENTE = "pendente"
+    EXECUTANDO = "executando"
+    CONCLUIDO = "concluido"
+    ERRO = "erro"
+    CANCELADO = "cancelado"
+    STATUS_CHOICES = [
+        (PENDENTE, "Pendente"),
+        (EXECUTANDO, "Executando"),
+        (CONCLUIDO, "Concluído"),
+        (ERRO, "Erro"),
+        (CANCELADO, "Cancelado"),
+    ]
+    FINALIZADOS = (CONCLUIDO, ERRO, CANCELADO)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDENTE, db_index=True)
+    # Mesmos filtros do generate_truss_labels (ids, job_number, status, tipo, limit)
+    filtros = models.JSONField(default=dict, blank=True)
+    # Opções de render (pdf_format, bilevel, saida)
+    opcoes = models.JSONField(default=dict, blank=True)
+    solicitado_por = models.CharField(max_length=150, blank=True, default="")
+
+    total = models.IntegerField(default=0)
+    processados = models.IntegerField(default=0)
+    etiquetas = models.IntegerField(default=0)
+    cancelar = models.BooleanField(default=False)
+
+    worker = models.CharField(max_length=100, blank=True, default="")
+    erro = models.TextField(blank=True, default="")
+    pdf_path = models.CharField(max_length=500, blank=True, default="")
+    zip_path = models.CharField(max_length=500, blank=True, default="")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Label job"
+        verbose_name_plural = "Label jobs"
+        ordering = ("-created_at",)
+
+    def __str__(self):
+        return f"LabelJob {self.pk} ({self.status})"
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.qrcode_app.services.trusses import invalidar_cache_truss
+
+from .models import Truss
+
+
+@receiver(post_save, sender=Truss)
+@receiver(post_delete, sender=Truss)
+def invalidar_truss(sender, instance, **kwargs):
+    # /api/truss/<id> volta a ler do banco na próxima requisição
+    invalidar_cache_truss([instance.pk])
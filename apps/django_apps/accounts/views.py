@@ -1,12 +1,14 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
+from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout, get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.utils.http import url_has_allowed_host_and_scheme
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse
+from django.views.decorators.http import require_safe
 import re
-from .models import Truss
+from apps.qrcode_app.services.trusses import truss_publico
 
 User = get_user_model()
 
@@ -28,10 +30,24 @@ def login_page(request):
 def home(request):
     return render(request, "accounts/home.html")
 
+@require_safe
 @login_required
 def truss_detail_view(request, pk: int):
-    truss = get_object_or_404(Truss, pk=pk)
-    return render(request, "accounts/truss_detail.html", {"truss": truss})
+    # Página aberta ao escanear o QR: tudo renderizado aqui, num round-trip só.
+    # Os dados vêm de truss_publico (uma leitura pela PK, ou o cache de
+    # /api/truss/<id> com Redis) e o HTML do fragment cache do template,
+    # chaveado por updated_at
+    entrada = truss_publico(pk)
+    if entrada is None:
+        raise Http404("Truss não encontrado")
+
+    truss = entrada["dados"]
+    return render(request, "accounts/truss_detail.html", {
+        "truss": truss,
+        "updated_at": entrada["updated_at"],
+        "concluido": str(truss["status"]).lower() in ("instalado", "completed"),
+        "cache_segundos": settings.TRUSS_DETAIL_CACHE_SECONDS,
+    })
 
 @login_required
 def scan_truss_view(request):
@@ -0,0 +1,121 @@
+from importlib import import_module
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.http import parse_http_date_safe
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, JSONResponse
+
+from apps.django_apps.accounts.models import LabelJob
+from apps.fastapi_app.serializers import LabelJobIn, LabelJobOut
+from apps.qrcode_app.services.label_jobs import FILTROS_JOB, validar_opcoes
+from apps.qrcode_app.services.trusses import truss_publico, versao_truss
+
+label_jobs = APIRouter(prefix="/api/label-jobs", tags=["label-jobs"])
+trusses = APIRouter(prefix="/api/truss", tags=["trusses"])
+
+
+def usuario_logado(request: Request):
+    """
+    Reaproveita a sessão do Django (mesmo cookie do site) pelo get_user do
+    Django: usuário inativo ou sessão de antes de uma troca de senha
+    (hash da senha na sessão) não passam.
+    """
+    close_old_connections()
+    session_key = request.cookies.get(settings.SESSION_COOKIE_NAME)
+    if session_key:
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        user = get_user(SimpleNamespace(session=store(session_key=session_key)))
+        if user.is_authenticated:
+            return user
+    raise HTTPException(status_code=401, detail="Login necessário")
+
+
+def _job_ou_404(job_id: int) -> LabelJob:
+    job = LabelJob.objects.filter(pk=job_id).first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
+
+@label_jobs.post("", response_model=LabelJobOut, status_code=201)
+def criar_job(dados: LabelJobIn, user=Depends(usuario_logado)):
+    payload = dados.dict()
+    try:
+        opcoes = validar_opcoes(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    filtros = {k: payload[k] for k in FILTROS_JOB if payload.get(k) not in (None, "", [])}
+    job = LabelJob.objects.create(filtros=filtros, opcoes=opcoes, solicitado_por=user.get_username())
+    return LabelJobOut.from_job(job)
+
+
+@label_jobs.get("", response_model=List[LabelJobOut])
+def listar_jobs(limit: int = Query(20, gt=0, le=200), user=Depends(usuario_logado)):
+    return [LabelJobOut.from_job(j) for j in LabelJob.objects.all()[:limit]]
+
+
+@label_jobs.get("/{job_id}", response_model=LabelJobOut)
+def progresso_job(job_id: int, user=Depends(usuario_logado)):
+    return LabelJobOut.from_job(_job_ou_404(job_id))
+
+
+@label_jobs.post("/{job_id}/cancel", response_model=LabelJobOut)
+def cancelar_job(job_id: int, user=Depends(usuario_logado)):
+    job = _job_ou_404(job_id)
+    if job.status not in LabelJob.FINALIZADOS:
+        # O worker checa a flag entre um truss e outro; pendente é cancelado já
+        LabelJob.objects.filter(pk=job.pk).update(cancelar=True)
+        LabelJob.objects.filter(pk=job.pk, status=LabelJob.PENDENTE).update(
+            status=LabelJob.CANCELADO, finished_at=timezone.now()
+        )
+        job.refresh_from_db()
+    return LabelJobOut.from_job(job)
+
+
+@label_jobs.get("/{job_id}/download")
+def download_job(job_id: int, arquivo: str = Query("pdf", pattern="^(pdf|zip)$"), user=Depends(usuario_logado)):
+    job = _job_ou_404(job_id)
+    if job.status != LabelJob.CONCLUIDO:
+        raise HTTPException(status_code=409, detail=f"Job ainda não concluído ({job.status})")
+    path = job.pdf_path if arquivo == "pdf" else job.zip_path
+    if not path or not Path(path).exists():
+        raise HTTPException(status_code=404, detail=f"Job sem arquivo {arquivo}")
+    media = "application/pdf" if arquivo == "pdf" else "application/zip"
+    return FileResponse(path, media_type=media, filename=f"labels_job_{job.pk}.{arquivo}")
+
+
+def _nao_modificado(request: Request, entrada: dict) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        etags = [e.strip().removeprefix("W/") for e in if_none_match.split(",")]
+        return "*" in etags or entrada["etag"] in etags
+    desde = parse_http_date_safe(request.headers.get("if-modified-since") or "")
+    return desde is not None and int(entrada["updated_at"]) <= desde
+
+
+def _cabecalhos(entrada: dict) -> dict:
+    return {
+        "ETag": entrada["etag"],
+        "Last-Modified": entrada["last_modified"],
+        # Sempre revalida; o 304 só lê updated_at (ou a entrada do cache)
+        "Cache-Control": "private, no-cache",
+    }
+
+
+@trusses.get("/{truss_id}")
+def detalhe_truss(truss_id: int, request: Request, user=Depends(usuario_logado)):
+    versao = versao_truss(truss_id)
+    if versao is None:
+        raise HTTPException(status_code=404, detail="Truss não encontrado")
+    if _nao_modificado(request, versao):
+        return Response(status_code=304, headers=_cabecalhos(versao))
+    entrada = versao if "dados" in versao else truss_publico(truss_id)
+    if entrada is None:
+        raise HTTPException(status_code=404, detail="Truss não encontrado")
+    return JSONResponse(entrada["dados"], headers=_cabecalhos(entrada))
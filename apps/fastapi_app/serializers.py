@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class LabelJobIn(BaseModel):
+    # Mesmos filtros do manage.py generate_truss_labels
+    ids: Optional[List[int]] = None
+    job_number: Optional[str] = None
+    status: Optional[str] = None
+    tipo: Optional[str] = None
+    limit: Optional[int] = Field(None, gt=0)
+    # Opções de render
+    pdf_format: str = "raster"
+    saida: str = "pdf"
+    bilevel: bool = False
+
+
+class LabelJobOut(BaseModel):
+    id: int
+    status: str
+    filtros: dict
+    opcoes: dict
+    solicitado_por: str
+    total: int
+    processados: int
+    etiquetas: int
+    progresso: float
+    cancelar: bool
+    erro: str
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    download_pdf: Optional[str]
+    download_zip: Optional[str]
+
+    @classmethod
+    def from_job(cls, job) -> "LabelJobOut":
+        base = f"/api/label-jobs/{job.pk}/download"
+        return cls(
+            id=job.pk,
+            status=job.status,
+            filtros=job.filtros,
+            opcoes=job.opcoes,
+            solicitado_por=job.solicitado_por,
+            total=job.total,
+            processados=job.processados,
+            etiquetas=job.etiquetas,
+            progresso=round(job.processados / job.total, 4) if job.total else 0.0,
+            cancelar=job.cancelar,
+            erro=job.erro,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            download_pdf=f"{base}?arquivo=pdf" if job.pdf_path else None,
+            download_zip=f"{base}?arquivo=zip" if job.zip_path else None,
+        )
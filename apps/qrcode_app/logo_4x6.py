@@ -3,9 +3,10 @@ import qrcode
 from PIL import Image, ImageDraw, ImageFont
 import os
 import shutil
-import json
 from pathlib import Path
 
+from apps.qrcode_app.services.labels import exportar_json
+
 # === Configurações ===
 CSV_PATH = "trusses.csv"
 OUTPUT_DIR = "templates/qrcodes"
@@ -138,14 +139,14 @@ def desenhar_centro(draw, base_img, row, logo, EMPRESA_ENDERECO, EMPRESA_TEL):
     base_img.paste(bloco, (x, y), mask=bloco)
 
 def exportar_json_por_truss(df, out_dir: Path):
-    out_dir.mkdir(parents=True, exist_ok=True)
-    index = {}
+    # Mesmo exportador incremental do pipeline principal: só regrava o que mudou
+    registros = []
     for _, row in df.iterrows():
         try:
             truss_id = int(row["id"])
         except Exception:
             continue
-        data = {
+        registros.append({
             "id": truss_id,
             "job_number": row.get("job_number", ""),
             "truss_number": str(row.get("truss_number", "")),
@@ -155,13 +156,8 @@ def exportar_json_por_truss(df, out_dir: Path):
             "endereco": row.get("endereco", ""),
             "tamanho": row.get("tamanho", ""),
             "status": row.get("status", ""),
-        }
-        path = out_dir / f"{truss_id}.json"
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        index[str(truss_id)] = f"/static/truss-data/{truss_id}.json"
-    with open(out_dir / "index.json", "w", encoding="utf-8") as f:
-        json.dump(index, f, ensure_ascii=False, indent=2)
+        })
+    exportar_json(registros, out_dir)
     print(f"📦 JSONs exportados em: {out_dir}")
 
 def gerar_etiquetas(csv_path, output_dir, pdf_name="labels.pdf"):
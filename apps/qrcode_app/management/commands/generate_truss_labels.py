@@ -4,8 +4,17 @@ from django.conf import settings
 from apps.django_apps.accounts.models import Truss
 
 from apps.qrcode_app.services.labels import (
+    FORMATOS_JSON,
+    FORMATOS_PDF,
+    MODOS_COPIAS,
+    PNG_COMPRESS_LEVEL,
+    SAIDAS,
+    exportar_dados_json,
     gerar_de_queryset,
+    registros_de_queryset,
 )
+from apps.qrcode_app.services.trusses import filtrar_trusses
+from apps.qrcode_app.services.zpl import gerar_zpl
 
 class Command(BaseCommand):
     help = "Gera etiquetas/QR Codes dos Trusses direto do banco."
@@ -24,8 +33,58 @@ class Command(BaseCommand):
         parser.add_argument("--tipo")
         parser.add_argument("--limit", type=int)
         parser.add_argument("--no-json", action="store_true", help="Não exportar JSONs")
+        parser.add_argument(
+            "--json-formato", choices=FORMATOS_JSON, default="arquivos",
+            help="arquivos: um <id>.json por truss | bundles: um .ndjson.gz por job em <json-dir>/bundles",
+        )
+        parser.add_argument(
+            "--json-faixa", type=int, metavar="N",
+            help="Com --json-formato bundles, agrupa por faixas de N ids em vez de job_number",
+        )
         parser.add_argument("--no-clean", action="store_true", help="Não limpar arquivos antigos")
         parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument(
+            "--copias", choices=MODOS_COPIAS, default="hardlink",
+            help="Como gravar cópias idênticas (padrão: hardlink)",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Processos de renderização (1 = em série, 0 = todos os núcleos)",
+        )
+        parser.add_argument(
+            "--pdf-format", choices=FORMATOS_PDF, default="raster",
+            help="raster (imagem 300 DPI) ou vetor (QR/texto vetoriais, PDF bem menor)",
+        )
+        parser.add_argument(
+            "--bilevel", action="store_true",
+            help="Etiquetas em preto/branco puro: PNG de 1 bit e PDF em CCITT G4",
+        )
+        parser.add_argument(
+            "--incremental", action="store_true",
+            help="Renderiza só trusses novos/alterados (labels_manifest.json) e remonta o PDF",
+        )
+        parser.add_argument(
+            "--saida", choices=SAIDAS, default="ambos",
+            help="O que gerar: ambos (PNGs + PDF), só pdf ou só png",
+        )
+        parser.add_argument(
+            "--png-compress-level", type=int, choices=range(10), default=PNG_COMPRESS_LEVEL,
+            metavar="0-9", help=f"Compressão dos PNGs (padrão {PNG_COMPRESS_LEVEL}; 1 = mais rápido)",
+        )
+        parser.add_argument("--png-optimize", action="store_true", help="PNGs um pouco menores, bem mais lento")
+        parser.add_argument("--zip", dest="zip_name", help="Também empacota os PNGs neste ZIP (em --output-dir)")
+        parser.add_argument(
+            "--pdf-partes", type=int, metavar="N",
+            help="PDFs numerados de N páginas (labels_001.pdf...), liberados conforme ficam prontos",
+        )
+        parser.add_argument(
+            "--pdf-parte-por-job", action="store_true",
+            help="Uma parte de PDF por job_number (ordena a seleção por job)",
+        )
+        parser.add_argument(
+            "--zpl",
+            help="Gera ZPL nativo em vez de PNG/PDF: arquivo .zpl ou tcp://impressora[:9100]",
+        )
 
     def handle(self, *args, **opts):
         base_dir = Path(settings.BASE_DIR)
@@ -35,6 +94,8 @@ class Command(BaseCommand):
 
         if not logo_path.exists():
             raise CommandError(f"Logo não encontrado: {logo_path}")
+        if opts["zip_name"] and opts["saida"] == "pdf":
+            raise CommandError("--zip exige PNGs na saída (--saida ambos ou png).")
 
         web_base = opts["web_base_url"] or settings.__dict__.get("WEB_BASE_URL") or \
             settings.CONFIG.get("WEB_BASE_URL") if hasattr(settings, "CONFIG") else None
@@ -42,22 +103,24 @@ class Command(BaseCommand):
             web_base = "https://cornerstone-app.onrender.com/truss"
 
         qs = Truss.objects.all().order_by("id")
+        if opts["pdf_parte_por_job"]:
+            qs = qs.order_by("job_number", "id")
 
-        if opts.get("ids"):
-            try:
-                id_list = [int(x.strip()) for x in opts["ids"].split(",") if x.strip()]
-                qs = qs.filter(id__in=id_list)
-            except ValueError:
-                raise CommandError("--ids inválido. Use inteiros separados por vírgula.")
+        try:
+            qs = filtrar_trusses(
+                qs,
+                ids=opts.get("ids"),
+                job_number=opts.get("job_number"),
+                status=opts.get("status"),
+                tipo=opts.get("tipo"),
+                limit=opts.get("limit"),
+            )
+        except ValueError:
+            raise CommandError("--ids inválido. Use inteiros separados por vírgula.")
 
-        if opts.get("job_number"):
-            qs = qs.filter(job_number=opts["job_number"])
-        if opts.get("status"):
-            qs = qs.filter(status=opts["status"])
-        if opts.get("tipo"):
-            qs = qs.filter(tipo=opts["tipo"])
-        if opts.get("limit"):
-            qs = qs[: opts["limit"]]
+        # Seleção filtrada: a exportação de JSON só acrescenta/atualiza, sem
+        # remover os trusses que ficaram de fora
+        json_parcial = any(opts.get(k) for k in ("ids", "job_number", "status", "tipo", "limit"))
 
         count = qs.count()
         self.stdout.write(self.style.NOTICE(
@@ -74,6 +137,26 @@ class Command(BaseCommand):
             ))
             return
 
+        if opts["zpl"]:
+            registros = registros_de_queryset(qs)
+            if not opts["no_json"]:
+                exportar_dados_json(
+                    registros, json_dir, opts["json_formato"], opts["json_faixa"], parcial=json_parcial
+                )
+            trusses_count, imgs_count, num_bytes = gerar_zpl(
+                registros,
+                opts["zpl"],
+                logo_path=logo_path,
+                base_url=web_base,
+                empresa_endereco=opts["empresa_endereco"],
+                empresa_tel=opts["empresa_tel"],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"[generate_truss_labels] Concluído: {imgs_count} etiquetas ZPL para {trusses_count} trusses "
+                f"({num_bytes} bytes) → {opts['zpl']}"
+            ))
+            return
+
         trusses_count, imgs_count, pdf_path = gerar_de_queryset(
             qs,
             output_dir=output_dir,
@@ -85,6 +168,20 @@ class Command(BaseCommand):
             pdf_name=opts["pdf_name"],
             clean=not opts["no_clean"],
             export_json=not opts["no_json"],
+            json_formato=opts["json_formato"],
+            json_faixa=opts["json_faixa"],
+            json_parcial=json_parcial,
+            copias=opts["copias"],
+            workers=opts["workers"],
+            formato_pdf=opts["pdf_format"],
+            bilevel=opts["bilevel"],
+            incremental=opts["incremental"],
+            saida=opts["saida"],
+            png_compress_level=opts["png_compress_level"],
+            png_optimize=opts["png_optimize"],
+            zip_name=opts["zip_name"],
+            pdf_paginas_por_parte=opts["pdf_partes"],
+            pdf_parte_por_job=opts["pdf_parte_por_job"],
         )
 
         self.stdout.write(self.style.SUCCESS(
@@ -1,26 +1,40 @@
-import csv
-import re
-from contextlib import contextmanager
-from typing import Dict, List, Optional
-
+import json
+from argparse import BooleanOptionalAction
+from collections import deque
+from contextlib import closing, contextmanager
+from functools import partial
+from pathlib import Path
+from typing import Deque, Iterable, Iterator, List
+
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction, connection
-from django.db.utils import IntegrityError
+from django.db.utils import DatabaseError, IntegrityError
 
 # Ajuste se o modelo estiver em outro local
 from apps.django_apps.accounts.models import Truss
-
-
-def normalize_col(name: str) -> str:
-    """
-    Normaliza o nome da coluna:
-    - lower
-    - troca caracteres não alfanuméricos por '_'
-    - remove '_' duplicados
-    """
-    n = re.sub(r'[^0-9a-zA-Z]+', '_', name.strip().lower())
-    n = re.sub(r'_+', '_', n).strip('_')
-    return n
+from apps.qrcode_app.services.truss_import import (
+    ATUALIZADO,
+    CAMPOS_OBRIGATORIOS,
+    CRIADO,
+    INALTERADO,
+    CopyPostgres,
+    PlanoImportacao,
+    UpsertEmLotes,
+    abrir_planilha,
+    build_reverse_lookup,
+    gravar_linha,
+    montar_defaults,
+    suporta_copy,
+    valores_modelo,
+)
+from apps.qrcode_app.services.labels import (
+    FORMATOS_JSON,
+    FORMATOS_PDF,
+    SAIDAS,
+    exportar_dados_json,
+    gerar_imagens_e_pdf,
+)
 
 
 @contextmanager
@@ -29,86 +43,77 @@ def nullcontext():
 
 
 class Command(BaseCommand):
-    help = "Importa/atualiza Truss a partir de um CSV no NOVO formato de cabeçalho."
+    help = "Importa/atualiza Truss a partir de um CSV ou XLSX no NOVO formato de cabeçalho."
 
     def add_arguments(self, parser):
-        parser.add_argument("--csv", dest="csv_path", required=True, help="Caminho do arquivo CSV")
+        origem = parser.add_mutually_exclusive_group(required=True)
+        origem.add_argument("--csv", dest="csv_path", help="Caminho do arquivo CSV (ou .xlsx)")
+        origem.add_argument("--xlsx", dest="xlsx_path", help="Caminho da planilha .xlsx, lida em streaming")
+        parser.add_argument("--sheet", help="Aba da planilha (padrão: a ativa)")
         parser.add_argument("--delimiter", dest="delimiter", default=",", help="Delimitador (padrão: ,)")
         parser.add_argument("--dry-run", action="store_true", help="Mostra contagem sem gravar no banco")
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Linhas por upsert em lote (INSERT ... ON CONFLICT); 0 = uma linha por vez (modo antigo)",
+        )
+        parser.add_argument(
+            "--fast", action="store_true",
+            help="PostgreSQL: COPY para tabela temporária + um INSERT ... ON CONFLICT (outros bancos: modo em lote)",
+        )
+        parser.add_argument(
+            "--plan-json", metavar="ARQUIVO",
+            help="Com --dry-run, grava o plano completo (criar/atualizar com campos/inalterados/erros) neste JSON",
+        )
+        etiquetas = parser.add_argument_group("etiquetas (--generate-labels)")
+        etiquetas.add_argument(
+            "--generate-labels", action="store_true",
+            help="Gera etiquetas e JSONs dos trusses criados/alterados durante o próprio import "
+            "(cada lote é commitado separadamente e segue para as etiquetas após o commit)",
+        )
+        etiquetas.add_argument("--output-dir", default="apps/qrcode_app/templates/qrcodes/importados")
+        etiquetas.add_argument("--json-dir", default="apps/qrcode_app/static/truss-data")
+        etiquetas.add_argument("--pdf-name", default="labels.pdf")
+        etiquetas.add_argument("--no-json", action="store_true", help="Não exportar JSONs")
+        etiquetas.add_argument("--json-formato", choices=FORMATOS_JSON, default="arquivos")
+        etiquetas.add_argument("--json-faixa", type=int, metavar="N")
+        etiquetas.add_argument(
+            "--workers", type=int, default=1,
+            help="Processos de renderização (1 = em série, 0 = todos os núcleos)",
+        )
+        etiquetas.add_argument("--pdf-format", choices=FORMATOS_PDF, default="raster")
+        etiquetas.add_argument(
+            "--bilevel", action=BooleanOptionalAction, default=settings.LABEL_BILEVEL,
+            help="PNG 1 bit + PDF CCITT G4 (padrão: LABEL_BILEVEL)",
+        )
+        etiquetas.add_argument("--saida", choices=SAIDAS, default="ambos")
+        etiquetas.add_argument(
+            "--pdf-partes", type=int, metavar="N",
+            help="PDFs numerados de N páginas, liberados para impressão enquanto o import continua",
+        )
 
     def handle(self, *args, **opts):
-        csv_path = opts["csv_path"]
+        csv_path = opts["csv_path"] or opts["xlsx_path"]
         delimiter = opts["delimiter"]
         dry_run = bool(opts.get("dry_run"))
-
-        created, updated, errors = 0, 0, 0
+        batch_size = opts["batch_size"]
+        if batch_size < 0:
+            raise CommandError("--batch-size deve ser >= 0")
+        plan_json = opts.get("plan_json")
+        if plan_json and not dry_run:
+            raise CommandError("--plan-json só vale com --dry-run")
+        gerar_etiquetas = bool(opts.get("generate_labels"))
+        if gerar_etiquetas and dry_run:
+            raise CommandError("--generate-labels não combina com --dry-run")
+        if gerar_etiquetas and not Path(settings.LABEL_LOGO_PATH).exists():
+            raise CommandError(f"Logo não encontrado: {settings.LABEL_LOGO_PATH}")
+        etiquetas = None
+
+        created, updated, unchanged, errors = 0, 0, 0, 0
         error_lines: List[str] = []
         max_error_lines = 20
 
         self.stdout.write(self.style.NOTICE(f"[import_trusses] Lendo {csv_path} ... (dry-run={dry_run})"))
 
-        # Aliases: coluna normalizada → campo do modelo
-        # Para cada campo do modelo definimos os possíveis nomes (normalizados) das colunas de origem
-        alias_map = {
-            "id": ["id"],
-            "truss_number": ["truss_number", "truss_num", "trussnumber"],
-            "tipo": ["truss_type", "type"],
-            "quantidade": ["qnty", "qty", "quantity"],
-            "ply": ["ply"],
-            # Job_Reference está sendo usado como endereço nesta nova planilha
-            "endereco": ["job_reference", "address", "endereco", "location"],
-            # 'Size (ft)' -> tamanho
-            "tamanho": ["size_ft", "size", "size_ft_", "size_ft__",
-                        "size_ft__", "size_ft___", "size_ft____", "size_ft_____", "size_ft______", "size_ft_______",
-                        "size_ft________", "size", "size_ft", "size_ft_", "size_ft__", "size_ft___", "size_ft____",
-                        "size_ft_____", "size_ft______", "size_ft_______", "size_ft________", "size_ft_________",
-                        "size_ft__________", "size_ft___________", "size_ft____________", "size_ft_____________",
-                        "size_ft______________", "size_ft_______________", "size_ft________________"],
-            # Normalizado de "Size (ft)" vira "size_ft"
-            "status": ["status"],
-            # Campos do modelo que podem ficar vazios se ausentes
-            "job_number": ["job_number", "job", "job_ref", "jobreference"],  # no CSV novo não veio; ficará ""
-        }
-
-        # Campos obrigatórios mínimos para processar
-        required_alias_targets = {"id", "truss_number"}
-
-        def build_reverse_lookup(fieldnames) -> Dict[str, str]:
-            """
-            Retorna dict: nome_do_campo_modelo -> nome_da_coluna_original (primeiro alias que encontrar)
-            """
-            normalized_mapping = {normalize_col(c): c for c in fieldnames}
-            result = {}
-            for model_field, aliases in alias_map.items():
-                for a in aliases:
-                    if a in normalized_mapping:
-                        result[model_field] = normalized_mapping[a]
-                        break
-            return result
-
-        def to_int_or_none(value: Optional[str]):
-            if value is None:
-                return None
-            s = str(value).strip()
-            if s == "":
-                return None
-            # só aceita inteiro puro
-            if re.fullmatch(r"-?\d+", s):
-                try:
-                    return int(s)
-                except Exception:
-                    return None
-            return None
-
-        def to_decimal_or_str(value: Optional[str]):
-            if value is None:
-                return ""
-            s = str(value).strip()
-            if s == "":
-                return ""
-            # deixe como está; se o campo for DecimalField o Django converte; se for Integer, trate
-            return s
-
         def table_exists(model) -> bool:
             try:
                 with connection.cursor():
@@ -118,15 +123,16 @@ class Command(BaseCommand):
                 return False
 
         try:
-            with open(csv_path, newline="", encoding="utf-8-sig") as f:
-                reader = csv.DictReader(f, delimiter=delimiter)
+            with abrir_planilha(
+                csv_path, delimiter, opts.get("sheet"), xlsx=True if opts["xlsx_path"] else None
+            ) as reader:
 
                 if not reader.fieldnames:
-                    raise CommandError("Cabeçalho não encontrado no CSV.")
+                    raise CommandError("Cabeçalho não encontrado no arquivo.")
 
                 reverse_lookup = build_reverse_lookup(reader.fieldnames)
 
-                missing_required = [mf for mf in required_alias_targets if mf not in reverse_lookup]
+                missing_required = [mf for mf in CAMPOS_OBRIGATORIOS if mf not in reverse_lookup]
                 if missing_required:
                     raise CommandError(
                         f"Colunas obrigatórias ausentes (considerando aliases): {', '.join(missing_required)}"
@@ -138,72 +144,139 @@ class Command(BaseCommand):
                         "[import_trusses] Tabela inexistente — em dry-run apenas contarei como 'criadas'."
                     ))
 
-                ctx = transaction.atomic() if not dry_run else nullcontext()
-                with ctx:
-                    for idx, row in enumerate(reader, start=2):
-                        try:
+                # Com --generate-labels cada lote é gravado na sua própria transação
+                # e, no on_commit dele, vai para o JSON público e para esta fila,
+                # de onde segue para as etiquetas: só sai o que já está no banco
+                gravados: Deque[dict] = deque()
+                ao_gravar = None
+                if gerar_etiquetas:
+                    def ao_gravar(registros: List[dict]):
+                        if not opts["no_json"]:
+                            exportar_dados_json(
+                                registros,
+                                Path(settings.BASE_DIR) / opts["json_dir"],
+                                opts["json_formato"],
+                                opts["json_faixa"],
+                                parcial=True,
+                            )
+                        gravados.extend(registros)
+
+                lotes = None
+                if dry_run:
+                    # O dry-run resolve os ids em blocos de IN (...) mesmo com --batch-size 0
+                    lotes = PlanoImportacao(batch_size or 1000, db_has_table, max_error_lines)
+                elif opts["fast"] and suporta_copy():
+                    lotes = CopyPostgres(batch_size or 1000, max_error_lines, ao_gravar=ao_gravar)
+                elif opts["fast"]:
+                    self.stdout.write(self.style.WARNING(
+                        f"[import_trusses] --fast requer PostgreSQL com psycopg 3 ({connection.vendor}); usando o modo em lote."
+                    ))
+                    lotes = UpsertEmLotes(batch_size or 1000, max_error_lines, ao_gravar=ao_gravar)
+                elif batch_size:
+                    lotes = UpsertEmLotes(batch_size, max_error_lines, ao_gravar=ao_gravar)
+
+                def importar() -> Iterator[dict]:
+                    """Importa o arquivo, devolvendo as linhas gravadas conforme cada lote é gravado."""
+                    nonlocal created, updated, unchanged, errors, error_lines
+                    # Sem --generate-labels o arquivo inteiro é uma transação só
+                    ctx = transaction.atomic() if not (dry_run or gerar_etiquetas) else nullcontext()
+                    with ctx:
+                        for idx, row in enumerate(reader, start=2):
                             try:
-                                raw_id = row[reverse_lookup["id"]]
-                                pk = int(str(raw_id).strip())
-                            except Exception:
-                                errors += 1
-                                if len(error_lines) < max_error_lines:
-                                    error_lines.append(f"Linha {idx}: id inválido ({row.get(reverse_lookup.get('id', 'id'))!r})")
-                                continue
-
-                            # Monta defaults baseado no que foi encontrado
-                            # Se um campo não existir na planilha, cai para "" / None
-                            def get(model_field, transform=lambda x: x, default=""):
-                                col = reverse_lookup.get(model_field)
-                                if not col:
-                                    return default
-                                return transform(row.get(col))
-
-                            defaults = {
-                                "truss_number": get("truss_number", lambda v: (v or "").strip(), ""),
-                                "tipo": get("tipo", lambda v: (v or "").strip(), ""),
-                                "quantidade": get("quantidade", to_int_or_none, None),
-                                "ply": get("ply", to_decimal_or_str, ""),
-                                # Job_Reference -> endereco
-                                "endereco": get("endereco", lambda v: (v or "").strip(), ""),
-                                # "Size (ft)" -> tamanho (mantemos string; se quiser número: str(int(float(...))))
-                                "tamanho": get("tamanho", lambda v: str(v).strip(), ""),
-                                "status": get("status", lambda v: (v or "").strip(), ""),
-                                "job_number": get("job_number", lambda v: (v or "").strip(), ""),
-                            }
-
-                            if dry_run:
-                                if db_has_table:
-                                    if Truss.objects.filter(pk=pk).exists():
+                                try:
+                                    raw_id = row[reverse_lookup["id"]]
+                                    pk = int(str(raw_id).strip())
+                                except Exception:
+                                    msg = f"Linha {idx}: id inválido ({row.get(reverse_lookup.get('id', 'id'))!r})"
+                                    if dry_run:
+                                        lotes.erro(msg, idx)  # entra no plano
+                                        continue
+                                    errors += 1
+                                    if len(error_lines) < max_error_lines:
+                                        error_lines.append(msg)
+                                    continue
+
+                                # Monta defaults baseado no que foi encontrado
+                                defaults = montar_defaults(row, reverse_lookup)
+
+                                if lotes is None:
+                                    # Savepoint por linha, como o update_or_create fazia
+                                    with transaction.atomic():
+                                        resultado = gravar_linha(pk, defaults)
+                                    if resultado == CRIADO:
+                                        created += 1
+                                    elif resultado == ATUALIZADO:
                                         updated += 1
                                     else:
-                                        created += 1
-                                else:
-                                    created += 1
+                                        unchanged += 1
+                                    if ao_gravar is not None and resultado != INALTERADO:
+                                        transaction.on_commit(partial(ao_gravar, [{"id": pk, **valores_modelo(defaults)}]))
+
+                                if (idx - 1) % 1000 == 0:
+                                    self.stdout.write(self.style.NOTICE(f"[import_trusses] {idx-1} linhas processadas..."))
+
+                            except IntegrityError as e:
+                                errors += 1
+                                if len(error_lines) < max_error_lines:
+                                    error_lines.append(f"Linha {idx}: IntegrityError: {e}")
+                            except Exception as e:
+                                errors += 1
+                                if len(error_lines) < max_error_lines:
+                                    error_lines.append(f"Linha {idx}: Erro inesperado: {e}")
                             else:
-                                obj, created_flag = Truss.objects.update_or_create(
-                                    id=pk,
-                                    defaults=defaults,
-                                )
-                                if created_flag:
-                                    created += 1
-                                else:
-                                    updated += 1
-
-                            if (idx - 1) % 1000 == 0:
-                                self.stdout.write(self.style.NOTICE(f"[import_trusses] {idx-1} linhas processadas..."))
-
-                        except IntegrityError as e:
-                            errors += 1
-                            if len(error_lines) < max_error_lines:
-                                error_lines.append(f"Linha {idx}: IntegrityError: {e}")
-                        except Exception as e:
-                            errors += 1
-                            if len(error_lines) < max_error_lines:
-                                error_lines.append(f"Linha {idx}: Erro inesperado: {e}")
+                                if lotes is not None:
+                                    # Erros de linha ficam no lote; o que sobe daqui é erro de
+                                    # banco (transação abortada) e interrompe o import
+                                    lotes.adicionar(idx, pk, defaults)
+
+                            while gravados:
+                                yield gravados.popleft()
+
+                        if lotes is not None:
+                            lotes.descarregar()
+                            created += lotes.created
+                            updated += lotes.updated
+                            unchanged += lotes.unchanged
+                            errors += lotes.errors
+                            error_lines = (error_lines + lotes.error_lines)[:max_error_lines]
+                        while gravados:
+                            yield gravados.popleft()
+
+                with closing(importar()) as linhas:
+                    if gerar_etiquetas:
+                        etiquetas = self._gerar_etiquetas(linhas, opts)
+                    else:
+                        for _ in linhas:
+                            pass
+
+                if dry_run:
+                    resumo = lotes.resumo()
+                    self.stdout.write(self.style.NOTICE(
+                        f"[import_trusses] Plano: criar {resumo['criar']}, atualizar {resumo['atualizar']}, "
+                        f"inalterados {resumo['inalterados']}, erros {resumo['erros']}"
+                    ))
+                    if plan_json:
+                        plano = {"arquivo": str(csv_path), **lotes.como_dict()}
+                        Path(plan_json).write_text(
+                            json.dumps(plano, ensure_ascii=False, indent=2, default=str), encoding="utf-8"
+                        )
+                        self.stdout.write(self.style.NOTICE(f"[import_trusses] Plano gravado em {plan_json}"))
 
         except FileNotFoundError:
-            raise CommandError(f"CSV não encontrado: {csv_path}")
+            raise CommandError(f"Arquivo não encontrado: {csv_path}")
+        except (RuntimeError, ValueError) as e:
+            # openpyxl ausente ou aba inexistente
+            raise CommandError(str(e))
+        except DatabaseError as e:
+            if gerar_etiquetas:
+                raise CommandError(f"Erro no banco; os lotes anteriores já estavam gravados: {e}")
+            raise CommandError(f"Erro no banco, importação desfeita: {e}")
+
+        if etiquetas is not None:
+            trusses_count, imgs_count, pdf_path = etiquetas
+            self.stdout.write(self.style.SUCCESS(
+                f"[import_trusses] Etiquetas: {imgs_count} imagens para {trusses_count} trusses. PDF={pdf_path}"
+            ))
 
         if error_lines:
             self.stdout.write(self.style.WARNING("[import_trusses] Exemplos de erros:"))
@@ -211,5 +284,31 @@ class Command(BaseCommand):
                 self.stdout.write(" - " + line)
 
         self.stdout.write(self.style.SUCCESS(
-            f"[import_trusses] Concluído — criados: {created}, atualizados: {updated}, erros: {errors} (dry-run={dry_run})"
-        ))
\ No newline at end of file
+            f"[import_trusses] Concluído — criados: {created}, atualizados: {updated}, inalterados: {unchanged}, "
+            f"erros: {errors} (dry-run={dry_run})"
+        ))
+
+    def _gerar_etiquetas(self, linhas: Iterable[dict], opts):
+        """
+        Consome as linhas conforme cada lote é gravado e commitado: a
+        renderização anda junto com o import, sem reler a tabela. Um id
+        repetido em lotes diferentes gera etiqueta nas duas vezes.
+        Incremental e parcial: as etiquetas de trusses que o import não
+        regravou ficam na pasta, e o PDF traz só as linhas gravadas.
+        """
+        return gerar_imagens_e_pdf(
+            linhas,
+            Path(settings.BASE_DIR) / opts["output_dir"],
+            Path(settings.LABEL_LOGO_PATH),
+            settings.WEB_BASE_URL,
+            settings.LABEL_EMPRESA_ENDERECO,
+            settings.LABEL_EMPRESA_TEL,
+            pdf_name=opts["pdf_name"],
+            workers=opts["workers"],
+            formato_pdf=opts["pdf_format"],
+            bilevel=opts["bilevel"],
+            incremental=True,
+            parcial=True,
+            saida=opts["saida"],
+            pdf_paginas_por_parte=opts["pdf_partes"],
+        )
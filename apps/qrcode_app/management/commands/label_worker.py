@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.qrcode_app.services.label_jobs import (
+    cancelar_pendentes,
+    executar_job,
+    nome_worker,
+    reenfileirar_travados,
+    reservar_proximo,
+)
+
+
+class Command(BaseCommand):
+    help = "Processa a fila de jobs de etiquetas (LabelJob). Rode quantos processos quiser."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll", type=float, default=2.0, help="Segundos entre consultas à fila vazia")
+        parser.add_argument("--once", action="store_true", help="Processa o que houver na fila e sai")
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Processos de renderização por job (1 = em série, 0 = todos os núcleos)",
+        )
+        parser.add_argument(
+            "--stale-after", type=int, default=300,
+            help="Reenfileira jobs 'executando' sem heartbeat há N segundos (worker morto)",
+        )
+
+    def handle(self, *args, **opts):
+        worker = nome_worker()
+        self.stdout.write(self.style.NOTICE(f"[label_worker] {worker} aguardando jobs..."))
+        while True:
+            close_old_connections()
+            cancelar_pendentes()
+            reenfileirados = reenfileirar_travados(opts["stale_after"])
+            if reenfileirados:
+                self.stdout.write(self.style.WARNING(f"[label_worker] {reenfileirados} job(s) travado(s) reenfileirado(s)"))
+
+            job = reservar_proximo(worker)
+            if job is not None:
+                self.stdout.write(self.style.NOTICE(f"[label_worker] Job {job.pk}: filtros={job.filtros}"))
+                executar_job(job, workers=opts["workers"])
+                continue
+
+            if opts["once"]:
+                return
+            time.sleep(opts["poll"])
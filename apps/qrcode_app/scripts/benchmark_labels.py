@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+"""
+Benchmark do pipeline de etiquetas (services/labels.py) com datasets sintéticos.
+
+  python -m apps.qrcode_app.scripts.benchmark_labels --sizes 10,1000,10000 \
+      --logo-path apps/django_apps/accounts/static/accounts/cornerstone_logo.png \
+      --output benchmark_labels.json
+
+Cada tamanho roda num processo novo (pico de RSS isolado). Para cada um são
+medidos etiquetas/s, pico de RSS e o tempo por etapa (exclusivo: tempo de
+uma etapa aninhada não conta na etapa de fora). Com --baseline compara com um
+JSON anterior e sai com código 1 se alguma métrica piorar além da tolerância.
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+
+ETAPAS = ("qr_encode", "faixa_horizontal", "centro", "png_save", "pdf", "exportar_json")
+
+# Distribuição de `quantidade` parecida com a dos jobs reais: a maioria das
+# trusses sai com 1-3 cópias, poucas passam de 6
+QUANTIDADES = (1, 2, 3, 4, 6, 8, 12)
+PESOS_QUANTIDADE = (40, 25, 15, 8, 6, 4, 2)
+TRUSSES_POR_JOB = 50
+
+
+def gerar_registros(n: int, seed: int = 42) -> list:
+    rnd = random.Random(seed)
+    registros = []
+    for i in range(1, n + 1):
+        job = 24000 + (i - 1) // TRUSSES_POR_JOB
+        registros.append({
+            "id": i,
+            "job_number": f"{job}" if rnd.random() > 0.05 else "",
+            "truss_number": f"{rnd.choice('ABCDEFGHJKT')}{rnd.randint(1, 99):02d}",
+            "tipo": rnd.choice(["Common", "Girder", "Gable", "Hip"]),
+            "quantidade": rnd.choices(QUANTIDADES, PESOS_QUANTIDADE)[0],
+            "ply": rnd.choice(["1", "2", "3"]),
+            "endereco": "Rua Exemplo, 123 - Cidade/UF",
+            "tamanho": f"{rnd.randint(10, 60)}' {rnd.randint(0, 11)}\"",
+            "status": "pending",
+        })
+    return registros
+
+
+class _Cronometro:
+    """Acumula tempo exclusivo por etapa envolvendo funções do módulo de etiquetas."""
+
+    def __init__(self):
+        self.tempos = {e: 0.0 for e in ETAPAS}
+        self.chamadas = {e: 0 for e in ETAPAS}
+        self._pilha = []
+
+    def medir(self, etapa: str, func, condicao=None):
+        def wrapper(*args, **kwargs):
+            if condicao is not None and not condicao(*args, **kwargs):
+                return func(*args, **kwargs)
+            self._pilha.append(0.0)
+            inicio = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                total = time.perf_counter() - inicio
+                aninhado = self._pilha.pop()
+                self.tempos[etapa] += total - aninhado
+                self.chamadas[etapa] += 1
+                if self._pilha:
+                    self._pilha[-1] += total
+        return wrapper
+
+
+def _instrumentar(cron: _Cronometro):
+    from PIL import Image
+
+    from apps.qrcode_app.services import labels as L
+    from apps.qrcode_app.services import labels_vetor as V
+    from apps.qrcode_app.services import pdf_writer as W
+
+    L.QRMatrixCache._codificar = staticmethod(cron.medir("qr_encode", L.QRMatrixCache._codificar))
+    L._desenhar_faixa_horizontal = cron.medir("faixa_horizontal", L._desenhar_faixa_horizontal)
+    L._desenhar_centro = cron.medir("centro", L._desenhar_centro)
+    Image.Image.save = cron.medir(
+        "png_save",
+        Image.Image.save,
+        condicao=lambda img, fp, *a, **k: str(fp).lower().endswith(".png"),
+    )
+    L.codificar_imagem = cron.medir("pdf", L.codificar_imagem)
+    V.LabelTemplateVetorial.pagina = cron.medir("pdf", V.LabelTemplateVetorial.pagina)
+    for nome in ("adicionar", "registrar_fonte", "registrar_imagem", "registrar_form", "fechar"):
+        setattr(W.PdfEtiquetas, nome, cron.medir("pdf", getattr(W.PdfEtiquetas, nome)))
+    L.exportar_json = cron.medir("exportar_json", L.exportar_json)
+
+
+def _pico_rss_mb(quem) -> float:
+    rss = resource.getrusage(quem).ru_maxrss
+    # Linux reporta em KiB, macOS em bytes
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _executar(n: int, opts: dict, fila):
+    # Qualquer falha vai para a fila: sem resultado, o pai ficaria esperando para sempre
+    try:
+        _medir(n, opts, fila)
+    except BaseException:
+        fila.put({"erro": traceback.format_exc()})
+
+
+def _medir(n: int, opts: dict, fila):
+    cron = _Cronometro()
+    _instrumentar(cron)
+    from apps.qrcode_app.services import labels as L
+
+    registros = gerar_registros(n, opts["seed"])
+    pasta = Path(tempfile.mkdtemp(prefix=f"bench_labels_{n}_", dir=opts["workdir"]))
+    try:
+        inicio = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            _, etiquetas, pdf_path = L.gerar_imagens_e_pdf(
+                registros=registros,
+                output_dir=pasta / "labels",
+                logo_path=Path(opts["logo_path"]),
+                base_url="https://cornerstone-app.onrender.com/truss",
+                empresa_endereco="Rua Exemplo, 123 - Cidade/UF",
+                empresa_tel="(11) 99999-8888",
+                copias=opts["copias"],
+                workers=opts["workers"],
+                formato_pdf=opts["formato_pdf"],
+                bilevel=opts["bilevel"],
+                saida=opts["saida"],
+                png_compress_level=opts["png_compress_level"],
+            )
+            L.exportar_json(registros, pasta / "json")
+        segundos = time.perf_counter() - inicio
+
+        fila.put({
+            "trusses": n,
+            "etiquetas": etiquetas,
+            "segundos": round(segundos, 3),
+            "etiquetas_por_segundo": round(etiquetas / segundos, 2),
+            "trusses_por_segundo": round(n / segundos, 2),
+            "pico_rss_mb": _pico_rss_mb(resource.RUSAGE_SELF),
+            "pico_rss_workers_mb": _pico_rss_mb(resource.RUSAGE_CHILDREN),
+            "pdf_bytes": pdf_path.stat().st_size if pdf_path else 0,
+            "etapas_segundos": {e: round(t, 3) for e, t in cron.tempos.items()},
+            "etapas_chamadas": cron.chamadas,
+            "qr_cache": L.QR_CACHE.stats(),
+        })
+    finally:
+        if not opts["manter"]:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+
+def rodar(sizes, opts: dict) -> list:
+    # spawn: cada dataset começa de um interpretador limpo (RSS e caches isolados)
+    ctx = multiprocessing.get_context("spawn")
+    resultados = []
+    for n in sizes:
+        fila = ctx.Queue()
+        proc = ctx.Process(target=_executar, args=(n, opts, fila))
+        proc.start()
+        while True:
+            try:
+                resultado = fila.get(timeout=1)
+                break
+            except queue.Empty:
+                # Morto sem passar pelo except (OOM killer, segfault)
+                if not proc.is_alive() and fila.empty():
+                    raise RuntimeError(f"Benchmark de {n} trusses terminou sem resultado (exit code {proc.exitcode})")
+        proc.join()
+        if "erro" in resultado:
+            raise RuntimeError(f"Benchmark de {n} trusses falhou:\n{resultado['erro']}")
+        print(
+            f"⏱️ {n} trusses: {resultado['etiquetas']} etiquetas em {resultado['segundos']}s "
+            f"({resultado['etiquetas_por_segundo']}/s, pico {resultado['pico_rss_mb']} MB)"
+        )
+        resultados.append(resultado)
+    return resultados
+
+
+def comparar(resultados: list, baseline: dict, tolerancia: float) -> list:
+    """Retorna a lista de regressões (textos) em relação ao baseline."""
+    anteriores = {r["trusses"]: r for r in baseline.get("resultados", [])}
+    regressoes = []
+    for atual in resultados:
+        ant = anteriores.get(atual["trusses"])
+        if not ant:
+            continue
+        limite = 1 + tolerancia / 100
+        if atual["etiquetas_por_segundo"] * limite < ant["etiquetas_por_segundo"]:
+            regressoes.append(
+                f"{atual['trusses']} trusses: {atual['etiquetas_por_segundo']}/s "
+                f"(antes {ant['etiquetas_por_segundo']}/s)"
+            )
+        if atual["pico_rss_mb"] > ant["pico_rss_mb"] * limite:
+            regressoes.append(
+                f"{atual['trusses']} trusses: pico RSS {atual['pico_rss_mb']} MB "
+                f"(antes {ant['pico_rss_mb']} MB)"
+            )
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,1000,10000", help="Quantidades de trusses, separadas por vírgula")
+    parser.add_argument("--output", default="benchmark_labels.json")
+    parser.add_argument("--logo-path", default="apps/django_apps/accounts/static/accounts/cornerstone_logo.png")
+    parser.add_argument("--workdir", default=None, help="Pasta para os arquivos temporários")
+    parser.add_argument("--keep", action="store_true", help="Não apaga as etiquetas geradas")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--copias", default="hardlink")
+    parser.add_argument("--workers", type=int, default=1, help="Com >1, as etapas medem só o processo principal")
+    parser.add_argument("--pdf-format", default="raster")
+    parser.add_argument("--bilevel", action="store_true")
+    parser.add_argument("--saida", default="ambos")
+    parser.add_argument("--png-compress-level", type=int, default=6)
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=10.0, help="Piora aceitável em %% (padrão 10)")
+    args = parser.parse_args()
+
+    from PIL import __version__ as pillow_version
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    opts = {
+        "seed": args.seed,
+        "workdir": args.workdir,
+        "manter": args.keep,
+        "logo_path": str(Path(args.logo_path).resolve()),
+        "copias": args.copias,
+        "workers": args.workers,
+        "formato_pdf": args.pdf_format,
+        "bilevel": args.bilevel,
+        "saida": args.saida,
+        "png_compress_level": args.png_compress_level,
+    }
+    try:
+        resultados = rodar(sizes, opts)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    saida = {
+        "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pillow": pillow_version,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {k: v for k, v in opts.items() if k not in ("workdir", "manter")},
+        "resultados": resultados,
+    }
+    Path(args.output).write_text(json.dumps(saida, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"📊 Resultados em {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressoes = comparar(resultados, json.load(f), args.tolerancia)
+        for r in regressoes:
+            print(f"❌ Regressão: {r}")
+        if regressoes:
+            sys.exit(1)
+        print("✅ Sem regressões em relação ao baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+"""
+Impressora ZPL falsa para testar o envio por TCP sem uma Zebra de verdade:
+  python apps/qrcode_app/scripts/fake_zpl_printer.py --port 9100 --output recebido.zpl
+  python manage.py generate_truss_labels --zpl tcp://localhost:9100
+Cada conexão é anexada ao arquivo de saída.
+"""
+import argparse
+import socketserver
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--output", default="recebido.zpl")
+    parser.add_argument("--once", action="store_true", help="Encerra após o primeiro job")
+    args = parser.parse_args()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            total = etiquetas = 0
+            with open(args.output, "ab") as f:
+                for chunk in iter(lambda: self.rfile.read(65536), b""):
+                    f.write(chunk)
+                    total += len(chunk)
+                    etiquetas += chunk.count(b"^XZ")
+            print(f"🖨️ Job de {self.client_address[0]}: {total} bytes, {etiquetas} formatos ^XA..^XZ")
+
+    socketserver.TCPServer.allow_reuse_address = True
+    with socketserver.TCPServer((args.host, args.port), Handler) as server:
+        print(f"🖨️ Impressora falsa ouvindo em {args.host}:{args.port} → {args.output}")
+        if args.once:
+            server.handle_request()
+        else:
+            server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,17 @@ import argparse
 import os
 from pathlib import Path
 
-from apps.qrcode_app.services.labels import gerar_de_csv
+from apps.qrcode_app.services.labels import (
+    FORMATOS_JSON,
+    FORMATOS_PDF,
+    MODOS_COPIAS,
+    PNG_COMPRESS_LEVEL,
+    SAIDAS,
+    exportar_dados_json,
+    gerar_de_csv,
+    registros_de_csv,
+)
+from apps.qrcode_app.services.zpl import gerar_zpl
 
 def main():
     parser = argparse.ArgumentParser()
@@ -20,10 +30,40 @@ def main():
     parser.add_argument("--empresa-tel", default="(11) 99999-8888")
     parser.add_argument("--pdf-name", default="labels.pdf")
     parser.add_argument("--no-json", action="store_true")
+    parser.add_argument("--json-formato", choices=FORMATOS_JSON, default="arquivos", help="arquivos ou bundles (por job)")
+    parser.add_argument("--json-faixa", type=int, metavar="N", help="Bundles por faixas de N ids")
     parser.add_argument("--no-clean", action="store_true")
+    parser.add_argument("--copias", choices=MODOS_COPIAS, default="hardlink")
+    parser.add_argument("--workers", type=int, default=1, help="0 = todos os núcleos")
+    parser.add_argument("--pdf-format", choices=FORMATOS_PDF, default="raster")
+    parser.add_argument("--bilevel", action="store_true", help="PNG 1 bit + PDF CCITT G4")
+    parser.add_argument("--incremental", action="store_true", help="Só trusses novos/alterados")
+    parser.add_argument("--saida", choices=SAIDAS, default="ambos", help="ambos, pdf ou png")
+    parser.add_argument("--png-compress-level", type=int, choices=range(10), default=PNG_COMPRESS_LEVEL, metavar="0-9")
+    parser.add_argument("--png-optimize", action="store_true")
+    parser.add_argument("--zip", dest="zip_name", help="Também empacota os PNGs neste ZIP")
+    parser.add_argument("--pdf-partes", type=int, metavar="N", help="PDFs numerados de N páginas")
+    parser.add_argument("--pdf-parte-por-job", action="store_true", help="Uma parte de PDF por job_number")
+    parser.add_argument("--zpl", help="ZPL nativo em vez de PNG/PDF: arquivo .zpl ou tcp://impressora[:9100]")
     args = parser.parse_args()
+    if args.zip_name and args.saida == "pdf":
+        parser.error("--zip exige PNGs na saída (--saida ambos ou png).")
 
     base = Path(".").resolve()
+    if args.zpl:
+        registros = registros_de_csv(base / args.csv)
+        if not args.no_json:
+            exportar_dados_json(registros, base / args.json_dir, args.json_formato, args.json_faixa)
+        gerar_zpl(
+            registros,
+            args.zpl,
+            logo_path=base / args.logo_path,
+            base_url=args.web_base_url,
+            empresa_endereco=args.empresa_endereco,
+            empresa_tel=args.empresa_tel,
+        )
+        return
+
     gerar_de_csv(
         csv_path=base / args.csv,
         output_dir=base / args.output_dir,
@@ -35,6 +75,19 @@ def main():
         pdf_name=args.pdf_name,
         clean=not args.no_clean,
         export_json=not args.no_json,
+        json_formato=args.json_formato,
+        json_faixa=args.json_faixa,
+        copias=args.copias,
+        workers=args.workers,
+        formato_pdf=args.pdf_format,
+        bilevel=args.bilevel,
+        incremental=args.incremental,
+        saida=args.saida,
+        png_compress_level=args.png_compress_level,
+        png_optimize=args.png_optimize,
+        zip_name=args.zip_name,
+        pdf_paginas_por_parte=args.pdf_partes,
+        pdf_parte_por_job=args.pdf_parte_por_job,
     )
 
 if __name__ == "__main__":
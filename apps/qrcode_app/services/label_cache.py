@@ -0,0 +1,177 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict
+
+try:
+    import fcntl  # Só POSIX; no Windows a poda roda sem trava entre processos
+except ImportError:
+    fcntl = None  # type: ignore
+
+TRAVA_NOME = ".lock"
+# A varredura do diretório só acontece quando a conta local passa do limite
+# ou a cada PODA_A_CADA gravações (para enxergar o que outros processos
+# gravaram), e desce até PODA_ALVO do limite para a próxima demorar a vir
+PODA_A_CADA = 256
+PODA_ALVO = 0.9
+
+
+class CacheEtiquetas:
+    """
+    Cache LRU em dois níveis (memória + disco), limitado em bytes, para
+    etiquetas renderizadas sob demanda. A chave já embute o `updated_at`
+    do truss e as configurações de render, então nunca é preciso invalidar:
+    versões antigas só envelhecem até serem descartadas.
+    O disco é compartilhado entre processos: o limite de bytes vale para a
+    pasta inteira, pois a poda varre o diretório (sob uma trava de arquivo)
+    em vez de confiar no índice do processo. Entre uma poda e outra o índice
+    soma só as gravações deste processo; a pasta pode passar do limite em
+    até ~PODA_A_CADA etiquetas por processo antes da próxima varredura.
+    """
+
+    def __init__(self, pasta: Path, max_disco_bytes: int, max_memoria_bytes: int):
+        self.pasta = Path(pasta)
+        self.max_disco_bytes = max_disco_bytes
+        self.max_memoria_bytes = max_memoria_bytes
+        self.hits_memoria = 0
+        self.hits_disco = 0
+        self.misses = 0
+        self._memoria: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes_memoria = 0
+        self._disco: "OrderedDict[str, int]" = OrderedDict()  # nome -> tamanho
+        self._bytes_disco = 0
+        self._gravacoes = 0  # desde a última varredura
+        self._lock = threading.Lock()
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self._indexar_disco()
+
+    def _indexar_disco(self):
+        self._podar_disco()
+
+    @contextmanager
+    def _trava_disco(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.pasta / TRAVA_NOME, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _varrer_disco(self):
+        # Mais antigo (mtime) primeiro = próximo a sair
+        arquivos = []
+        with os.scandir(self.pasta) as entradas:
+            for entrada in entradas:
+                if entrada.name.startswith(".") or entrada.name.endswith(".part"):
+                    continue
+                try:
+                    if not entrada.is_file():
+                        continue
+                    st = entrada.stat()
+                except FileNotFoundError:
+                    continue  # removido por outro processo durante a varredura
+                arquivos.append((st.st_mtime, entrada.name, st.st_size))
+        arquivos.sort()
+        return arquivos
+
+    def _guardar_memoria(self, nome: str, dados: bytes):
+        if len(dados) > self.max_memoria_bytes:
+            return
+        anterior = self._memoria.pop(nome, None)
+        if anterior is not None:
+            self._bytes_memoria -= len(anterior)
+        self._memoria[nome] = dados
+        self._bytes_memoria += len(dados)
+        while self._bytes_memoria > self.max_memoria_bytes:
+            _, velho = self._memoria.popitem(last=False)
+            self._bytes_memoria -= len(velho)
+
+    def _podar_disco(self):
+        # Conta os arquivos de todos os processos, não só os deste
+        with self._trava_disco():
+            arquivos = self._varrer_disco()
+            total = sum(tamanho for _, _, tamanho in arquivos)
+            if total > self.max_disco_bytes:
+                alvo = int(self.max_disco_bytes * PODA_ALVO)
+                while total > alvo and len(arquivos) > 1:
+                    _, nome, tamanho = arquivos.pop(0)
+                    total -= tamanho
+                    try:
+                        (self.pasta / nome).unlink()
+                    except FileNotFoundError:
+                        pass
+        with self._lock:
+            self._disco = OrderedDict((nome, tamanho) for _, nome, tamanho in arquivos)
+            self._bytes_disco = total
+
+    def obter(self, nome: str, gerar: Callable[[Path], None]) -> bytes:
+        """
+        Retorna os bytes de `nome`; na falta, chama gerar(caminho_tmp), que
+        deve gravar o arquivo, e o publica no cache.
+        """
+        with self._lock:
+            dados = self._memoria.get(nome)
+            if dados is not None:
+                self._memoria.move_to_end(nome)
+                self.hits_memoria += 1
+                return dados
+
+        path = self.pasta / nome
+        try:
+            dados = path.read_bytes()
+        except FileNotFoundError:
+            dados = None
+        if dados is not None:
+            with self._lock:
+                self.hits_disco += 1
+                if nome not in self._disco:
+                    self._bytes_disco += len(dados)
+                self._disco[nome] = len(dados)
+                self._disco.move_to_end(nome)
+                self._guardar_memoria(nome, dados)
+            try:
+                os.utime(path)  # mtime = último uso, para o índice dos outros processos
+            except OSError:
+                pass
+            return dados
+
+        # Gera fora do lock; em corrida, o último os.replace vence (conteúdo igual)
+        tmp = path.with_name(f"{nome}.{os.getpid()}.{threading.get_ident()}.part")
+        try:
+            gerar(tmp)
+            dados = tmp.read_bytes()
+            os.replace(tmp, path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        with self._lock:
+            self.misses += 1
+            if nome in self._disco:
+                self._bytes_disco -= self._disco[nome]
+            self._disco[nome] = len(dados)
+            self._bytes_disco += len(dados)
+            self._guardar_memoria(nome, dados)
+            self._gravacoes += 1
+            podar = self._bytes_disco > self.max_disco_bytes or self._gravacoes >= PODA_A_CADA
+            if podar:
+                self._gravacoes = 0
+        if podar:
+            # Fora do lock: hits de memória não esperam a varredura
+            self._podar_disco()
+        return dados
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits_memoria": self.hits_memoria,
+                "hits_disco": self.hits_disco,
+                "misses": self.misses,
+                "bytes_memoria": self._bytes_memoria,
+                "bytes_disco": self._bytes_disco,
+                "itens_disco": len(self._disco),
+            }
@@ -0,0 +1,138 @@
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from apps.django_apps.accounts.models import LabelJob, Truss
+from apps.qrcode_app.services.labels import FORMATOS_PDF, SAIDAS, GeracaoCancelada, gerar_de_queryset
+from apps.qrcode_app.services.trusses import filtrar_trusses
+
+# Progresso/cancelamento vão ao banco no máximo a cada INTERVALO_PROGRESSO s
+INTERVALO_PROGRESSO = 1.0
+FILTROS_JOB = ("ids", "job_number", "status", "tipo", "limit")
+
+
+def pasta_job(job: LabelJob) -> Path:
+    return Path(settings.LABEL_JOBS_DIR) / f"job_{job.pk}"
+
+
+def validar_opcoes(opcoes: dict) -> dict:
+    """Normaliza as opções de render aceitas pela fila; ValueError se inválidas."""
+    formato = opcoes.get("pdf_format") or "raster"
+    saida = opcoes.get("saida") or "pdf"
+    if formato not in FORMATOS_PDF:
+        raise ValueError(f"pdf_format inválido: {formato!r}")
+    if saida not in SAIDAS:
+        raise ValueError(f"saida inválida: {saida!r}")
+    return {"pdf_format": formato, "saida": saida, "bilevel": bool(opcoes.get("bilevel"))}
+
+
+def nome_worker() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def reenfileirar_travados(limite_segundos: int) -> int:
+    """Jobs "executando" sem heartbeat recente (worker morreu) voltam à fila."""
+    corte = timezone.now() - timedelta(seconds=limite_segundos)
+    return LabelJob.objects.filter(
+        status=LabelJob.EXECUTANDO, heartbeat_at__lt=corte, cancelar=False
+    ).update(status=LabelJob.PENDENTE, worker="", processados=0, etiquetas=0)
+
+
+def reservar_proximo(worker: str) -> Optional[LabelJob]:
+    """
+    Reserva o job pendente mais antigo. O UPDATE condicional (status ainda
+    pendente) é o que garante que dois workers nunca peguem o mesmo job,
+    inclusive no SQLite, que não tem SELECT ... FOR UPDATE.
+    """
+    candidatos = LabelJob.objects.filter(status=LabelJob.PENDENTE, cancelar=False).order_by("id")
+    for pk in candidatos.values_list("pk", flat=True)[:10]:
+        agora = timezone.now()
+        reservado = LabelJob.objects.filter(pk=pk, status=LabelJob.PENDENTE).update(
+            status=LabelJob.EXECUTANDO, worker=worker, started_at=agora, heartbeat_at=agora
+        )
+        if reservado:
+            return LabelJob.objects.get(pk=pk)
+    return None
+
+
+def cancelar_pendentes() -> int:
+    # Cancelamento de job que nenhum worker pegou é imediato
+    return LabelJob.objects.filter(status=LabelJob.PENDENTE, cancelar=True).update(
+        status=LabelJob.CANCELADO, finished_at=timezone.now()
+    )
+
+
+class _Progresso:
+    """Callback de gerar_imagens_e_pdf: grava o progresso e checa o pedido de cancelamento."""
+
+    def __init__(self, job: LabelJob):
+        self.job = job
+        self._ultimo = 0.0
+
+    def __call__(self, prontos: int, total: int, etiquetas: int):
+        agora = time.monotonic()
+        if prontos < total and agora - self._ultimo < INTERVALO_PROGRESSO:
+            return
+        self._ultimo = agora
+        LabelJob.objects.filter(pk=self.job.pk).update(
+            processados=prontos, etiquetas=etiquetas, heartbeat_at=timezone.now()
+        )
+        if LabelJob.objects.filter(pk=self.job.pk, cancelar=True).exists():
+            raise GeracaoCancelada()
+
+
+def executar_job(job: LabelJob, workers: int = 1):
+    """Roda um job já reservado até o fim, gravando o status final."""
+    filtros = {k: v for k, v in (job.filtros or {}).items() if k in FILTROS_JOB}
+    opcoes = validar_opcoes(job.opcoes or {})
+    output_dir = pasta_job(job)
+    gerar_zip = opcoes["saida"] in ("ambos", "png")
+
+    try:
+        qs = filtrar_trusses(Truss.objects.all().order_by("id"), **filtros)
+        total = qs.count()
+        LabelJob.objects.filter(pk=job.pk).update(total=total)
+        _, etiquetas, pdf_path = gerar_de_queryset(
+            qs,
+            output_dir=output_dir,
+            json_dir=output_dir / "json",
+            base_url=settings.WEB_BASE_URL,
+            empresa_endereco=settings.LABEL_EMPRESA_ENDERECO,
+            empresa_tel=settings.LABEL_EMPRESA_TEL,
+            logo_path=Path(settings.LABEL_LOGO_PATH),
+            export_json=False,
+            workers=workers,
+            formato_pdf=opcoes["pdf_format"],
+            bilevel=opcoes["bilevel"],
+            saida=opcoes["saida"],
+            zip_name="labels.zip" if gerar_zip else None,
+            progresso=_Progresso(job),
+        )
+    except GeracaoCancelada:
+        LabelJob.objects.filter(pk=job.pk).update(status=LabelJob.CANCELADO, finished_at=timezone.now())
+        print(f"🛑 Job {job.pk} cancelado")
+        return
+    except Exception:
+        LabelJob.objects.filter(pk=job.pk).update(
+            status=LabelJob.ERRO, erro=traceback.format_exc()[-4000:], finished_at=timezone.now()
+        )
+        print(f"❌ Job {job.pk} falhou")
+        return
+
+    LabelJob.objects.filter(pk=job.pk).update(
+        status=LabelJob.CONCLUIDO,
+        processados=F("total"),
+        etiquetas=etiquetas,
+        pdf_path=str(pdf_path or ""),
+        zip_path=str(output_dir / "labels.zip") if gerar_zip else "",
+        finished_at=timezone.now(),
+    )
+    print(f"✅ Job {job.pk} concluído: {etiquetas} etiquetas")
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+
+from apps.qrcode_app.services.pdf_writer import ImagemPdf, PaginaVetorial
+
+MANIFESTO_NOME = "labels_manifest.json"
+PAGINAS_DIR = ".paginas"
+# 2: páginas em cabeçalho JSON + bytes (a versão 1 usava pickle)
+MANIFESTO_VERSAO = 2
+
+
+def hash_json(valor) -> str:
+    dados = json.dumps(valor, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(dados.encode("utf-8")).hexdigest()
+
+
+def codificar_pagina(pagina: Optional[Union[ImagemPdf, PaginaVetorial]]) -> bytes:
+    """Página do PDF em cache: uma linha de cabeçalho JSON seguida dos bytes do stream."""
+    if pagina is None:
+        cabecalho, dados = {"tipo": None}, b""
+    elif isinstance(pagina, PaginaVetorial):
+        cabecalho, dados = {"tipo": "vetor", "largura": pagina.largura, "altura": pagina.altura}, pagina.dados
+    else:
+        cabecalho = {
+            "tipo": "imagem",
+            "largura": pagina.largura,
+            "altura": pagina.altura,
+            "dicionario": pagina.dicionario,
+        }
+        dados = pagina.dados
+    cabecalho["tamanho"] = len(dados)
+    return json.dumps(cabecalho).encode("utf-8") + b"\n" + dados
+
+
+def decodificar_pagina(conteudo: bytes) -> Optional[Union[ImagemPdf, PaginaVetorial]]:
+    """Inverso de codificar_pagina; ValueError se o arquivo estiver truncado ou corrompido."""
+    linha, sep, dados = conteudo.partition(b"\n")
+    if not sep:
+        raise ValueError("página sem cabeçalho")
+    try:
+        cabecalho = json.loads(linha)
+        tipo = cabecalho["tipo"]
+        if cabecalho["tamanho"] != len(dados):
+            raise ValueError("página truncada")
+        if tipo is None:
+            return None
+        if tipo == "vetor":
+            return PaginaVetorial.comprimida(int(cabecalho["largura"]), int(cabecalho["altura"]), dados)
+        if tipo == "imagem":
+            return ImagemPdf(
+                int(cabecalho["largura"]), int(cabecalho["altura"]), str(cabecalho["dicionario"]), dados
+            )
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"cabeçalho de página inválido: {e}")
+    raise ValueError(f"tipo de página desconhecido: {tipo!r}")
+
+
+def gravar_atomico(path: Path, dados: bytes):
+    """Grava num .tmp e troca com os.replace: quem lê nunca vê o arquivo pela metade."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(dados)
+    os.replace(tmp, path)
+
+
+class ManifestoEtiquetas:
+    """
+    Manifesto persistente de uma pasta de etiquetas: para cada truss guarda
+    o hash dos campos renderizados + configurações, o `updated_at` visto na
+    última geração, os PNGs gravados e a página do PDF já codificada
+    (em `.paginas/<id>.pag`), permitindo refazer só o que mudou e remontar
+    o PDF completo sem renderizar de novo.
+    """
+
+    def __init__(self, output_dir: Path, config_hash: str):
+        self.output_dir = output_dir
+        self.path = output_dir / MANIFESTO_NOME
+        self.paginas_dir = output_dir / PAGINAS_DIR
+        self.config_hash = config_hash
+        self.entradas = {}
+        # True quando havia um manifesto, mas de outra configuração
+        self.invalidado = False
+
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                dados = json.load(f)
+        except (FileNotFoundError, ValueError):
+            dados = {}
+        # Configuração diferente (URL, endereço, logo, formato...) invalida tudo
+        if dados.get("versao") == MANIFESTO_VERSAO and dados.get("config") == config_hash:
+            self.entradas = dados.get("trusses", {})
+        elif dados:
+            self.invalidado = True
+
+    def _pagina_path(self, tid: int) -> Path:
+        return self.paginas_dir / f"{tid}.pag"
+
+    def reaproveitavel(self, tid: int, hash_campos, updated_at: Optional[str]) -> Optional[dict]:
+        """
+        Retorna a entrada do manifesto se o truss não mudou e os arquivos
+        ainda existem. `updated_at` igual dispensa comparar o hash;
+        hash_campos pode ser um callable para só calcular quando preciso.
+        """
+        entrada = self.entradas.get(str(tid))
+        if not entrada:
+            return None
+        if not (updated_at and entrada.get("updated_at") == updated_at):
+            h = hash_campos() if callable(hash_campos) else hash_campos
+            if entrada.get("hash") != h:
+                return None
+            entrada["updated_at"] = updated_at
+        arquivos = entrada.get("arquivos") or []
+        if not self._pagina_path(tid).exists():
+            return None
+        if any(not (self.output_dir / nome).exists() for nome in arquivos):
+            return None
+        return entrada
+
+    def carregar_pagina(self, tid: int):
+        """Página em cache do truss; OSError/ValueError se ilegível (o chamador renderiza de novo)."""
+        return decodificar_pagina(self._pagina_path(tid).read_bytes())
+
+    def registrar(
+        self,
+        tid: int,
+        hash_campos: str,
+        updated_at: Optional[str],
+        arquivos: List[str],
+        manifesto_copias: dict,
+        quantidade: int,
+        pagina,
+    ):
+        anterior = self.entradas.get(str(tid))
+        if anterior:
+            # Quantidade menor: remove PNGs de cópias que deixaram de existir
+            self._remover_arquivos(set(anterior.get("arquivos", [])) - set(arquivos))
+
+        self.paginas_dir.mkdir(parents=True, exist_ok=True)
+        gravar_atomico(self._pagina_path(tid), codificar_pagina(pagina))
+        self.entradas[str(tid)] = {
+            "hash": hash_campos,
+            "updated_at": updated_at,
+            "arquivos": arquivos,
+            "copias": manifesto_copias,
+            "quantidade": quantidade,
+        }
+
+    def _remover_arquivos(self, nomes: Iterable[str]):
+        for nome in nomes:
+            try:
+                (self.output_dir / nome).unlink()
+            except FileNotFoundError:
+                pass
+
+    def remover_orfaos(self, tids_atuais: Iterable[int]) -> int:
+        atuais = {str(t) for t in tids_atuais}
+        orfaos = [tid for tid in self.entradas if tid not in atuais]
+        for tid in orfaos:
+            entrada = self.entradas.pop(tid)
+            self._remover_arquivos(entrada.get("arquivos", []))
+            try:
+                self._pagina_path(int(tid)).unlink()
+            except FileNotFoundError:
+                pass
+        return len(orfaos)
+
+    def salvar(self):
+        dados = {
+            "versao": MANIFESTO_VERSAO,
+            "config": self.config_hash,
+            "trusses": self.entradas,
+        }
+        gravar_atomico(self.path, json.dumps(dados, ensure_ascii=False, indent=2).encode("utf-8"))
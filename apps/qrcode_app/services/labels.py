@@ -1,12 +1,36 @@
 import os
 import json
+import shutil
+import threading
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
-from typing import Iterable, List, Optional, Sequence, Tuple, Union
-from decimal import Decimal
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Sequence, Sized, Tuple, Union
 
 import qrcode
 from PIL import Image, ImageDraw, ImageFont
 
+from apps.qrcode_app.services.label_manifest import (
+    MANIFESTO_NOME,
+    PAGINAS_DIR,
+    ManifestoEtiquetas,
+    gravar_atomico,
+    hash_json,
+)
+from apps.qrcode_app.services.pdf_writer import (
+    ImagemPdf,
+    PaginaVetorial,
+    PdfEmPartes,
+    PdfEtiquetas,
+    codificar_imagem,
+)
+from apps.qrcode_app.services.truss_bundles import (
+    BUNDLES_DIR,
+    dados_truss,
+    exportar_json_bundles,
+)
+
 try:
     import pandas as pd  # Opcional: só exigido se usar CSV
 except Exception:
@@ -20,6 +44,26 @@ DPI = 300
 
 QR_MAIN_SIZE = 500
 QR_SMALL_SIZE = 200
+QR_CENTRO_SIZE = 250
+QR_BOX_SIZE = 10
+QR_BORDER = 2
+QR_CACHE_MAXSIZE = 2048
+
+# Modo bilevel (1 bit): desenha em "L" e binariza no fim
+LIMIAR_BILEVEL = 128
+# Logo colorido (laranja) sumiria no limiar padrão; tudo que não é quase branco vira preto
+LIMIAR_LOGO_BILEVEL = 200
+
+# Geometria do layout (faixas superior/inferior + bloco central)
+FAIXA_W, FAIXA_H = FINAL_WIDTH - 200, QR_SMALL_SIZE
+FAIXA_X = (FINAL_WIDTH - FAIXA_W) // 2
+FAIXA_Y_TOPO = 80
+FAIXA_Y_BASE = FINAL_HEIGHT - QR_SMALL_SIZE - 80
+
+CENTRO_W, CENTRO_H = 950, 400
+CENTRO_X = (FINAL_WIDTH - CENTRO_W) // 2
+CENTRO_Y = (FINAL_HEIGHT - CENTRO_H) // 2
+SUB_W, SUB_H = 400, 500
 
 # Tentar fontes comuns; se não achar, cai no default do Pillow
 FONT_CANDIDATES_REG = [
@@ -33,6 +77,29 @@ FONT_CANDIDATES_BOLD = [
     "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
 ]
 
+# Modos de gravação das cópias de uma mesma etiqueta (todas idênticas):
+#   "hardlink": 1 PNG renderizado + hardlinks para as demais cópias
+#   "manifest": 1 PNG + entrada no manifesto COPIAS_MANIFEST
+#   "arquivo":  grava um PNG independente por cópia
+MODOS_COPIAS = ("hardlink", "manifest", "arquivo")
+COPIAS_MANIFEST = "copias.json"
+
+# Motor das páginas do PDF: "raster" (imagem 300 DPI) ou "vetor"
+# (QR em retângulos + texto com fonte embutida, ver labels_vetor.py)
+FORMATOS_PDF = ("raster", "vetor")
+
+# Plano de saída: o que é codificado para cada etiqueta
+#   "ambos": PNGs + PDF | "pdf": só o PDF | "png": só os PNGs
+SAIDAS = ("ambos", "pdf", "png")
+# JSON da página de detalhe: um arquivo por truss ou bundles por job/faixa de ids
+FORMATOS_JSON = ("arquivos", "bundles")
+
+PNG_COMPRESS_LEVEL = 6  # padrão do Pillow; 1 = mais rápido, 9 = menor
+
+# Versão do desenho da etiqueta: incremente ao mudar o layout para que a
+# geração incremental (labels_manifest.json) refaça tudo
+LAYOUT_VERSAO = 1
+
 # ================================================================
 
 class FontBundle:
@@ -57,122 +124,282 @@ def _load_first_font(candidates: Sequence[str], size: int):
         raise last_exc or RuntimeError("Nenhuma fonte encontrada.")
 
 
+def _assinatura_arquivo(path) -> Optional[Tuple[int, int]]:
+    # (mtime, tamanho); None se o caminho não existe (ex.: "arial.ttf" relativo)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _logo_bilevel(logo: Image.Image) -> Image.Image:
+    # RGBA -> "L" só com preto/branco, já sobre fundo branco
+    fundo = Image.new("L", logo.size, 255)
+    fundo.paste(logo.convert("L"), (0, 0), mask=logo.getchannel("A"))
+    return fundo.point(lambda v: 0 if v < LIMIAR_LOGO_BILEVEL else 255)
+
+
+class AssetRegistry:
+    """
+    Fontes, logos e templates carregados uma vez por processo e chaveados
+    por (caminho, mtime, tamanho): um arquivo alterado no disco gera uma
+    nova entrada. Os objetos devolvidos são compartilhados, não modifique.
+    Workers do pool herdam o registro já aquecido (fork) ou aquecem o seu
+    uma vez em _init_worker.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._itens = {}
+        self._lock = threading.Lock()
+
+    def _obter(self, chave: tuple, carregar):
+        with self._lock:
+            if chave in self._itens:
+                self.hits += 1
+                return self._itens[chave]
+            self.misses += 1
+        # Carrega fora do lock; em corrida, fica o primeiro que chegar
+        valor = carregar()
+        with self._lock:
+            return self._itens.setdefault(chave, valor)
+
+    def fonte(self, candidates: Sequence[str], size: int):
+        chave = ("fonte", tuple((c, _assinatura_arquivo(c)) for c in candidates), size)
+        return self._obter(chave, lambda: _load_first_font(candidates, size))
+
+    def fontes(self) -> FontBundle:
+        return FontBundle(
+            reg22=self.fonte(FONT_CANDIDATES_REG, 22),
+            reg30=self.fonte(FONT_CANDIDATES_REG, 30),
+            bold85=self.fonte(FONT_CANDIDATES_BOLD, 85),
+            bold120=self.fonte(FONT_CANDIDATES_BOLD, 120),
+        )
+
+    def logo(self, path: Path, max_width: int, bilevel: bool = False) -> Image.Image:
+        path = Path(path)
+        assinatura = _assinatura_arquivo(path)
+        if assinatura is None:
+            raise FileNotFoundError(f"Logo não encontrado em {path}")
+
+        def carregar():
+            if bilevel:
+                return _logo_bilevel(self.logo(path, max_width))
+            logo = Image.open(path).convert("RGBA")
+            logo.thumbnail((max_width, max_width))
+            return logo
+
+        chave = ("logo", str(path.resolve()), assinatura, max_width, bilevel)
+        return self._obter(chave, carregar)
+
+    def template(
+        self,
+        logo_path: Path,
+        empresa_endereco: str,
+        empresa_tel: str,
+        bilevel: bool = False,
+    ) -> "LabelTemplate":
+        logo_path = Path(logo_path)
+        fonts = self.fontes()
+        chave = (
+            "template",
+            str(logo_path.resolve()),
+            _assinatura_arquivo(logo_path),
+            str(empresa_endereco),
+            str(empresa_tel),
+            bilevel,
+            # As fontes ficam referenciadas no registro, então o id é estável
+            tuple(id(f) for f in (fonts.reg22, fonts.reg30, fonts.bold85, fonts.bold120)),
+        )
+        return self._obter(
+            chave,
+            lambda: build_label_template(
+                logo_path, empresa_endereco, empresa_tel, fonts=fonts, bilevel=bilevel
+            ),
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"itens": len(self._itens), "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._itens.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Registro do processo (cada worker do pool tem o seu)
+ASSETS = AssetRegistry()
+
+
 def build_fonts() -> FontBundle:
-    return FontBundle(
-        reg22=_load_first_font(FONT_CANDIDATES_REG, 22),
-        reg30=_load_first_font(FONT_CANDIDATES_REG, 30),
-        bold85=_load_first_font(FONT_CANDIDATES_BOLD, 85),
-        bold120=_load_first_font(FONT_CANDIDATES_BOLD, 120),
-    )
+    return ASSETS.fontes()
 
 
 def carregar_logo(path: Path, max_width: int) -> Image.Image:
-    if not path.exists():
-        raise FileNotFoundError(f"Logo não encontrado em {path}")
-    logo = Image.open(path).convert("RGBA")
-    logo.thumbnail((max_width, max_width))
-    return logo
+    # Imagem compartilhada pelo ASSETS: copie antes de desenhar sobre ela
+    return ASSETS.logo(path, max_width)
+
+
+def _colar(base: Image.Image, img: Image.Image, pos: Tuple[int, int]):
+    # Em RGBA usa o alfa como máscara; em "L" (bilevel) cola direto
+    if img.mode == "RGBA":
+        base.paste(img, pos, mask=img)
+    else:
+        base.paste(img, pos)
+
+
+class QRMatrixCache:
+    """
+    Cache LRU das matrizes de módulos do QR Code, chaveado por
+    (payload, nível ECC, borda). Cada payload é codificado uma única vez;
+    todos os tamanhos em pixels são derivados da matriz em cache.
+    """
+
+    def __init__(self, maxsize: int = QR_CACHE_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._matrizes: "OrderedDict[tuple, Tuple[int, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _codificar(data: str, error_correction: int, border: int) -> Tuple[int, bytes]:
+        qr = qrcode.QRCode(error_correction=error_correction, border=border)
+        qr.add_data(data)
+        qr.make(fit=True)
+        matriz = qr.get_matrix()  # já inclui a borda
+        n = len(matriz)
+        # 1 byte por módulo: 0 = escuro, 255 = claro (modo "L")
+        pixels = bytes(0 if m else 255 for linha in matriz for m in linha)
+        return n, pixels
+
+    def matriz(
+        self,
+        data: str,
+        error_correction: int = qrcode.constants.ERROR_CORRECT_H,
+        border: int = QR_BORDER,
+    ) -> Tuple[int, bytes]:
+        key = (data, error_correction, border)
+        with self._lock:
+            cached = self._matrizes.get(key)
+            if cached is not None:
+                self._matrizes.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        cached = self._codificar(data, error_correction, border)
+        with self._lock:
+            self._matrizes[key] = cached
+            self._matrizes.move_to_end(key)
+            while len(self._matrizes) > self.maxsize:
+                self._matrizes.popitem(last=False)
+        return cached
+
+    def imagem(
+        self,
+        data: str,
+        size: int,
+        error_correction: int = qrcode.constants.ERROR_CORRECT_H,
+        border: int = QR_BORDER,
+        box_size: int = QR_BOX_SIZE,
+        modo: str = "RGBA",
+    ) -> Image.Image:
+        n, pixels = self.matriz(data, error_correction, border)
+        # Mesmo resultado de qrcode.make_image(box_size=...) + resize
+        img = Image.frombytes("L", (n, n), pixels)
+        img = img.resize((n * box_size, n * box_size), Image.NEAREST)
+        if modo != "L":
+            img = img.convert(modo)
+        return img.resize((size, size))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "tamanho": len(self._matrizes)}
+
+    def clear(self):
+        with self._lock:
+            self._matrizes.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Cache compartilhado pelo processo
+QR_CACHE = QRMatrixCache()
 
 
-def gerar_qrcode(truss_id: Union[int, str], base_url: str, size: int) -> Image.Image:
+def gerar_qrcode(
+    truss_id: Union[int, str],
+    base_url: str,
+    size: int,
+    cache: Optional[QRMatrixCache] = None,
+    modo: str = "RGBA",
+) -> Image.Image:
     qr_data = f"{base_url}/{truss_id}"
-    qr = qrcode.QRCode(
-        error_correction=qrcode.constants.ERROR_CORRECT_H,
-        box_size=10,
-        border=2,
-    )
-    qr.add_data(qr_data)
-    qr.make(fit=True)
-    img_qr = qr.make_image(fill_color="black", back_color="white").convert("RGBA")
-    return img_qr.resize((size, size))
+    return (cache or QR_CACHE).imagem(qr_data, size, modo=modo)
 
 
-def _desenhar_faixa_horizontal(
+def _desenhar_faixa_base(
     base_img: Image.Image,
-    truss_number: str,
     logo_small: Image.Image,
-    qr_small: Image.Image,
     y_pos: int,
     fonts: FontBundle,
 ):
-    faixa_altura = qr_small.height
-    bloco_w, bloco_h = FINAL_WIDTH - 200, faixa_altura
-    bloco = Image.new("RGBA", (bloco_w, bloco_h), "white")
+    # Parte fixa da faixa: logo pequeno + legenda "Truss ID:"
+    bloco = Image.new(base_img.mode, (FAIXA_W, FAIXA_H), "white")
     draw_b = ImageDraw.Draw(bloco)
 
-    logo_y = (bloco_h - logo_small.height) // 2
-    bloco.paste(logo_small, (20, logo_y), mask=logo_small)
-
-    bloco.paste(
-        qr_small,
-        (bloco_w - qr_small.width - 20, (bloco_h - qr_small.height) // 2),
-        mask=qr_small,
-    )
+    logo_y = (FAIXA_H - logo_small.height) // 2
+    _colar(bloco, logo_small, (20, logo_y))
 
     label_text = "Truss ID:"
     lw = draw_b.textlength(label_text, font=fonts.reg22)
-    draw_b.text(((bloco_w - lw) // 2, 5), label_text, fill="black", font=fonts.reg22)
-
-    tn = str(truss_number or "")
-    nw = draw_b.textlength(tn, font=fonts.bold85)
-    draw_b.text(((bloco_w - nw) // 2, 35), tn, fill="black", font=fonts.bold85)
+    draw_b.text(((FAIXA_W - lw) // 2, 5), label_text, fill="black", font=fonts.reg22)
 
-    x = (FINAL_WIDTH - bloco_w) // 2
-    base_img.paste(bloco, (x, y_pos), mask=bloco)
+    _colar(base_img, bloco, (FAIXA_X, y_pos))
 
 
-def _desenhar_centro(
-    base_img: Image.Image,
-    truss_id: int,
-    truss_number: str,
-    job_number: str,
-    logo_path: Path,
-    base_url: str,
-    empresa_endereco: str,
-    empresa_tel: str,
-    fonts: FontBundle,
+def _desenhar_sub_bloco_base(
+    logo_c: Image.Image, com_job: bool, fonts: FontBundle, modo: str = "RGBA"
 ):
-    bloco_w, bloco_h = 950, 400
-    bloco = Image.new("RGBA", (bloco_w, bloco_h), "white")
-
-    qr_main = gerar_qrcode(truss_id, base_url, 250)
-    qr_x = 10
-    qr_y = (bloco_h - qr_main.height) // 2
-    bloco.paste(qr_main, (qr_x, qr_y), mask=qr_main)
-
-    # Sub-bloco rotacionado
-    sub_w, sub_h = 400, 500
-    sub_bloco = Image.new("RGBA", (sub_w, sub_h), "white")
+    """
+    Sub-bloco central (antes da rotação) com logo e legenda "Truss ID:".
+    Retorna (imagem, y_job, y_numero); y_job é None quando não há job.
+    """
+    sub_bloco = Image.new(modo, (SUB_W, SUB_H), "white")
     draw_s = ImageDraw.Draw(sub_bloco)
 
-    logo_c = carregar_logo(logo_path, 400)
-    lx = (sub_w - logo_c.width) // 2
+    lx = (SUB_W - logo_c.width) // 2
     ly = 10
-    sub_bloco.paste(logo_c, (lx, ly), mask=logo_c)
+    _colar(sub_bloco, logo_c, (lx, ly))
 
     ty = ly + logo_c.height + 40
-
-    if job_number:
-        job_text = f"Job: {job_number}"
-        jw = draw_s.textlength(job_text, font=fonts.reg30)
-        draw_s.text(((sub_w - jw) // 2, ty), job_text, fill="black", font=fonts.reg30)
+    y_job = None
+    if com_job:
+        y_job = ty
         ty += 70
 
     label_text = "Truss ID:"
     lw = draw_s.textlength(label_text, font=fonts.reg30)
-    draw_s.text(((sub_w - lw) // 2, ty), label_text, fill="black", font=fonts.reg30)
+    draw_s.text(((SUB_W - lw) // 2, ty), label_text, fill="black", font=fonts.reg30)
     ty += 50
 
-    tn = truss_number or ""
-    nw = draw_s.textlength(tn, font=fonts.bold120)
-    draw_s.text(((sub_w - nw) // 2, ty), tn, fill="black", font=fonts.bold120)
+    return sub_bloco, y_job, ty
 
-    sub_rot = sub_bloco.rotate(90, expand=True)
-    logo_x = qr_x + qr_main.width + 20
-    logo_y = (bloco_h - sub_rot.height) // 2
-    bloco.paste(sub_rot, (logo_x, logo_y), mask=sub_rot)
 
-    # Endereço
+def _desenhar_centro_base(
+    base_img: Image.Image,
+    empresa_endereco: str,
+    empresa_tel: str,
+    fonts: FontBundle,
+):
+    # Parte fixa do bloco central: endereço/telefone rotacionados
+    bloco = Image.new(base_img.mode, (CENTRO_W, CENTRO_H), "white")
+
     font_small = fonts.reg22
     end_text = f"{empresa_endereco}\n{empresa_tel}"
     dummy = Image.new("RGBA", (1, 1), "white")
@@ -181,7 +408,7 @@ def _desenhar_centro(
     text_w = bbox[2] - bbox[0]
     text_h = bbox[3] - bbox[1]
 
-    sub_end = Image.new("RGBA", (text_w + 80, text_h + 60), "white")
+    sub_end = Image.new(base_img.mode, (text_w + 80, text_h + 60), "white")
     draw_e = ImageDraw.Draw(sub_end)
     end_x = (sub_end.width - text_w) // 2
     end_y = (sub_end.height - text_h) // 2
@@ -189,46 +416,210 @@ def _desenhar_centro(
     sub_end_rot = sub_end.rotate(90, expand=True)
 
     end_x = bloco.width - sub_end_rot.width - 5
-    end_y = (bloco_h - sub_end_rot.height) // 2
-    bloco.paste(sub_end_rot, (end_x, end_y), mask=sub_end_rot)
+    end_y = (CENTRO_H - sub_end_rot.height) // 2
+    _colar(bloco, sub_end_rot, (end_x, end_y))
 
-    x = (FINAL_WIDTH - bloco.width) // 2
-    y = (FINAL_HEIGHT - bloco.height) // 2
-    base_img.paste(bloco, (x, y), mask=bloco)
+    _colar(base_img, bloco, (CENTRO_X, CENTRO_Y))
 
 
-def serialize_value(v):
-    if isinstance(v, Decimal):
-        # Mantemos como string para não perder precisão e evitar float estranho
-        return str(v)
-    if v is None:
-        return ""
-    return v
+class LabelTemplate:
+    """
+    Camada invariante da etiqueta, renderizada uma vez por execução:
+    logos, legendas "Truss ID:" e o endereço rotacionado. Cada etiqueta
+    parte de uma cópia de `canvas` e só desenha QR Codes e textos variáveis.
+    Em modo bilevel o canvas é "L" e a etiqueta final sai em "1".
+    """
+
+    def __init__(self, canvas: Image.Image, sub_blocos: dict, fonts: FontBundle):
+        self.canvas = canvas
+        self.sub_blocos = sub_blocos  # {com_job: (imagem, y_job, y_numero)}
+        self.fonts = fonts
+        self.modo = canvas.mode
+        self.bilevel = canvas.mode == "L"
+
+    def nova_etiqueta(self) -> Image.Image:
+        return self.canvas.copy()
+
+    def sub_bloco(self, job_number: str, truss_number: str) -> Image.Image:
+        base, y_job, y_numero = self.sub_blocos[bool(job_number)]
+        sub_bloco = base.copy()
+        draw_s = ImageDraw.Draw(sub_bloco)
+
+        if y_job is not None:
+            job_text = f"Job: {job_number}"
+            jw = draw_s.textlength(job_text, font=self.fonts.reg30)
+            draw_s.text(((SUB_W - jw) // 2, y_job), job_text, fill="black", font=self.fonts.reg30)
 
+        tn = truss_number or ""
+        nw = draw_s.textlength(tn, font=self.fonts.bold120)
+        draw_s.text(((SUB_W - nw) // 2, y_numero), tn, fill="black", font=self.fonts.bold120)
 
-def exportar_json(qs_like: Iterable[dict], json_dir: Path, base_public_path: str = "/static/truss-data"):
+        return sub_bloco.rotate(90, expand=True)
+
+
+def build_label_template(
+    logo_path: Path,
+    empresa_endereco: str,
+    empresa_tel: str,
+    fonts: Optional[FontBundle] = None,
+    bilevel: bool = False,
+) -> LabelTemplate:
+    fonts = fonts or build_fonts()
+    logo_small = ASSETS.logo(logo_path, 250, bilevel=bilevel)
+    logo_c = ASSETS.logo(logo_path, 400, bilevel=bilevel)
+    modo = "L" if bilevel else "RGBA"
+
+    canvas = Image.new(modo, (FINAL_WIDTH, FINAL_HEIGHT), "white")
+    _desenhar_faixa_base(canvas, logo_small, FAIXA_Y_TOPO, fonts)
+    _desenhar_centro_base(canvas, empresa_endereco, empresa_tel, fonts)
+    _desenhar_faixa_base(canvas, logo_small, FAIXA_Y_BASE, fonts)
+
+    sub_blocos = {
+        com_job: _desenhar_sub_bloco_base(logo_c, com_job, fonts, modo)
+        for com_job in (True, False)
+    }
+    return LabelTemplate(canvas, sub_blocos, fonts)
+
+
+def _desenhar_faixa_horizontal(
+    base_img: Image.Image,
+    truss_number: str,
+    qr_small: Image.Image,
+    y_pos: int,
+    fonts: FontBundle,
+):
+    # Só a parte variável (QR + número); o texto fica recortado à faixa
+    box = (FAIXA_X, y_pos, FAIXA_X + FAIXA_W, y_pos + FAIXA_H)
+    bloco = base_img.crop(box)
+    draw_b = ImageDraw.Draw(bloco)
+
+    _colar(bloco, qr_small, (FAIXA_W - qr_small.width - 20, (FAIXA_H - qr_small.height) // 2))
+
+    tn = str(truss_number or "")
+    nw = draw_b.textlength(tn, font=fonts.bold85)
+    draw_b.text(((FAIXA_W - nw) // 2, 35), tn, fill="black", font=fonts.bold85)
+
+    base_img.paste(bloco, box)
+
+
+def _desenhar_centro(
+    base_img: Image.Image,
+    template: LabelTemplate,
+    truss_id: int,
+    truss_number: str,
+    job_number: str,
+    base_url: str,
+):
+    qr_main = gerar_qrcode(truss_id, base_url, QR_CENTRO_SIZE, modo=template.modo)
+    qr_x = CENTRO_X + 10
+    qr_y = CENTRO_Y + (CENTRO_H - qr_main.height) // 2
+    _colar(base_img, qr_main, (qr_x, qr_y))
+
+    # Sub-bloco rotacionado (logo + job + número)
+    sub_rot = template.sub_bloco(job_number, truss_number)
+    logo_x = qr_x + qr_main.width + 20
+    logo_y = CENTRO_Y + (CENTRO_H - sub_rot.height) // 2
+    _colar(base_img, sub_rot, (logo_x, logo_y))
+
+
+def renderizar_etiqueta(
+    template: LabelTemplate,
+    truss_id: int,
+    truss_number: str,
+    job_number: str,
+    base_url: str,
+) -> Image.Image:
+    img_final = template.nova_etiqueta()
+    qr_small = gerar_qrcode(truss_id, base_url, QR_SMALL_SIZE, modo=template.modo)
+
+    _desenhar_faixa_horizontal(img_final, truss_number, qr_small, FAIXA_Y_TOPO, template.fonts)
+    _desenhar_centro(img_final, template, truss_id, truss_number, job_number, base_url)
+    _desenhar_faixa_horizontal(img_final, truss_number, qr_small, FAIXA_Y_BASE, template.fonts)
+    if template.bilevel:
+        img_final = img_final.point(lambda v: 255 if v >= LIMIAR_BILEVEL else 0, "1")
+    return img_final
+
+
+JSON_HASHES_NOME = ".hashes.json"  # ponto: o collectstatic ignora
+
+
+def _ler_json(path: Path):
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def exportar_json(
+    qs_like: Iterable[dict],
+    json_dir: Path,
+    base_public_path: str = "/static/truss-data",
+    parcial: bool = False,
+) -> Tuple[int, int, int]:
+    """
+    Exporta um <id>.json por truss de forma incremental: só regrava o que
+    mudou em relação ao mapa de hashes (.hashes.json) ou, sem ele, ao
+    conteúdo do arquivo atual, preservando mtime/ETag de todo o resto.
+    Trusses que não vieram na exportação têm o JSON removido, exceto com
+    `parcial` (seleção filtrada), que só acrescenta/atualiza. index.json e o
+    mapa de hashes são gravados atomicamente e só quando mudam.
+    Retorna (gravados, removidos, inalterados).
+    """
     json_dir.mkdir(parents=True, exist_ok=True)
+    hashes_path = json_dir / JSON_HASHES_NOME
+    hashes_antigos = _ler_json(hashes_path) or {}
+    hashes = dict(hashes_antigos) if parcial else {}
     index = {}
+    if parcial:
+        index = _ler_json(json_dir / "index.json") or {}
+
+    gravados = inalterados = 0
     for item in qs_like:
-        tid = int(item["id"])
-        data = {
-            "id": tid,
-            "job_number": serialize_value(item.get("job_number")),
-            "truss_number": str(serialize_value(item.get("truss_number"))),
-            "tipo": serialize_value(item.get("tipo")),
-            "quantidade": serialize_value(item.get("quantidade")),
-            "ply": serialize_value(item.get("ply")),
-            "endereco": serialize_value(item.get("endereco")),
-            "tamanho": serialize_value(item.get("tamanho")),
-            "status": serialize_value(item.get("status")),
-        }
+        data = dados_truss(item)
+        tid = data["id"]
+        h = hash_json(data)
         path = json_dir / f"{tid}.json"
-        with path.open("w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        if hashes_antigos.get(str(tid)) == h and path.exists():
+            inalterados += 1
+        elif str(tid) not in hashes_antigos and _ler_json(path) == data:
+            # Exportação anterior ao mapa de hashes: compara o conteúdo
+            inalterados += 1
+        else:
+            gravar_atomico(path, json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8"))
+            gravados += 1
+        hashes[str(tid)] = h
         index[str(tid)] = f"{base_public_path}/{tid}.json"
 
-    with (json_dir / "index.json").open("w", encoding="utf-8") as f:
-        json.dump(index, f, ensure_ascii=False, indent=2)
+    removidos = 0
+    if not parcial:
+        for path in json_dir.glob("*.json"):
+            if path.stem.isdigit() and path.stem not in index:
+                path.unlink()
+                removidos += 1
+
+    index = {k: index[k] for k in sorted(index, key=int)}
+    if _ler_json(json_dir / "index.json") != index:
+        gravar_atomico(json_dir / "index.json", json.dumps(index, ensure_ascii=False, indent=2).encode("utf-8"))
+    if hashes != hashes_antigos:
+        gravar_atomico(hashes_path, json.dumps(hashes, separators=(",", ":")).encode("utf-8"))
+
+    print(f"📦 JSONs em {json_dir}: {gravados} gravados, {removidos} removidos, {inalterados} sem mudança")
+    return gravados, removidos, inalterados
+
+
+def exportar_dados_json(
+    registros: Iterable[dict],
+    json_dir: Path,
+    formato: str = "arquivos",
+    faixa: Optional[int] = None,
+    parcial: bool = False,
+):
+    # "bundles" vai para json_dir/bundles/, ao lado dos arquivos por truss
+    if formato == "bundles":
+        exportar_json_bundles(registros, json_dir / BUNDLES_DIR, faixa=faixa, parcial=parcial)
+    else:
+        exportar_json(registros, json_dir, parcial=parcial)
 
 
 def _sanitize_quantidade(q):
@@ -239,8 +630,270 @@ def _sanitize_quantidade(q):
         return 1
 
 
+def _gravar_copias(img_path: Path, copias: List[Path], modo: str):
+    for destino in copias:
+        if modo == "arquivo":
+            # Arquivo independente, mas sem codificar o PNG de novo
+            shutil.copyfile(img_path, destino)
+            continue
+        if destino.exists():
+            destino.unlink()
+        try:
+            os.link(img_path, destino)
+        except OSError:
+            # FS sem suporte a hardlink: cai para cópia simples
+            shutil.copyfile(img_path, destino)
+
+
+class GeracaoCancelada(Exception):
+    """Levantada pelo callback de progresso para interromper a geração."""
+
+
+class ResultadoTruss:
+    """
+    Resultado da renderização de um truss. É o que volta dos workers do
+    pool, então carrega só dados simples: nomes dos PNGs gravados, entradas
+    do manifesto de cópias e a página já codificada para o PDF.
+    """
+
+    def __init__(
+        self,
+        tid: int,
+        quantidade: int,
+        arquivos: List[str],
+        manifesto: dict,
+        pagina: Optional[Union[ImagemPdf, PaginaVetorial]],
+        qr_hits: int = 0,
+        qr_misses: int = 0,
+        hash_campos: Optional[str] = None,
+        updated_at: Optional[str] = None,
+        reaproveitado: bool = False,
+    ):
+        self.tid = tid
+        self.quantidade = quantidade
+        self.arquivos = arquivos
+        self.manifesto = manifesto
+        self.pagina = pagina
+        self.qr_hits = qr_hits
+        self.qr_misses = qr_misses
+        # Usados pela geração incremental (labels_manifest.json)
+        self.hash_campos = hash_campos
+        self.updated_at = updated_at
+        self.reaproveitado = reaproveitado
+
+
+class _ContextoRender:
+    """Tudo que a renderização de um truss precisa, montado uma vez por processo."""
+
+    def __init__(
+        self,
+        logo_path: Path,
+        empresa_endereco: str,
+        empresa_tel: str,
+        base_url: str,
+        output_dir: Path,
+        copias: str,
+        formato_pdf: str,
+        bilevel: bool = False,
+        saida: str = "ambos",
+        png_compress_level: int = PNG_COMPRESS_LEVEL,
+        png_optimize: bool = False,
+    ):
+        # Conteúdo invariante (logos, legendas, endereço) é desenhado uma única
+        # vez por processo e reaproveitado entre execuções (ver ASSETS)
+        self.template = ASSETS.template(
+            logo_path, empresa_endereco, empresa_tel, bilevel=bilevel
+        )
+        self.template_vetor = None
+        if formato_pdf == "vetor":
+            from apps.qrcode_app.services.labels_vetor import build_label_template_vetorial
+
+            self.template_vetor = build_label_template_vetorial(
+                logo_path, empresa_endereco, empresa_tel, fonts=self.template.fonts
+            )
+        self.base_url = base_url
+        self.output_dir = output_dir
+        self.copias = copias
+        self.gerar_png = saida in ("ambos", "png")
+        self.gerar_pdf = saida in ("ambos", "pdf")
+        self.opcoes_png = {
+            "dpi": (DPI, DPI),
+            "compress_level": png_compress_level,
+            "optimize": png_optimize,
+        }
+
+
+def _grupo_job(reg: dict) -> str:
+    job = reg.get("job_number")
+    if job is None or job != job:  # NaN vindo do pandas
+        return ""
+    return str(job)
+
+
+def _hash_registro(reg: dict) -> str:
+    # Só os campos que aparecem na etiqueta (e a quantidade de cópias)
+    return hash_json([
+        int(reg["id"]),
+        str(reg.get("truss_number") or ""),
+        reg.get("job_number") or "",
+        _sanitize_quantidade(reg.get("quantidade")),
+    ])
+
+
+def _updated_at(reg: dict) -> Optional[str]:
+    v = reg.get("updated_at")
+    if not v:
+        return None
+    return v.isoformat() if hasattr(v, "isoformat") else str(v)
+
+
+def _hash_config(
+    logo_path: Path,
+    base_url: str,
+    empresa_endereco: str,
+    empresa_tel: str,
+    copias: str,
+    formato_pdf: str,
+    bilevel: bool,
+    saida: str = "ambos",
+) -> str:
+    try:
+        st = logo_path.stat()
+        logo = [str(logo_path), st.st_mtime_ns, st.st_size]
+    except OSError:
+        logo = [str(logo_path)]
+    return hash_json({
+        "layout": LAYOUT_VERSAO,
+        "logo": logo,
+        "base_url": base_url,
+        "endereco": empresa_endereco,
+        "tel": empresa_tel,
+        "copias": copias,
+        "formato_pdf": formato_pdf,
+        "bilevel": bilevel,
+        "saida": saida,
+        "fontes": [FONT_CANDIDATES_REG, FONT_CANDIDATES_BOLD],
+    })
+
+
+def _renderizar_truss(reg: dict, ctx: _ContextoRender) -> ResultadoTruss:
+    tid = int(reg["id"])
+    truss_number = str(reg.get("truss_number") or "")
+    job_number = reg.get("job_number") or ""
+    quantidade = _sanitize_quantidade(reg.get("quantidade"))
+    output_dir = ctx.output_dir
+    qr_antes = QR_CACHE.stats()
+
+    # Só PDF vetorial: a etiqueta raster nem precisa ser desenhada
+    img_final = None
+    if ctx.gerar_png or ctx.template_vetor is None:
+        img_final = renderizar_etiqueta(ctx.template, tid, truss_number, job_number, ctx.base_url)
+
+    arquivos = []
+    manifesto = {}
+    if ctx.gerar_png:
+        file_name = f"truss_{tid}_1.png"
+        img_path = output_dir / file_name
+        img_final.save(img_path, **ctx.opcoes_png)
+        arquivos.append(file_name)
+
+        extras = [output_dir / f"truss_{tid}_{i+1}.png" for i in range(1, quantidade)]
+        if ctx.copias == "manifest":
+            for destino in extras:
+                manifesto[destino.name] = file_name
+        else:
+            _gravar_copias(img_path, extras, ctx.copias)
+            arquivos.extend(destino.name for destino in extras)
+
+    pagina = None
+    if ctx.gerar_pdf:
+        if ctx.template_vetor is not None:
+            pagina = ctx.template_vetor.pagina(tid, truss_number, job_number, ctx.base_url)
+        else:
+            pagina = codificar_imagem(img_final)
+    qr_depois = QR_CACHE.stats()
+    return ResultadoTruss(
+        tid,
+        quantidade,
+        arquivos,
+        manifesto,
+        pagina,
+        qr_hits=qr_depois["hits"] - qr_antes["hits"],
+        qr_misses=qr_depois["misses"] - qr_antes["misses"],
+        hash_campos=_hash_registro(reg),
+        updated_at=_updated_at(reg),
+    )
+
+
+# Estado de cada processo do pool (contexto montado uma vez por worker)
+_WORKER_CTX: Optional[_ContextoRender] = None
+
+
+def _init_worker(*args):
+    global _WORKER_CTX
+    _WORKER_CTX = _ContextoRender(*args)
+
+
+def _renderizar_truss_worker(reg: dict) -> ResultadoTruss:
+    return _renderizar_truss(reg, _WORKER_CTX)
+
+
+def _resolver_workers(workers: Optional[int]) -> int:
+    if workers is None:
+        return 1
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def _renderizar_em_ordem(
+    itens: Iterable[Union[dict, ResultadoTruss]],
+    workers: int,
+    ctx_args: tuple,
+    ctx: Optional[_ContextoRender] = None,
+) -> Iterator[ResultadoTruss]:
+    """
+    Renderiza os trusses (em série ou num pool de processos) e devolve os
+    resultados na ordem original dos registros, para que a ordem das
+    páginas do PDF e os nomes dos PNGs não dependam do paralelismo.
+    Itens que já são ResultadoTruss (reaproveitados do manifesto) passam
+    direto, na mesma posição.
+    ctx_args são os argumentos de _ContextoRender (um por worker).
+    """
+    if workers <= 1:
+        ctx = ctx or _ContextoRender(*ctx_args)
+        for item in itens:
+            if isinstance(item, ResultadoTruss):
+                yield item
+            else:
+                yield _renderizar_truss(item, ctx)
+        return
+
+    # Janela limitada de tarefas em voo: mantém a memória do processo pai estável
+    janela = workers * 4
+    pendentes: Deque[Future] = deque()
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=ctx_args
+    ) as executor:
+        try:
+            for item in itens:
+                if isinstance(item, ResultadoTruss):
+                    fut: Future = Future()
+                    fut.set_result(item)
+                else:
+                    fut = executor.submit(_renderizar_truss_worker, item)
+                pendentes.append(fut)
+                if len(pendentes) >= janela:
+                    yield pendentes.popleft().result()
+            while pendentes:
+                yield pendentes.popleft().result()
+        finally:
+            for fut in pendentes:
+                fut.cancel()
+
+
 def gerar_imagens_e_pdf(
-    registros: List[dict],
+    registros: Iterable[dict],
     output_dir: Path,
     logo_path: Path,
     base_url: str,
@@ -248,12 +901,77 @@ def gerar_imagens_e_pdf(
     empresa_tel: str,
     pdf_name: str = "labels.pdf",
     clean: bool = True,
+    copias: str = "hardlink",
+    workers: int = 1,
+    formato_pdf: str = "raster",
+    bilevel: bool = False,
+    incremental: bool = False,
+    parcial: bool = False,
+    saida: str = "ambos",
+    png_compress_level: int = PNG_COMPRESS_LEVEL,
+    png_optimize: bool = False,
+    zip_name: Optional[str] = None,
+    progresso: Optional[Callable[[int, int, int], None]] = None,
+    pdf_paginas_por_parte: Optional[int] = None,
+    pdf_parte_por_job: bool = False,
 ) -> Tuple[int, int, Optional[Path]]:
     """
-    registros: lista de dicionários com campos do Truss.
+    registros: dicionários com campos do Truss. Pode ser um iterador (ex.: as
+    linhas gravadas por um import em andamento): ele é consumido conforme a
+    renderização avança, sem virar lista; o `total` passado ao progresso é
+    então o de registros lidos até o momento.
+    copias: como gravar as cópias idênticas de cada truss (ver MODOS_COPIAS).
+    workers: processos de renderização (1 = em série, 0 = todos os núcleos);
+    o trabalho é dividido por truss e a ordem de saída é sempre a original.
+    formato_pdf: "raster" (páginas em imagem) ou "vetor" (QR e textos vetoriais).
+    bilevel: renderiza em preto/branco puro: PNGs de 1 bit e páginas do PDF
+    em CCITT Group 4.
+    incremental: usa o manifesto da pasta (labels_manifest.json) para
+    renderizar só trusses novos/alterados, remover arquivos de trusses que
+    saíram da seleção e remontar o PDF com as páginas em cache. Ignora `clean`
+    (a menos que a configuração tenha mudado).
+    parcial: com incremental, `registros` é só parte da seleção (ex.: as
+    linhas gravadas por um import): os trusses de fora continuam no manifesto,
+    no disco e no copias.json, e uma configuração nova só recomeça o manifesto,
+    sem limpar a pasta. O PDF traz apenas os registros passados.
+    saida: plano de saída (ver SAIDAS); etapas fora do plano não são feitas.
+    png_compress_level/png_optimize: compressão dos PNGs (0-9; optimize é
+    bem mais lento e só reduz alguns %).
+    zip_name: também empacota os PNGs (e o copias.json) num ZIP dentro de
+    output_dir, gravado em streaming conforme as etiquetas ficam prontas.
+    progresso: chamado após cada truss com (trusses_prontos, total_trusses,
+    etiquetas); se levantar GeracaoCancelada, os arquivos parciais (PDF/ZIP)
+    são descartados e a exceção sobe.
+    pdf_paginas_por_parte / pdf_parte_por_job: em vez de um PDF único, gera
+    <nome>_001.pdf, <nome>_002.pdf... fechando uma parte a cada N páginas e/ou
+    quando o job_number muda (ordene os registros por job), e mantém
+    <nome>_partes.json com as partes prontas. Nesse modo o caminho retornado
+    é o do manifesto de partes.
+    Cada truss é renderizado uma única vez; no PDF as cópias referenciam a
+    mesma imagem. As páginas são gravadas em streaming, então o pico de
+    memória independe do tamanho do lote.
     Retorna (num_trusses, num_imagens, caminho_pdf|None)
     """
+    if saida not in SAIDAS:
+        raise ValueError(f"Saída inválida: {saida!r} (use {', '.join(SAIDAS)})")
+    if zip_name and saida == "pdf":
+        raise ValueError("zip_name exige PNGs na saída (saida='ambos' ou 'png').")
+    if copias not in MODOS_COPIAS:
+        raise ValueError(f"Modo de cópias inválido: {copias!r} (use {', '.join(MODOS_COPIAS)})")
+    if formato_pdf not in FORMATOS_PDF:
+        raise ValueError(f"Formato de PDF inválido: {formato_pdf!r} (use {', '.join(FORMATOS_PDF)})")
+
     output_dir.mkdir(parents=True, exist_ok=True)
+    manifesto = None
+    if incremental:
+        config = _hash_config(
+            logo_path, base_url, empresa_endereco, empresa_tel, copias, formato_pdf, bilevel,
+            saida,
+        )
+        manifesto = ManifestoEtiquetas(output_dir, config)
+        clean = manifesto.invalidado and not parcial
+        if clean:
+            print("♻️ Configuração mudou desde a última geração: refazendo tudo")
     if clean:
         # Limpa apenas arquivos gerados antes
         for f in output_dir.glob("truss_*.png"):
@@ -266,75 +984,225 @@ def gerar_imagens_e_pdf(
                 f.unlink()
             except Exception:
                 pass
+        for nome in (COPIAS_MANIFEST, MANIFESTO_NOME, f"{Path(pdf_name).stem}_partes.json"):
+            try:
+                (output_dir / nome).unlink()
+            except Exception:
+                pass
+        shutil.rmtree(output_dir / PAGINAS_DIR, ignore_errors=True)
 
-    fonts = build_fonts()
-    logo_small_cache = carregar_logo(logo_path, 250)
+    workers = _resolver_workers(workers)
+    if workers > 1:
+        print(f"⚙️ Renderizando com {workers} processos")
 
-    imagens_pdf: List[Image.Image] = []
+    gerar_pdf = saida in ("ambos", "pdf")
+    # Cada página vai para o disco assim que renderizada (memória constante)
+    em_partes = bool(pdf_paginas_por_parte or pdf_parte_por_job)
+    pdf = None
+    if gerar_pdf and em_partes:
+        pdf = PdfEmPartes(
+            output_dir,
+            Path(pdf_name).stem,
+            max_paginas=pdf_paginas_por_parte,
+            # No vetorial cada parte precisa das fontes/logos/template
+            ao_abrir=(lambda p: ctx.template_vetor.registrar_recursos(p)) if formato_pdf == "vetor" else None,
+        )
+    elif gerar_pdf:
+        pdf = PdfEtiquetas(output_dir / pdf_name)
+    arquivo_zip = None
+    if zip_name:
+        zip_path = output_dir / zip_name
+        zip_tmp = zip_path.with_name(zip_path.name + ".part")
+        # PNG já é comprimido: ZIP_STORED evita gastar CPU à toa
+        arquivo_zip = zipfile.ZipFile(zip_tmp, "w", compression=zipfile.ZIP_STORED)
     total_imgs = 0
+    manifesto_copias = {}
+    qr_hits = qr_misses = 0
+    reaproveitados = renderizados = 0
+    tids_atuais = set()
+    total = len(registros) if isinstance(registros, Sized) else None
+    # job de cada registro em voo, na ordem: os resultados saem na mesma ordem
+    grupos: Deque[Optional[str]] = deque()
 
-    for reg in registros:
-        tid = int(reg["id"])
-        truss_number = str(reg.get("truss_number") or "")
-        job_number = reg.get("job_number") or ""
-        quantidade = _sanitize_quantidade(reg.get("quantidade"))
-
-        for i in range(quantidade):
-            img_final = Image.new("RGBA", (FINAL_WIDTH, FINAL_HEIGHT), "white")
-            qr_small = gerar_qrcode(tid, base_url, QR_SMALL_SIZE)
-
-            _desenhar_faixa_horizontal(
-                img_final, truss_number, logo_small_cache, qr_small, 80, fonts
-            )
-            _desenhar_centro(
-                img_final,
+    def itens():
+        for reg in registros:
+            tid = int(reg["id"])
+            tids_atuais.add(tid)
+            grupos.append(_grupo_job(reg) if pdf_parte_por_job else None)
+            if manifesto is None:
+                yield reg
+                continue
+            entrada = manifesto.reaproveitavel(tid, lambda: _hash_registro(reg), _updated_at(reg))
+            if entrada is None:
+                yield reg
+                continue
+            try:
+                pagina = manifesto.carregar_pagina(tid)
+            except (OSError, ValueError):
+                # Página em cache truncada/corrompida: vale como miss e renderiza de novo
+                yield reg
+                continue
+            yield ResultadoTruss(
                 tid,
-                truss_number,
-                job_number,
-                logo_path,
-                base_url,
-                empresa_endereco,
-                empresa_tel,
-                fonts,
-            )
-            _desenhar_faixa_horizontal(
-                img_final,
-                truss_number,
-                logo_small_cache,
-                qr_small,
-                FINAL_HEIGHT - QR_SMALL_SIZE - 80,
-                fonts,
+                entrada["quantidade"],
+                entrada.get("arquivos") or [],
+                entrada.get("copias") or {},
+                pagina,
+                reaproveitado=True,
             )
 
-            file_name = f"truss_{tid}_{i+1}.png"
-            img_path = output_dir / file_name
-            img_final.save(img_path, dpi=(DPI, DPI))
-            print(f"✅ Etiqueta gerada: {file_name}")
-            imagens_pdf.append(img_final.convert("RGB"))
-            total_imgs += 1
-
-    pdf_path = None
-    if imagens_pdf:
-        pdf_path = output_dir / pdf_name
-        imagens_pdf[0].save(pdf_path, save_all=True, append_images=imagens_pdf[1:])
+    try:
+        ctx_args = (
+            logo_path, empresa_endereco, empresa_tel, base_url, output_dir, copias,
+            formato_pdf, bilevel, saida, png_compress_level, png_optimize,
+        )
+        ctx = None
+        if workers <= 1 or formato_pdf == "vetor":
+            ctx = _ContextoRender(*ctx_args)
+        if formato_pdf == "vetor" and isinstance(pdf, PdfEtiquetas):
+            # Fontes, logos e o template vetorial entram uma única vez no PDF
+            ctx.template_vetor.registrar_recursos(pdf)
+
+        for res in _renderizar_em_ordem(itens(), workers, ctx_args, ctx):
+            if res.reaproveitado:
+                reaproveitados += 1
+            else:
+                renderizados += 1
+                for nome in res.arquivos:
+                    print(f"✅ Etiqueta gerada: {nome}")
+                if manifesto is not None:
+                    manifesto.registrar(
+                        res.tid,
+                        res.hash_campos,
+                        res.updated_at,
+                        res.arquivos,
+                        res.manifesto,
+                        res.quantidade,
+                        res.pagina,
+                    )
+            manifesto_copias.update(res.manifesto)
+            grupo = grupos.popleft()
+            if em_partes and pdf is not None:
+                partes_antes = len(pdf.partes)
+                pdf.adicionar(res.pagina, copias=res.quantidade, grupo=grupo)
+                for parte in pdf.partes[partes_antes:]:
+                    print(f"📄 Parte {parte['parte']} pronta: {parte['arquivo']} ({parte['paginas']} páginas)")
+            elif pdf is not None:
+                pdf.adicionar(res.pagina, copias=res.quantidade)
+            if arquivo_zip is not None:
+                for nome in res.arquivos:
+                    arquivo_zip.write(output_dir / nome, nome)
+            total_imgs += res.quantidade
+            qr_hits += res.qr_hits
+            qr_misses += res.qr_misses
+            if progresso is not None:
+                prontos = reaproveitados + renderizados
+                progresso(prontos, total if total is not None else prontos + len(grupos), total_imgs)
+    except BaseException:
+        if pdf is not None:
+            pdf.abortar()
+        if arquivo_zip is not None:
+            arquivo_zip.close()
+            zip_tmp.unlink(missing_ok=True)
+        raise
+
+    if manifesto is not None and parcial:
+        manifesto_copias = {
+            nome: arquivo
+            for entrada in manifesto.entradas.values()
+            for nome, arquivo in (entrada.get("copias") or {}).items()
+        }
+    if manifesto_copias:
+        with (output_dir / COPIAS_MANIFEST).open("w", encoding="utf-8") as f:
+            json.dump(manifesto_copias, f, ensure_ascii=False, indent=2)
+        print(f"🗂️ Manifesto de cópias: {output_dir / COPIAS_MANIFEST}")
+        if arquivo_zip is not None:
+            arquivo_zip.write(output_dir / COPIAS_MANIFEST, COPIAS_MANIFEST)
+    elif incremental:
+        try:
+            (output_dir / COPIAS_MANIFEST).unlink()
+        except FileNotFoundError:
+            pass
+
+    if manifesto is not None:
+        removidos = 0 if parcial else manifesto.remover_orfaos(tids_atuais)
+        manifesto.salvar()
+        print(
+            f"♻️ Incremental: {renderizados} renderizados, {reaproveitados} reaproveitados, "
+            f"{removidos} removidos"
+        )
+
+    pdf_path = pdf.fechar() if pdf is not None else None
+    if pdf_path and em_partes:
+        print(f"🗂️ {len(pdf.partes)} partes de PDF, manifesto: {pdf_path}")
+    elif pdf_path:
         print(f"📄 PDF gerado: {pdf_path}")
+    if arquivo_zip is not None:
+        arquivo_zip.close()
+        os.replace(zip_tmp, zip_path)
+        print(f"🗜️ ZIP gerado: {zip_path}")
 
+    print(f"🔁 QR cache: {qr_hits} hits / {qr_misses} misses")
     print(f"🎉 Concluído: {total_imgs} imagens em {output_dir}")
-    return (len(registros), total_imgs, pdf_path)
+    return (reaproveitados + renderizados, total_imgs, pdf_path)
 
 
-def gerar_de_queryset(
-    qs,
-    output_dir: Path,
-    json_dir: Path,
+FORMATOS_ETIQUETA_UNICA = ("png", "pdf")
+
+
+def gerar_etiqueta_unica(
+    reg: dict,
+    destino: Path,
+    formato: str,
+    logo_path: Path,
     base_url: str,
     empresa_endereco: str,
     empresa_tel: str,
+    bilevel: bool = False,
+) -> Path:
+    """
+    Renderiza uma única etiqueta (uma cópia) de um truss em `destino`, como
+    PNG ou PDF de uma página. Usado pelos endpoints sob demanda; template,
+    fontes e logos vêm do ASSETS, então só a primeira chamada do processo
+    paga a carga do disco.
+    """
+    if formato not in FORMATOS_ETIQUETA_UNICA:
+        raise ValueError(f"Formato inválido: {formato!r} (use {', '.join(FORMATOS_ETIQUETA_UNICA)})")
+    template = ASSETS.template(logo_path, empresa_endereco, empresa_tel, bilevel=bilevel)
+    img = renderizar_etiqueta(
+        template,
+        int(reg["id"]),
+        str(reg.get("truss_number") or ""),
+        reg.get("job_number") or "",
+        base_url,
+    )
+    if formato == "png":
+        # Pillow escolhe o formato pela extensão; o destino pode ser um .part
+        img.save(destino, format="PNG", dpi=(DPI, DPI))
+    else:
+        pdf = PdfEtiquetas(destino)
+        pdf.adicionar(codificar_imagem(img))
+        pdf.fechar()
+    return destino
+
+
+def chave_etiqueta_unica(
+    reg: dict,
+    formato: str,
     logo_path: Path,
-    pdf_name: str = "labels.pdf",
-    clean: bool = True,
-    export_json: bool = True,
-) -> Tuple[int, int, Optional[Path]]:
+    base_url: str,
+    empresa_endereco: str,
+    empresa_tel: str,
+    bilevel: bool = False,
+) -> str:
+    """Hash do conteúdo da etiqueta: campos do truss, updated_at e configurações de render."""
+    config = _hash_config(
+        logo_path, base_url, empresa_endereco, empresa_tel, "arquivo", "raster", bilevel
+    )
+    return hash_json([config, formato, _hash_registro(reg), _updated_at(reg)])
+
+
+def registros_de_queryset(qs) -> List[dict]:
     registros = []
     for obj in qs:
         registros.append(
@@ -348,36 +1216,13 @@ def gerar_de_queryset(
                 "endereco": obj.endereco,
                 "tamanho": obj.tamanho,
                 "status": obj.status,
+                "updated_at": getattr(obj, "updated_at", None),
             }
         )
+    return registros
 
-    if export_json:
-        exportar_json(registros, json_dir)
 
-    return gerar_imagens_e_pdf(
-        registros,
-        output_dir,
-        logo_path,
-        base_url,
-        empresa_endereco,
-        empresa_tel,
-        pdf_name=pdf_name,
-        clean=clean,
-    )
-
-
-def gerar_de_csv(
-    csv_path: Path,
-    output_dir: Path,
-    json_dir: Path,
-    base_url: str,
-    empresa_endereco: str,
-    empresa_tel: str,
-    logo_path: Path,
-    pdf_name: str = "labels.pdf",
-    clean: bool = True,
-    export_json: bool = True,
-) -> Tuple[int, int, Optional[Path]]:
+def registros_de_csv(csv_path: Path) -> List[dict]:
     if pd is None:
         raise RuntimeError("pandas não instalado – necessário para CSV.")
     if not csv_path.exists():
@@ -403,9 +1248,95 @@ def gerar_de_csv(
                 "status": row.get("status", ""),
             }
         )
+    return registros
+
+
+def gerar_de_queryset(
+    qs,
+    output_dir: Path,
+    json_dir: Path,
+    base_url: str,
+    empresa_endereco: str,
+    empresa_tel: str,
+    logo_path: Path,
+    pdf_name: str = "labels.pdf",
+    clean: bool = True,
+    export_json: bool = True,
+    copias: str = "hardlink",
+    workers: int = 1,
+    formato_pdf: str = "raster",
+    bilevel: bool = False,
+    incremental: bool = False,
+    saida: str = "ambos",
+    png_compress_level: int = PNG_COMPRESS_LEVEL,
+    png_optimize: bool = False,
+    zip_name: Optional[str] = None,
+    progresso: Optional[Callable[[int, int, int], None]] = None,
+    pdf_paginas_por_parte: Optional[int] = None,
+    pdf_parte_por_job: bool = False,
+    json_formato: str = "arquivos",
+    json_faixa: Optional[int] = None,
+    json_parcial: bool = False,
+) -> Tuple[int, int, Optional[Path]]:
+    registros = registros_de_queryset(qs)
+
+    if export_json:
+        exportar_dados_json(registros, json_dir, json_formato, json_faixa, parcial=json_parcial)
+
+    return gerar_imagens_e_pdf(
+        registros,
+        output_dir,
+        logo_path,
+        base_url,
+        empresa_endereco,
+        empresa_tel,
+        pdf_name=pdf_name,
+        clean=clean,
+        copias=copias,
+        workers=workers,
+        formato_pdf=formato_pdf,
+        bilevel=bilevel,
+        incremental=incremental,
+        saida=saida,
+        png_compress_level=png_compress_level,
+        png_optimize=png_optimize,
+        zip_name=zip_name,
+        progresso=progresso,
+        pdf_paginas_por_parte=pdf_paginas_por_parte,
+        pdf_parte_por_job=pdf_parte_por_job,
+    )
+
+
+def gerar_de_csv(
+    csv_path: Path,
+    output_dir: Path,
+    json_dir: Path,
+    base_url: str,
+    empresa_endereco: str,
+    empresa_tel: str,
+    logo_path: Path,
+    pdf_name: str = "labels.pdf",
+    clean: bool = True,
+    export_json: bool = True,
+    copias: str = "hardlink",
+    workers: int = 1,
+    formato_pdf: str = "raster",
+    bilevel: bool = False,
+    incremental: bool = False,
+    saida: str = "ambos",
+    png_compress_level: int = PNG_COMPRESS_LEVEL,
+    png_optimize: bool = False,
+    zip_name: Optional[str] = None,
+    pdf_paginas_por_parte: Optional[int] = None,
+    pdf_parte_por_job: bool = False,
+    json_formato: str = "arquivos",
+    json_faixa: Optional[int] = None,
+    json_parcial: bool = False,
+) -> Tuple[int, int, Optional[Path]]:
+    registros = registros_de_csv(csv_path)
 
     if export_json:
-        exportar_json(registros, json_dir)
+        exportar_dados_json(registros, json_dir, json_formato, json_faixa, parcial=json_parcial)
 
     return gerar_imagens_e_pdf(
         registros,
@@ -416,4 +1347,15 @@ def gerar_de_csv(
         empresa_tel,
         pdf_name=pdf_name,
         clean=clean,
+        copias=copias,
+        workers=workers,
+        formato_pdf=formato_pdf,
+        bilevel=bilevel,
+        incremental=incremental,
+        saida=saida,
+        png_compress_level=png_compress_level,
+        png_optimize=png_optimize,
+        zip_name=zip_name,
+        pdf_paginas_por_parte=pdf_paginas_por_parte,
+        pdf_parte_por_job=pdf_parte_por_job,
     )
\ No newline at end of file
@@ -0,0 +1,227 @@
+from pathlib import Path
+from typing import List, Union
+
+from PIL import Image, ImageDraw
+
+from apps.qrcode_app.services.labels import (
+    CENTRO_H,
+    CENTRO_W,
+    CENTRO_X,
+    CENTRO_Y,
+    FAIXA_H,
+    FAIXA_W,
+    FAIXA_X,
+    FAIXA_Y_BASE,
+    FAIXA_Y_TOPO,
+    FINAL_HEIGHT,
+    FINAL_WIDTH,
+    QR_CACHE,
+    QR_CENTRO_SIZE,
+    QR_SMALL_SIZE,
+    SUB_H,
+    SUB_W,
+    FontBundle,
+    build_fonts,
+    carregar_logo,
+)
+from apps.qrcode_app.services.pdf_writer import PaginaVetorial, PdfEtiquetas
+
+# Mesmo layout de labels.py, mas os módulos do QR viram retângulos e os
+# textos viram texto PDF com fonte embutida. As coordenadas são as mesmas
+# do canvas raster (pixels, origem no topo): cada página começa com uma
+# matriz que inverte o eixo Y.
+
+
+def _pdf_str(texto: str) -> str:
+    b = str(texto).encode("cp1252", errors="replace").decode("latin-1")
+    return "(" + b.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def _caminho_fonte(font) -> str:
+    path = getattr(font, "path", None)
+    if not path:
+        raise RuntimeError("PDF vetorial exige fontes TrueType (fonte padrão do Pillow não pode ser embutida).")
+    return str(path)
+
+
+def _achatar(logo: Image.Image) -> Image.Image:
+    # Logo RGBA sobre fundo branco, como fica no canvas raster
+    fundo = Image.new("RGB", logo.size, "white")
+    fundo.paste(logo, (0, 0), mask=logo)
+    return fundo
+
+
+def _caminho_qr(n: int, pixels: bytes) -> str:
+    """Módulos escuros como retângulos em unidades de módulo (runs horizontais unidos)."""
+    partes = []
+    for lin in range(n):
+        linha = pixels[lin * n:(lin + 1) * n]
+        col = 0
+        while col < n:
+            if linha[col] == 0:
+                inicio = col
+                while col < n and linha[col] == 0:
+                    col += 1
+                partes.append(f"{inicio} {lin} {col - inicio} 1 re")
+            else:
+                col += 1
+    return " ".join(partes) + " f"
+
+
+class LabelTemplateVetorial:
+    """
+    Equivalente vetorial de LabelTemplate: fontes, logos e o conteúdo
+    invariante (logos, legendas, endereço) são registrados uma vez no PDF;
+    cada página só desenha os QR Codes e os textos variáveis.
+    """
+
+    def __init__(
+        self,
+        fonts: FontBundle,
+        logo_small: Image.Image,
+        logo_c: Image.Image,
+        empresa_endereco: str,
+        empresa_tel: str,
+    ):
+        self.fonts = fonts
+        self.logo_small = logo_small
+        self.logo_c = logo_c
+        self.empresa_endereco = empresa_endereco
+        self.empresa_tel = empresa_tel
+        self._nomes_fonte = {}
+        for font in (fonts.reg22, fonts.reg30, fonts.bold85, fonts.bold120):
+            path = _caminho_fonte(font)
+            self._nomes_fonte.setdefault(path, f"F{len(self._nomes_fonte) + 1}")
+
+    def _texto(self, font, texto: str, x: float, y_topo: float) -> str:
+        # Pillow posiciona pelo topo (ascender); no PDF o Tm recebe a baseline
+        nome = self._nomes_fonte[_caminho_fonte(font)]
+        baseline = y_topo + font.getmetrics()[0]
+        return f"BT /{nome} {font.size} Tf 1 0 0 -1 {x:.2f} {baseline:.2f} Tm {_pdf_str(texto)} Tj ET"
+
+    @staticmethod
+    def _imagem(nome: str, img: Image.Image, x: float, y: float) -> str:
+        return f"q {img.width} 0 0 {-img.height} {x} {y + img.height} cm /{nome} Do Q"
+
+    @staticmethod
+    def _rotacao_90(x: float, y: float, largura_original: int) -> str:
+        # Mesmo efeito de Image.rotate(90, expand=True) colado em (x, y)
+        return f"0 -1 1 0 {x} {y + largura_original} cm"
+
+    def _conteudo_template(self) -> bytes:
+        fonts = self.fonts
+        ops: List[str] = []
+
+        for y_pos in (FAIXA_Y_TOPO, FAIXA_Y_BASE):
+            logo_y = y_pos + (FAIXA_H - self.logo_small.height) // 2
+            ops.append(self._imagem("LogoS", self.logo_small, FAIXA_X + 20, logo_y))
+            label_text = "Truss ID:"
+            lw = fonts.reg22.getlength(label_text)
+            ops.append(self._texto(fonts.reg22, label_text, FAIXA_X + (FAIXA_W - lw) // 2, y_pos + 5))
+
+        # Endereço/telefone rotacionados, mesma caixa do raster
+        font_small = fonts.reg22
+        linhas = [str(self.empresa_endereco), str(self.empresa_tel)]
+        end_text = "\n".join(linhas)
+        ddraw = ImageDraw.Draw(Image.new("RGBA", (1, 1), "white"))
+        bbox = ddraw.textbbox((0, 0), end_text, font=font_small)
+        text_w = bbox[2] - bbox[0]
+        text_h = bbox[3] - bbox[1]
+        sub_w, sub_h = text_w + 80, text_h + 60
+        end_x = (sub_w - text_w) // 2
+        end_y = (sub_h - text_h) // 2
+        espacamento = ddraw.textbbox((0, 0), "A", font=font_small)[3] + 4
+        larguras = [font_small.getlength(linha) for linha in linhas]
+
+        x = CENTRO_X + CENTRO_W - sub_h - 5
+        y = CENTRO_Y + (CENTRO_H - sub_w) // 2
+        ops.append("q " + self._rotacao_90(x, y, sub_w))
+        for i, linha in enumerate(linhas):
+            lx = end_x + (max(larguras) - larguras[i]) / 2
+            ops.append(self._texto(font_small, linha, lx, end_y + i * espacamento))
+        ops.append("Q")
+        return "\n".join(ops).encode("latin-1")
+
+    def registrar_recursos(self, pdf: PdfEtiquetas):
+        for path, nome in self._nomes_fonte.items():
+            pdf.registrar_fonte(nome, path)
+        pdf.registrar_imagem("LogoS", _achatar(self.logo_small))
+        pdf.registrar_imagem("LogoC", _achatar(self.logo_c))
+        pdf.registrar_form("Tpl", self._conteudo_template(), FINAL_WIDTH, FINAL_HEIGHT)
+
+    def pagina(
+        self,
+        truss_id: Union[int, str],
+        truss_number: str,
+        job_number: str,
+        base_url: str,
+        resolucao: float = 72.0,
+    ) -> PaginaVetorial:
+        fonts = self.fonts
+        escala = 72.0 / resolucao
+        n, pixels = QR_CACHE.matriz(f"{base_url}/{truss_id}")
+        qr = _caminho_qr(n, pixels)
+
+        def desenhar_qr(x: float, y: float, size: int) -> str:
+            m = size / n
+            return f"q {m:.4f} 0 0 {m:.4f} {x} {y} cm {qr} Q"
+
+        ops = [
+            f"{escala:.4f} 0 0 {-escala:.4f} 0 {FINAL_HEIGHT * escala:.2f} cm",
+            "/Tpl Do",
+        ]
+
+        tn = str(truss_number or "")
+        for y_pos in (FAIXA_Y_TOPO, FAIXA_Y_BASE):
+            ops.append(desenhar_qr(
+                FAIXA_X + FAIXA_W - QR_SMALL_SIZE - 20,
+                y_pos + (FAIXA_H - QR_SMALL_SIZE) // 2,
+                QR_SMALL_SIZE,
+            ))
+            nw = fonts.bold85.getlength(tn)
+            # Recorte na faixa, como no raster
+            ops.append(f"q {FAIXA_X} {y_pos} {FAIXA_W} {FAIXA_H} re W n")
+            ops.append(self._texto(fonts.bold85, tn, FAIXA_X + (FAIXA_W - nw) // 2, y_pos + 35))
+            ops.append("Q")
+
+        qr_x = CENTRO_X + 10
+        ops.append(desenhar_qr(qr_x, CENTRO_Y + (CENTRO_H - QR_CENTRO_SIZE) // 2, QR_CENTRO_SIZE))
+
+        # Sub-bloco rotacionado (logo + job + número)
+        sub_x = qr_x + QR_CENTRO_SIZE + 20
+        sub_y = CENTRO_Y + (CENTRO_H - SUB_W) // 2
+        ops.append("q " + self._rotacao_90(sub_x, sub_y, SUB_W))
+        ops.append(f"0 0 {SUB_W} {SUB_H} re W n")
+        ly = 10
+        ops.append(self._imagem("LogoC", self.logo_c, (SUB_W - self.logo_c.width) // 2, ly))
+        ty = ly + self.logo_c.height + 40
+        if job_number:
+            job_text = f"Job: {job_number}"
+            jw = fonts.reg30.getlength(job_text)
+            ops.append(self._texto(fonts.reg30, job_text, (SUB_W - jw) // 2, ty))
+            ty += 70
+        label_text = "Truss ID:"
+        lw = fonts.reg30.getlength(label_text)
+        ops.append(self._texto(fonts.reg30, label_text, (SUB_W - lw) // 2, ty))
+        ty += 50
+        nw = fonts.bold120.getlength(tn)
+        ops.append(self._texto(fonts.bold120, tn, (SUB_W - nw) // 2, ty))
+        ops.append("Q")
+
+        return PaginaVetorial(FINAL_WIDTH, FINAL_HEIGHT, "\n".join(ops).encode("latin-1"))
+
+
+def build_label_template_vetorial(
+    logo_path: Path,
+    empresa_endereco: str,
+    empresa_tel: str,
+    fonts: FontBundle = None,
+) -> LabelTemplateVetorial:
+    fonts = fonts or build_fonts()
+    return LabelTemplateVetorial(
+        fonts,
+        carregar_logo(logo_path, 250),
+        carregar_logo(logo_path, 400),
+        empresa_endereco,
+        empresa_tel,
+    )
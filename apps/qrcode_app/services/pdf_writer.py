@@ -0,0 +1,431 @@
+import io
+import json
+import math
+import os
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from PIL import Image, ImageFont, features
+
+try:
+    from fontTools import subset as ft_subset  # Opcional: reduz as fontes do PDF vetorial
+    from fontTools.ttLib import TTFont
+except Exception:
+    ft_subset = None  # type: ignore
+
+
+class ImagemPdf:
+    """Imagem já codificada como XObject de PDF (dicionário + stream)."""
+
+    def __init__(self, largura: int, altura: int, dicionario: str, dados: bytes):
+        self.largura = largura
+        self.altura = altura
+        self.dicionario = dicionario
+        self.dados = dados
+
+
+def _ccitt_g4(img: Image.Image) -> bytes:
+    # libtiff codifica em Group 4 numa única strip; extraímos só os dados dela
+    buf = io.BytesIO()
+    w, h = img.size
+    img.save(buf, "TIFF", compression="group4", strip_size=math.ceil(w / 8) * h)
+    buf.seek(0)
+    tags = Image.open(buf).tag_v2
+    inicio, tamanho = tags[273][0], tags[279][0]
+    return buf.getvalue()[inicio:inicio + tamanho]
+
+
+def codificar_imagem(img: Image.Image, nivel_zlib: int = 6) -> ImagemPdf:
+    w, h = img.size
+    base = f"/Type /XObject /Subtype /Image /Width {w} /Height {h} /ColorSpace /DeviceGray"
+
+    if img.mode == "1":
+        # Etiqueta bilevel: CCITT G4 (mesmo esquema do PdfImagePlugin do Pillow)
+        if features.check("libtiff"):
+            dicionario = (
+                f"{base} /BitsPerComponent 1 /Filter /CCITTFaxDecode "
+                f"/DecodeParms << /K -1 /BlackIs1 true /Columns {w} /Rows {h} >>"
+            )
+            return ImagemPdf(w, h, dicionario, _ccitt_g4(img))
+        # Sem libtiff: 1 bit por pixel compactado com Flate (1 = branco)
+        dicionario = f"{base} /BitsPerComponent 1 /Filter /FlateDecode"
+        return ImagemPdf(w, h, dicionario, zlib.compress(img.tobytes(), nivel_zlib))
+
+    if img.mode == "L":
+        dicionario = f"{base} /BitsPerComponent 8 /Filter /FlateDecode"
+        return ImagemPdf(w, h, dicionario, zlib.compress(img.tobytes(), nivel_zlib))
+
+    # Flate sem perdas: bordas do QR ficam nítidas (Pillow usaria JPEG)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    dados = zlib.compress(img.tobytes(), nivel_zlib)
+    dicionario = (
+        f"/Type /XObject /Subtype /Image /Width {w} /Height {h} "
+        f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode"
+    )
+    return ImagemPdf(w, h, dicionario, dados)
+
+
+class PaginaVetorial:
+    """Página vetorial: stream de conteúdo (Flate) que usa os recursos compartilhados."""
+
+    def __init__(self, largura: int, altura: int, conteudo: bytes, nivel_zlib: int = 6):
+        self.largura = largura
+        self.altura = altura
+        self.dados = zlib.compress(conteudo, nivel_zlib)
+
+    @classmethod
+    def comprimida(cls, largura: int, altura: int, dados: bytes) -> "PaginaVetorial":
+        """Página a partir do stream já comprimido (ex.: cache do manifesto)."""
+        pagina = cls.__new__(cls)
+        pagina.largura = largura
+        pagina.altura = altura
+        pagina.dados = dados
+        return pagina
+
+
+@lru_cache(maxsize=8)
+def _ttf_embutido(path: str) -> bytes:
+    """
+    TrueType reduzido aos glifos do WinAnsiEncoding (o único que as páginas
+    usam): o DejaVu inteiro tem ~700 KB e iria para cada PDF/parte. O texto
+    das páginas só é conhecido depois da fonte registrada, por isso o corte é
+    pela codificação e não pelos caracteres usados. Sem fontTools, embute o
+    arquivo inteiro.
+    """
+    with open(path, "rb") as f:
+        ttf = f.read()
+    if ft_subset is None:
+        return ttf
+    opcoes = ft_subset.Options()
+    opcoes.hinting = False
+    opcoes.layout_features = []
+    opcoes.name_IDs = [1, 2, 3, 4, 6]
+    opcoes.notdef_outline = True
+    opcoes.drop_tables += ["FFTM"]
+    fonte = TTFont(io.BytesIO(ttf))
+    subsetter = ft_subset.Subsetter(opcoes)
+    texto = bytes(range(32, 256)).decode("cp1252", errors="ignore")
+    subsetter.populate(unicodes={ord(ch) for ch in texto})
+    subsetter.subset(fonte)
+    saida = io.BytesIO()
+    fonte.save(saida)
+    return saida.getvalue()
+
+
+def _objetos_fonte(path: str) -> Tuple[bytes, str, str]:
+    """
+    Fonte TrueType simples (WinAnsiEncoding) com o arquivo embutido.
+    Retorna (arquivo_ttf, descritor_sem_FontFile2, dicionario_sem_descritor).
+    """
+    ttf = _ttf_embutido(path)
+    ft = ImageFont.truetype(path, 1000)
+    familia, estilo = ft.getname()
+    base = familia.replace(" ", "")
+    if estilo and estilo.lower() not in ("book", "regular"):
+        base += "-" + estilo.replace(" ", "")
+    if ft_subset is not None:
+        # Fonte parcial: o PDF pede um prefixo de 6 letras no nome (ex.: "AAAAAA+DejaVuSans")
+        tag = "".join(chr(ord("A") + b % 26) for b in zlib.crc32(path.encode()).to_bytes(4, "big") + b"\0\0")
+        base = f"{tag}+{base}"
+    ascent, descent = ft.getmetrics()
+
+    larguras = []
+    for code in range(32, 256):
+        ch = bytes([code]).decode("cp1252", errors="ignore")
+        larguras.append(str(round(ft.getlength(ch))) if ch else "0")
+
+    descritor = (
+        f"/Type /FontDescriptor /FontName /{base} /Flags 32 "
+        f"/FontBBox [-200 {-descent} 1200 {ascent}] /ItalicAngle 0 "
+        f"/Ascent {ascent} /Descent {-descent} /CapHeight {ascent} /StemV 80"
+    )
+    dicionario = (
+        f"/Type /Font /Subtype /TrueType /BaseFont /{base} "
+        f"/FirstChar 32 /LastChar 255 /Widths [{' '.join(larguras)}] "
+        f"/Encoding /WinAnsiEncoding"
+    )
+    return ttf, descritor, dicionario
+
+
+class PdfEtiquetas:
+    """
+    Escritor de PDF em streaming para etiquetas de página inteira.
+    Cada imagem é gravada no disco assim que adicionada (uma única vez como
+    XObject; cópias são páginas que referenciam o mesmo objeto) e o arquivo
+    é descarregado a cada página, então a memória não cresce com o lote.
+    O PDF é escrito em `<nome>.part` e renomeado apenas em `fechar()`.
+    """
+
+    def __init__(self, path: Path, resolucao: float = 72.0):
+        # 72 = mesmo tamanho de página que o Pillow usava por padrão
+        self.path = Path(path)
+        self.resolucao = resolucao
+        self._tmp_path = self.path.with_name(self.path.name + ".part")
+        self._f = open(self._tmp_path, "wb")
+        self._f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        # 1 = Catalog e 2 = Pages são gravados por último, em fechar()
+        self._offsets = {}
+        self._proximo_num = 3
+        self._kids: List[int] = []
+        # Recursos compartilhados pelas páginas vetoriais (fontes, logos, template)
+        self._fontes: Dict[str, int] = {}
+        self._xobjects: Dict[str, int] = {}
+        self._num_recursos: Optional[int] = None
+
+    def __len__(self):
+        return len(self._kids)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.fechar()
+        else:
+            self.abortar()
+        return False
+
+    def _escrever_obj(self, corpo: bytes, num: Optional[int] = None) -> int:
+        if num is None:
+            num = self._proximo_num
+            self._proximo_num += 1
+        self._offsets[num] = self._f.tell()
+        self._f.write(f"{num} 0 obj\n".encode("ascii"))
+        self._f.write(corpo)
+        self._f.write(b"\nendobj\n")
+        return num
+
+    def adicionar_imagem(self, img: Image.Image) -> tuple:
+        return self.adicionar_imagem_codificada(codificar_imagem(img))
+
+    def adicionar_imagem_codificada(self, imagem: ImagemPdf) -> tuple:
+        w_pt = imagem.largura * 72.0 / self.resolucao
+        h_pt = imagem.altura * 72.0 / self.resolucao
+        num_img = self._escrever_obj(_stream(imagem.dicionario, imagem.dados))
+        conteudo = f"q {w_pt:.2f} 0 0 {h_pt:.2f} 0 0 cm /Im0 Do Q".encode("ascii")
+        num_cont = self._escrever_obj(_stream("", conteudo))
+        return (num_img, num_cont, w_pt, h_pt)
+
+    def adicionar_pagina(self, ref: tuple, copias: int = 1):
+        num_img, num_cont, w_pt, h_pt = ref
+        pagina = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {w_pt:.2f} {h_pt:.2f}] "
+            f"/Resources << /XObject << /Im0 {num_img} 0 R >> >> "
+            f"/Contents {num_cont} 0 R >>"
+        ).encode("ascii")
+        for _ in range(copias):
+            self._kids.append(self._escrever_obj(pagina))
+        self._f.flush()
+
+    def _recursos(self) -> int:
+        # Reservado na primeira utilização e gravado em fechar(), com tudo registrado
+        if self._num_recursos is None:
+            self._num_recursos = self._proximo_num
+            self._proximo_num += 1
+        return self._num_recursos
+
+    def registrar_fonte(self, nome: str, path: str):
+        if nome in self._fontes:
+            return
+        ttf, descritor, dicionario = _objetos_fonte(path)
+        dados = zlib.compress(ttf, 6)
+        num_arquivo = self._escrever_obj(
+            _stream(f"/Length1 {len(ttf)} /Filter /FlateDecode", dados)
+        )
+        num_desc = self._escrever_obj(f"<< {descritor} /FontFile2 {num_arquivo} 0 R >>".encode("ascii"))
+        self._fontes[nome] = self._escrever_obj(
+            f"<< {dicionario} /FontDescriptor {num_desc} 0 R >>".encode("ascii")
+        )
+
+    def registrar_imagem(self, nome: str, img: Image.Image):
+        if nome in self._xobjects:
+            return
+        imagem = codificar_imagem(img)
+        self._xobjects[nome] = self._escrever_obj(_stream(imagem.dicionario, imagem.dados))
+
+    def registrar_form(self, nome: str, conteudo: bytes, largura: int, altura: int):
+        """Form XObject (conteúdo reutilizável) com os recursos compartilhados."""
+        if nome in self._xobjects:
+            return
+        dados = zlib.compress(conteudo, 6)
+        dicionario = (
+            f"/Type /XObject /Subtype /Form /BBox [0 0 {largura} {altura}] "
+            f"/Resources {self._recursos()} 0 R /Filter /FlateDecode"
+        )
+        self._xobjects[nome] = self._escrever_obj(_stream(dicionario, dados))
+
+    def adicionar_pagina_vetorial(self, pagina: PaginaVetorial, copias: int = 1):
+        w_pt = pagina.largura * 72.0 / self.resolucao
+        h_pt = pagina.altura * 72.0 / self.resolucao
+        num_cont = self._escrever_obj(_stream("/Filter /FlateDecode", pagina.dados))
+        corpo = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {w_pt:.2f} {h_pt:.2f}] "
+            f"/Resources {self._recursos()} 0 R /Contents {num_cont} 0 R >>"
+        ).encode("ascii")
+        for _ in range(copias):
+            self._kids.append(self._escrever_obj(corpo))
+        self._f.flush()
+
+    def adicionar(self, pagina: Union[ImagemPdf, PaginaVetorial], copias: int = 1):
+        if isinstance(pagina, PaginaVetorial):
+            self.adicionar_pagina_vetorial(pagina, copias=copias)
+        else:
+            self.adicionar_pagina(self.adicionar_imagem_codificada(pagina), copias=copias)
+
+    def fechar(self) -> Optional[Path]:
+        """Finaliza o PDF. Retorna o caminho, ou None se não houve páginas."""
+        if not self._kids:
+            self.abortar()
+            return None
+
+        if self._num_recursos is not None:
+            fontes = " ".join(f"/{n} {num} 0 R" for n, num in self._fontes.items())
+            xobjs = " ".join(f"/{n} {num} 0 R" for n, num in self._xobjects.items())
+            self._escrever_obj(
+                f"<< /Font << {fontes} >> /XObject << {xobjs} >> >>".encode("ascii"),
+                num=self._num_recursos,
+            )
+        self._escrever_obj(b"<< /Type /Catalog /Pages 2 0 R >>", num=1)
+        self._escrever_obj((
+            f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in self._kids)}] "
+            f"/Count {len(self._kids)} >>"
+        ).encode("ascii"), num=2)
+        _escrever_xref(self._f, [self._offsets[n] for n in range(1, self._proximo_num)])
+        self._f.close()
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def abortar(self):
+        self._f.close()
+        try:
+            self._tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class PdfEmPartes:
+    """
+    Sequência de PDFs numerados (<prefixo>_001.pdf, ...) fechados a cada
+    `max_paginas` páginas e/ou quando o `grupo` muda (ex.: job_number).
+    Cada parte é publicada assim que fica pronta e o manifesto
+    <prefixo>_partes.json é regravado (atomicamente), para a estação de
+    impressão começar pela parte 1 enquanto as outras ainda renderizam.
+    `ao_abrir(pdf)` é chamado em cada parte nova (recursos do PDF vetorial).
+    """
+
+    def __init__(
+        self,
+        pasta: Path,
+        prefixo: str,
+        max_paginas: Optional[int] = None,
+        ao_abrir: Optional[Callable[[PdfEtiquetas], None]] = None,
+        resolucao: float = 72.0,
+    ):
+        self.pasta = Path(pasta)
+        self.prefixo = prefixo
+        self.max_paginas = max_paginas
+        self.ao_abrir = ao_abrir
+        self.resolucao = resolucao
+        self.manifesto_path = self.pasta / f"{prefixo}_partes.json"
+        self.partes: List[dict] = []
+        self._atual: Optional[PdfEtiquetas] = None
+        self._grupo = None
+        self._paginas = 0
+        self._gravar_manifesto("em_andamento")
+
+    def __len__(self):
+        return self._paginas
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.fechar()
+        else:
+            self.abortar()
+        return False
+
+    def _gravar_manifesto(self, status: str):
+        dados = {
+            "status": status,
+            "paginas": self._paginas,
+            "partes": self.partes,
+        }
+        tmp = self.manifesto_path.with_name(self.manifesto_path.name + ".tmp")
+        tmp.write_text(json.dumps(dados, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.manifesto_path)
+
+    def _abrir(self):
+        numero = len(self.partes) + 1
+        self._atual = PdfEtiquetas(self.pasta / f"{self.prefixo}_{numero:03d}.pdf", self.resolucao)
+        if self.ao_abrir is not None:
+            self.ao_abrir(self._atual)
+
+    def _fechar_parte(self):
+        pdf, self._atual = self._atual, None
+        paginas = len(pdf)
+        path = pdf.fechar()
+        if path is None:
+            return
+        self.partes.append({
+            "parte": len(self.partes) + 1,
+            "arquivo": path.name,
+            "paginas": paginas,
+            "grupo": self._grupo,
+            "bytes": path.stat().st_size,
+        })
+        self._gravar_manifesto("em_andamento")
+
+    def adicionar(self, pagina: Union[ImagemPdf, PaginaVetorial], copias: int = 1, grupo=None):
+        if grupo != self._grupo and self._atual is not None and len(self._atual):
+            self._fechar_parte()
+        self._grupo = grupo
+        restantes = copias
+        while restantes > 0:
+            if self._atual is None:
+                self._abrir()
+            cabe = restantes
+            if self.max_paginas:
+                cabe = min(restantes, self.max_paginas - len(self._atual))
+            self._atual.adicionar(pagina, copias=cabe)
+            restantes -= cabe
+            self._paginas += cabe
+            if self.max_paginas and len(self._atual) >= self.max_paginas:
+                self._fechar_parte()
+
+    def fechar(self) -> Optional[Path]:
+        """Fecha a última parte. Retorna o manifesto, ou None se não houve páginas."""
+        if self._atual is not None:
+            self._fechar_parte()
+        if not self.partes:
+            self.manifesto_path.unlink(missing_ok=True)
+            return None
+        self._gravar_manifesto("concluido")
+        return self.manifesto_path
+
+    def abortar(self):
+        # Partes já publicadas ficam (podem estar sendo impressas)
+        if self._atual is not None:
+            self._atual.abortar()
+            self._atual = None
+        self._gravar_manifesto("abortado")
+
+
+def _stream(dicionario: str, dados: bytes) -> bytes:
+    cabecalho = f"<< {dicionario} /Length {len(dados)} >>\nstream\n".encode("ascii")
+    return cabecalho + dados + b"\nendstream"
+
+
+def _escrever_xref(f, offsets: List[int]):
+    inicio = f.tell()
+    f.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode("ascii"))
+    for off in offsets:
+        f.write(f"{off:010d} 00000 n \n".encode("ascii"))
+    f.write((
+        f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{inicio}\n%%EOF\n"
+    ).encode("ascii"))
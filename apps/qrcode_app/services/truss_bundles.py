@@ -0,0 +1,180 @@
+import gzip
+import hashlib
+import json
+import re
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from apps.qrcode_app.services.label_manifest import gravar_atomico
+
+BUNDLES_DIR = "bundles"
+INDICE_NOME = "index.json"
+BUNDLES_VERSAO = 1
+SUFIXO_BUNDLE = ".ndjson.gz"
+SUFIXO_OFFSETS = ".idx.json"
+
+
+def serialize_value(v):
+    if isinstance(v, Decimal):
+        # Mantemos como string para não perder precisão e evitar float estranho
+        return str(v)
+    if v is None:
+        return ""
+    return v
+
+
+def dados_truss(item: dict) -> dict:
+    """Campos públicos de um truss, como a página de detalhe consome."""
+    return {
+        "id": int(item["id"]),
+        "job_number": serialize_value(item.get("job_number")),
+        "truss_number": str(serialize_value(item.get("truss_number"))),
+        "tipo": serialize_value(item.get("tipo")),
+        "quantidade": serialize_value(item.get("quantidade")),
+        "ply": serialize_value(item.get("ply")),
+        "endereco": serialize_value(item.get("endereco")),
+        "tamanho": serialize_value(item.get("tamanho")),
+        "status": serialize_value(item.get("status")),
+    }
+
+
+def _nome_job(job: str) -> str:
+    if not job:
+        return "job-sem-numero"
+    limpo = re.sub(r"[^A-Za-z0-9_-]+", "_", job).strip("_")
+    if limpo == job:
+        return f"job-{limpo}"
+    # "JOB 77" e "JOB_77" não podem cair no mesmo arquivo
+    sufixo = hashlib.sha1(job.encode("utf-8")).hexdigest()[:8]
+    return f"job-{limpo or 'x'}-{sufixo}"
+
+
+def _faixas_ids(ids: List[int]) -> List[List[int]]:
+    # [1,2,3,7,8] -> [[1,3],[7,8]]; jobs importados juntos costumam virar uma faixa só
+    faixas: List[List[int]] = []
+    for tid in sorted(ids):
+        if faixas and tid == faixas[-1][1] + 1:
+            faixas[-1][1] = tid
+        else:
+            faixas.append([tid, tid])
+    return faixas
+
+
+def _ler_bundle(path: Path) -> List[dict]:
+    try:
+        with gzip.open(path, "rb") as f:
+            return [json.loads(linha) for linha in f if linha.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def _gravar_se_mudou(path: Path, dados: bytes) -> bool:
+    # Conteúdo igual não é regravado: mtime/ETag do arquivo servido continuam
+    try:
+        if path.read_bytes() == dados:
+            return False
+    except FileNotFoundError:
+        pass
+    gravar_atomico(path, dados)
+    return True
+
+
+def exportar_json_bundles(
+    qs_like: Iterable[dict],
+    bundles_dir: Path,
+    faixa: Optional[int] = None,
+    parcial: bool = False,
+):
+    """
+    Alternativa ao exportar_json (um arquivo por truss): grava um bundle
+    NDJSON compactado com gzip por job_number ou, com `faixa`, por faixa de
+    `faixa` ids. Cada bundle tem um índice de offsets ao lado
+    (<nome>.idx.json: id -> [início, tamanho] na linha descompactada), e o
+    index.json lista os bundles com as faixas de ids de cada um, para achar
+    o bundle de um id sem abrir nenhum. Tudo é gravado via arquivo temporário
+    + rename, e só bundles cujo conteúdo mudou são regravados; bundles que
+    sumiram da exportação são removidos no fim. Com `parcial` (seleção
+    filtrada), os registros são mesclados aos bundles existentes e nada é
+    removido. É só exportação: nada no projeto lê os bundles (a página de
+    detalhe vem do banco); índice e offsets são para quem consome os arquivos.
+    """
+    bundles_dir.mkdir(parents=True, exist_ok=True)
+    grupos: Dict[str, List[dict]] = {}
+    jobs: Dict[str, str] = {}
+    anterior = {}
+    if parcial:
+        try:
+            with (bundles_dir / INDICE_NOME).open("r", encoding="utf-8") as f:
+                anterior = json.load(f)
+        except (FileNotFoundError, ValueError):
+            anterior = {}
+        if anterior.get("versao") != BUNDLES_VERSAO or anterior.get("faixa") != faixa:
+            anterior = {}
+        jobs.update(anterior.get("jobs", {}))
+    novos: Dict[str, dict] = {}
+    for item in qs_like:
+        data = dados_truss(item)
+        if faixa:
+            inicio = data["id"] // faixa * faixa
+            nome = f"faixa-{inicio}-{inicio + faixa - 1}"
+        else:
+            job = str(data["job_number"])
+            nome = jobs.setdefault(job, _nome_job(job))
+        grupos.setdefault(nome, []).append(data)
+        novos[str(data["id"])] = data
+
+    bundles = dict(anterior.get("bundles", {}))
+    if anterior:
+        # Um truss que mudou de job sai do bundle antigo; os demais registros
+        # dos bundles tocados são mantidos
+        for nome, bundle in anterior.get("bundles", {}).items():
+            ids = [tid for ini, fim in bundle["ids"] for tid in range(ini, fim + 1)]
+            if nome not in grupos and not any(str(tid) in novos for tid in ids):
+                continue
+            mantidos = [d for d in _ler_bundle(bundles_dir / bundle["arquivo"]) if str(d["id"]) not in novos]
+            grupos.setdefault(nome, []).extend(mantidos)
+
+    gravados = 0
+    for nome, itens in grupos.items():
+        if not itens:
+            bundles.pop(nome, None)
+            continue
+        itens.sort(key=lambda d: d["id"])
+        linhas = bytearray()
+        offsets = {}
+        for data in itens:
+            linha = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+            offsets[str(data["id"])] = [len(linhas), len(linha)]
+            linhas += linha
+        # mtime=0: mesmo conteúdo gera os mesmos bytes (ETag estável no static)
+        compactado = gzip.compress(bytes(linhas), compresslevel=9, mtime=0)
+        gravados += _gravar_se_mudou(bundles_dir / f"{nome}{SUFIXO_BUNDLE}", compactado)
+        _gravar_se_mudou(
+            bundles_dir / f"{nome}{SUFIXO_OFFSETS}",
+            json.dumps(offsets, separators=(",", ":")).encode("utf-8"),
+        )
+        bundles[nome] = {
+            "arquivo": f"{nome}{SUFIXO_BUNDLE}",
+            "trusses": len(itens),
+            "bytes": len(compactado),
+            "ids": _faixas_ids([d["id"] for d in itens]),
+        }
+
+    indice = {
+        "versao": BUNDLES_VERSAO,
+        "agrupamento": "faixa" if faixa else "job",
+        "faixa": faixa,
+        "jobs": {job: nome for job, nome in jobs.items() if nome in bundles},
+        "bundles": {nome: bundles[nome] for nome in sorted(bundles)},
+    }
+    _gravar_se_mudou(bundles_dir / INDICE_NOME, json.dumps(indice, ensure_ascii=False).encode("utf-8"))
+
+    for f in bundles_dir.iterdir():
+        for sufixo in (SUFIXO_BUNDLE, SUFIXO_OFFSETS):
+            if f.name.endswith(sufixo) and f.name[: -len(sufixo)] not in bundles:
+                f.unlink()
+
+    total = sum(b["trusses"] for b in bundles.values())
+    print(f"📦 {total} trusses em {len(bundles)} bundles ({gravados} regravados): {bundles_dir}")
+
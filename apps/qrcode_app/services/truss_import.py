@@ -0,0 +1,625 @@
+import csv
+import re
+from contextlib import contextmanager
+from datetime import date, datetime, time
+from decimal import Decimal, InvalidOperation
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxLengthValidator
+from django.db import connection, models, transaction
+from django.db.backends.utils import format_number
+from django.db.utils import IntegrityError
+
+from apps.django_apps.accounts.models import Truss
+from apps.qrcode_app.services.trusses import invalidar_cache_truss
+
+try:
+    import openpyxl  # Opcional: só exigido se importar .xlsx
+except Exception:
+    openpyxl = None  # type: ignore
+
+EXTENSOES_XLSX = (".xlsx", ".xlsm")
+
+# Aliases: coluna normalizada → campo do modelo
+# Para cada campo do modelo definimos os possíveis nomes (normalizados) das colunas de origem
+ALIAS_MAP = {
+    "id": ["id"],
+    "truss_number": ["truss_number", "truss_num", "trussnumber"],
+    "tipo": ["truss_type", "type"],
+    "quantidade": ["qnty", "qty", "quantity"],
+    "ply": ["ply"],
+    # Job_Reference está sendo usado como endereço nesta nova planilha
+    "endereco": ["job_reference", "address", "endereco", "location"],
+    # 'Size (ft)' -> tamanho
+    "tamanho": ["size_ft", "size", "size_ft_", "size_ft__",
+                "size_ft__", "size_ft___", "size_ft____", "size_ft_____", "size_ft______", "size_ft_______",
+                "size_ft________", "size", "size_ft", "size_ft_", "size_ft__", "size_ft___", "size_ft____",
+                "size_ft_____", "size_ft______", "size_ft_______", "size_ft________", "size_ft_________",
+                "size_ft__________", "size_ft___________", "size_ft____________", "size_ft_____________",
+                "size_ft______________", "size_ft_______________", "size_ft________________"],
+    # Normalizado de "Size (ft)" vira "size_ft"
+    "status": ["status"],
+    # Campos do modelo que podem ficar vazios se ausentes
+    "job_number": ["job_number", "job", "job_ref", "jobreference"],  # no CSV novo não veio; ficará ""
+}
+
+# Campos obrigatórios mínimos para processar
+CAMPOS_OBRIGATORIOS = {"id", "truss_number"}
+
+# Gravados no upsert; created_at fica de fora para preservar a data de criação
+CAMPOS_UPSERT = ["truss_number", "tipo", "quantidade", "ply", "endereco", "tamanho", "status", "job_number", "updated_at"]
+# Comparados para detectar mudança (updated_at sempre muda, não entra)
+CAMPOS_COMPARADOS = [c for c in CAMPOS_UPSERT if c != "updated_at"]
+
+CRIADO, ATUALIZADO, INALTERADO = "criado", "atualizado", "inalterado"
+
+
+def normalize_col(name: str) -> str:
+    """
+    Normaliza o nome da coluna:
+    - lower
+    - troca caracteres não alfanuméricos por '_'
+    - remove '_' duplicados
+    """
+    n = re.sub(r'[^0-9a-zA-Z]+', '_', name.strip().lower())
+    n = re.sub(r'_+', '_', n).strip('_')
+    return n
+
+
+def build_reverse_lookup(fieldnames) -> Dict[str, str]:
+    """
+    Retorna dict: nome_do_campo_modelo -> nome_da_coluna_original (primeiro alias que encontrar)
+    """
+    normalized_mapping = {normalize_col(c): c for c in fieldnames}
+    result = {}
+    for model_field, aliases in ALIAS_MAP.items():
+        for a in aliases:
+            if a in normalized_mapping:
+                result[model_field] = normalized_mapping[a]
+                break
+    return result
+
+
+def to_int_or_none(value: Optional[str]):
+    if value is None:
+        return None
+    s = str(value).strip()
+    if s == "":
+        return None
+    # só aceita inteiro puro
+    if re.fullmatch(r"-?\d+", s):
+        try:
+            return int(s)
+        except Exception:
+            return None
+    return None
+
+
+def to_decimal_or_str(value: Optional[str]):
+    if value is None:
+        return ""
+    s = str(value).strip()
+    if s == "":
+        return ""
+    # deixe como está; se o campo for DecimalField o Django converte; se for Integer, trate
+    return s
+
+
+def valor_celula(valor) -> str:
+    """Célula do Excel -> texto como viria no CSV (12.0 -> "12", vazio -> "")."""
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return "TRUE" if valor else "FALSE"
+    if isinstance(valor, float):
+        return str(int(valor)) if valor.is_integer() else repr(valor)
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    return str(valor)
+
+
+class LeitorXlsx:
+    """
+    Lê uma planilha linha a linha no modo read_only do openpyxl (memória
+    constante, sem carregar a pasta de trabalho inteira), com a mesma
+    interface do csv.DictReader: `fieldnames` + iteração de dicts. A
+    primeira linha é o cabeçalho; linhas totalmente vazias são puladas.
+    """
+
+    def __init__(self, path: Path, sheet: Optional[str] = None):
+        if openpyxl is None:
+            raise RuntimeError("openpyxl não instalado – necessário para .xlsx.")
+        self._wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        if sheet and sheet not in self._wb.sheetnames:
+            self._wb.close()
+            raise ValueError(f"Aba {sheet!r} não encontrada (abas: {', '.join(self._wb.sheetnames)})")
+        ws = self._wb[sheet] if sheet else self._wb.active
+        self._linhas = ws.iter_rows(values_only=True)
+        cabecalho = next(self._linhas, None)
+        self.fieldnames = [valor_celula(c) for c in cabecalho] if cabecalho else None
+
+    def __iter__(self) -> Iterator[dict]:
+        for valores in self._linhas:
+            if all(v is None or v == "" for v in valores):
+                continue
+            # Linhas com células finais vazias podem vir mais curtas que o cabeçalho
+            valores = tuple(valores) + (None,) * (len(self.fieldnames) - len(valores))
+            yield {
+                nome: valor_celula(valor)
+                for nome, valor in zip(self.fieldnames, valores)
+                if nome
+            }
+
+    def close(self):
+        # read_only mantém o arquivo aberto até fechar a pasta de trabalho
+        self._wb.close()
+
+
+@contextmanager
+def abrir_planilha(path, delimiter: str = ",", sheet: Optional[str] = None, xlsx: Optional[bool] = None):
+    """csv.DictReader ou LeitorXlsx; sem `xlsx`, decide pela extensão (.xlsx/.xlsm)."""
+    if xlsx is None:
+        xlsx = Path(path).suffix.lower() in EXTENSOES_XLSX
+    if xlsx:
+        leitor = LeitorXlsx(path, sheet)
+        try:
+            yield leitor
+        finally:
+            leitor.close()
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield csv.DictReader(f, delimiter=delimiter)
+
+
+def montar_defaults(row: dict, reverse_lookup: Dict[str, str]) -> dict:
+    # Se um campo não existir na planilha, cai para "" / None
+    def get(model_field, transform=lambda x: x, default=""):
+        col = reverse_lookup.get(model_field)
+        if not col:
+            return default
+        return transform(row.get(col))
+
+    return {
+        "truss_number": get("truss_number", lambda v: (v or "").strip(), ""),
+        "tipo": get("tipo", lambda v: (v or "").strip(), ""),
+        "quantidade": get("quantidade", to_int_or_none, None),
+        "ply": get("ply", to_decimal_or_str, ""),
+        # Job_Reference -> endereco
+        "endereco": get("endereco", lambda v: (v or "").strip(), ""),
+        # "Size (ft)" -> tamanho (mantemos string; se quiser número: str(int(float(...))))
+        "tamanho": get("tamanho", lambda v: str(v).strip(), ""),
+        "status": get("status", lambda v: (v or "").strip(), ""),
+        "job_number": get("job_number", lambda v: (v or "").strip(), ""),
+    }
+
+
+def valor_campo(campo, valor):
+    """
+    Converte como o save() do import antigo (to_python + o arredondamento do
+    DecimalField em get_db_prep_save: ply "1.25" -> Decimal("1.2")) e
+    rejeita só o que o banco rejeitaria: decimal que não cabe em max_digits,
+    inteiro fora da faixa da coluna e, fora do SQLite (que não impõe o
+    tamanho de varchar), texto maior que max_length.
+    """
+    valor = campo.to_python(valor)
+    if valor is None:
+        return valor
+    if isinstance(campo, models.DecimalField):
+        try:
+            return Decimal(format_number(valor, campo.max_digits, campo.decimal_places))
+        except InvalidOperation:
+            raise ValidationError(
+                f"{campo.name} {valor} não cabe em {campo.max_digits} dígitos ({campo.decimal_places} decimal)"
+            )
+    if isinstance(campo, models.IntegerField):
+        campo.run_validators(valor)
+    elif campo.max_length and connection.vendor != "sqlite":
+        MaxLengthValidator(campo.max_length)(valor)
+    return valor
+
+
+def valores_modelo(defaults: dict) -> dict:
+    """
+    Valores de cada campo já convertidos por valor_campo(), para comparar com
+    o que está no banco. O dry-run e o import usam esta mesma função, então
+    planejam e rejeitam as mesmas linhas; ValidationError = linha com erro.
+    """
+    return {nome: valor_campo(Truss._meta.get_field(nome), defaults[nome]) for nome in CAMPOS_COMPARADOS}
+
+
+def campos_alterados(atual: dict, novos: dict) -> List[str]:
+    return [nome for nome in CAMPOS_COMPARADOS if atual[nome] != novos[nome]]
+
+
+def gravar_linha(pk: int, defaults: dict) -> str:
+    """
+    Versão por linha do upsert, com detecção de mudança: só grava (e só
+    avança updated_at) se algum campo mudou. Retorna CRIADO, ATUALIZADO
+    ou INALTERADO.
+    """
+    novos = valores_modelo(defaults)
+    obj = Truss.objects.filter(pk=pk).first()
+    if obj is None:
+        Truss.objects.create(id=pk, **novos)
+        return CRIADO
+    alterados = campos_alterados({nome: getattr(obj, nome) for nome in CAMPOS_COMPARADOS}, novos)
+    if not alterados:
+        return INALTERADO
+    for nome in alterados:
+        setattr(obj, nome, novos[nome])
+    obj.save(update_fields=alterados + ["updated_at"])
+    return ATUALIZADO
+
+
+class UpsertEmLotes:
+    """
+    Grava trusses em lotes: um SELECT das linhas existentes do lote e um
+    INSERT ... ON CONFLICT DO UPDATE multi-linha via
+    bulk_create(update_conflicts=True) só com as novas e as que mudaram, em
+    vez de SELECT + INSERT/UPDATE por linha. Linhas iguais ao banco não são
+    regravadas (updated_at fica como está) e contam como inalteradas.
+    Se o lote falhar no banco, ele é refeito linha a linha, cada uma no seu
+    savepoint, para contar os erros por linha como o modo antigo.
+    bulk_create não dispara post_save, então o cache da API/página de
+    detalhe é invalidado aqui, após o commit.
+    ao_gravar, se dado, recebe a cada lote os registros criados/alterados
+    (dicts com id + CAMPOS_COMPARADOS), na ordem do arquivo, via
+    transaction.on_commit: só depois que o lote está gravado de vez (sem
+    transação externa, logo após o lote; dentro de uma, no commit dela).
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        max_error_lines: int = 20,
+        ao_gravar: Optional[Callable[[List[dict]], None]] = None,
+    ):
+        self.batch_size = batch_size
+        self.max_error_lines = max_error_lines
+        self.ao_gravar = ao_gravar
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = 0
+        self.error_lines: List[str] = []
+        # pk -> (linha, defaults); o mesmo id repetido no arquivo fica com a última linha
+        self._lote: Dict[int, Tuple[int, dict]] = {}
+
+    def erro(self, mensagem: str):
+        self.errors += 1
+        if len(self.error_lines) < self.max_error_lines:
+            self.error_lines.append(mensagem)
+
+    def adicionar(self, idx: int, pk: int, defaults: dict):
+        if pk in self._lote:
+            # update_or_create contaria a repetição como atualização
+            self.updated += 1
+            del self._lote[pk]
+        self._lote[pk] = (idx, defaults)
+        if len(self._lote) >= self.batch_size:
+            self.descarregar()
+
+    def descarregar(self):
+        # Um atomic por lote: sem transação externa, cada lote é commitado aqui
+        with transaction.atomic():
+            self._gravar_lote()
+
+    def _gravar_lote(self):
+        if not self._lote:
+            return
+        lote, self._lote = self._lote, {}
+        existentes = {
+            r["id"]: r for r in Truss.objects.filter(pk__in=list(lote)).values("id", *CAMPOS_COMPARADOS)
+        }
+        gravar: Dict[int, Tuple[int, dict]] = {}
+        novos = 0
+        for pk, (idx, defaults) in lote.items():
+            try:
+                valores = valores_modelo(defaults)
+            except Exception as e:
+                self.erro(f"Linha {idx}: Erro inesperado: {e}")
+                continue
+            atual = existentes.get(pk)
+            if atual is None:
+                novos += 1
+            elif not campos_alterados(atual, valores):
+                self.unchanged += 1
+                continue
+            gravar[pk] = (idx, valores)
+        if not gravar:
+            return
+
+        try:
+            with transaction.atomic():
+                self._bulk_upsert(gravar)
+        except Exception:
+            gravar = self._linha_a_linha(gravar)
+        else:
+            self.created += novos
+            self.updated += len(gravar) - novos
+        transaction.on_commit(partial(invalidar_cache_truss, list(gravar)))
+        if self.ao_gravar is not None and gravar:
+            registros = [{"id": pk, **valores} for pk, (_, valores) in gravar.items()]
+            transaction.on_commit(partial(self.ao_gravar, registros))
+
+    def _bulk_upsert(self, lote: Dict[int, Tuple[int, dict]]):
+        objs = [Truss(id=pk, **valores) for pk, (_, valores) in lote.items()]
+        # MySQL não aceita unique_fields (ON DUPLICATE KEY usa qualquer chave única)
+        alvo = ["id"] if connection.features.supports_update_conflicts_with_target else None
+        Truss.objects.bulk_create(
+            objs,
+            batch_size=self.batch_size,
+            update_conflicts=True,
+            unique_fields=alvo,
+            update_fields=CAMPOS_UPSERT,
+        )
+
+    def _linha_a_linha(self, lote: Dict[int, Tuple[int, dict]]) -> Dict[int, Tuple[int, dict]]:
+        # Retorna só as linhas efetivamente gravadas
+        gravadas: Dict[int, Tuple[int, dict]] = {}
+        for pk, (idx, valores) in sorted(lote.items(), key=lambda item: item[1][0]):
+            try:
+                with transaction.atomic():
+                    resultado = gravar_linha(pk, valores)
+            except IntegrityError as e:
+                self.erro(f"Linha {idx}: IntegrityError: {e}")
+                continue
+            except Exception as e:
+                self.erro(f"Linha {idx}: Erro inesperado: {e}")
+                continue
+            if resultado == CRIADO:
+                self.created += 1
+            elif resultado == ATUALIZADO:
+                self.updated += 1
+            else:
+                self.unchanged += 1
+                continue
+            gravadas[pk] = (idx, valores)
+        return gravadas
+
+
+class PlanoImportacao:
+    """
+    Dry-run em conjunto: os ids são acumulados em blocos e resolvidos com um
+    SELECT ... WHERE id IN (...) por bloco, em vez de um exists() por linha.
+    Cada linha vira "criar", "atualizar" (com os campos que mudam, de/para)
+    ou "inalterado", comparando os valores já convertidos pelo campo do
+    modelo (ex.: ply "2" == Decimal("2.0")). Um id repetido no arquivo é
+    comparado com a linha anterior, como aconteceria na importação.
+    """
+
+    def __init__(self, tamanho_bloco: int, tabela_existe: bool = True, max_error_lines: int = 20):
+        self.tamanho_bloco = tamanho_bloco
+        self.tabela_existe = tabela_existe
+        self.max_error_lines = max_error_lines
+        self.criar: List[dict] = []
+        self.atualizar: List[dict] = []
+        self.inalterados: List[int] = []
+        self.erros: List[dict] = []
+        self.error_lines: List[str] = []
+        self._bloco: List[Tuple[int, int, dict]] = []
+        # pk -> valores convertidos da última linha vista com esse id
+        self._vistos: Dict[int, dict] = {}
+
+    @property
+    def created(self) -> int:
+        return len(self.criar)
+
+    @property
+    def updated(self) -> int:
+        return len(self.atualizar)
+
+    @property
+    def unchanged(self) -> int:
+        return len(self.inalterados)
+
+    @property
+    def errors(self) -> int:
+        return len(self.erros)
+
+    def erro(self, mensagem: str, idx: Optional[int] = None):
+        self.erros.append({"linha": idx, "erro": mensagem})
+        if len(self.error_lines) < self.max_error_lines:
+            self.error_lines.append(mensagem)
+
+    def adicionar(self, idx: int, pk: int, defaults: dict):
+        self._bloco.append((idx, pk, defaults))
+        if len(self._bloco) >= self.tamanho_bloco:
+            self.descarregar()
+
+    def descarregar(self):
+        if not self._bloco:
+            return
+        bloco, self._bloco = self._bloco, []
+        no_banco = {}
+        if self.tabela_existe:
+            pks = {pk for _, pk, _ in bloco if pk not in self._vistos}
+            no_banco = {
+                r["id"]: r for r in Truss.objects.filter(pk__in=pks).values("id", *CAMPOS_COMPARADOS)
+            }
+        for idx, pk, defaults in bloco:
+            try:
+                novo = valores_modelo(defaults)
+            except Exception as e:
+                self.erro(f"Linha {idx}: Erro inesperado: {e}", idx)
+                continue
+            atual = self._vistos.get(pk) or no_banco.get(pk)
+            self._vistos[pk] = novo
+            if atual is None:
+                self.criar.append({"linha": idx, "id": pk})
+                continue
+            mudancas = {
+                nome: {"de": atual[nome], "para": novo[nome]}
+                for nome in campos_alterados(atual, novo)
+            }
+            if mudancas:
+                self.atualizar.append({"linha": idx, "id": pk, "campos": mudancas})
+            else:
+                self.inalterados.append(pk)
+
+    def resumo(self) -> Dict[str, int]:
+        return {
+            "criar": len(self.criar),
+            "atualizar": len(self.atualizar),
+            "inalterados": len(self.inalterados),
+            "erros": len(self.erros),
+        }
+
+    def como_dict(self) -> dict:
+        return {
+            "resumo": self.resumo(),
+            "criar": self.criar,
+            "atualizar": self.atualizar,
+            "inalterados": self.inalterados,
+            "erros": self.erros,
+        }
+
+
+def suporta_copy() -> bool:
+    """--fast só no PostgreSQL com psycopg 3 (cursor.copy)."""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        return hasattr(cursor.cursor, "copy")
+
+
+class CopyPostgres:
+    """
+    Importação rápida no PostgreSQL: as linhas, já validadas pelos campos do
+    modelo, vão por COPY (psycopg 3) para uma tabela temporária e entram em
+    accounts_truss num único INSERT ... SELECT ... ON CONFLICT (id) DO UPDATE.
+    Criados/atualizados vêm do próprio merge (xmax = 0 no RETURNING indica
+    linha inserida); linhas iguais às do banco não são regravadas. Deve
+    rodar dentro de transaction.atomic() (a tabela de staging é ON COMMIT
+    DROP) ou, sem transação externa, com ao_gravar: aí cada bloco é copiado e
+    mesclado na sua própria transação e o callback recebe as linhas gravadas
+    nele depois do commit.
+    """
+
+    STAGING = "truss_import_staging"
+
+    def __init__(
+        self,
+        tamanho_bloco: int,
+        max_error_lines: int = 20,
+        ao_gravar: Optional[Callable[[List[dict]], None]] = None,
+    ):
+        self.tamanho_bloco = tamanho_bloco
+        self.max_error_lines = max_error_lines
+        self.ao_gravar = ao_gravar
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = 0
+        self.error_lines: List[str] = []
+        self._bloco: List[tuple] = []
+        self._linhas = 0
+        self._campos = [Truss._meta.get_field(nome) for nome in CAMPOS_COMPARADOS]
+
+    def erro(self, mensagem: str):
+        self.errors += 1
+        if len(self.error_lines) < self.max_error_lines:
+            self.error_lines.append(mensagem)
+
+    def adicionar(self, idx: int, pk: int, defaults: dict):
+        # Converte e valida aqui, como o save() + o banco fariam: um valor ruim
+        # no COPY derrubaria o arquivo inteiro, e não só a linha
+        try:
+            valores = [self._preparar(campo, defaults[campo.name]) for campo in self._campos]
+        except Exception as e:
+            self.erro(f"Linha {idx}: Erro inesperado: {e}")
+            return
+        self._bloco.append((idx, pk, *valores))
+        if len(self._bloco) >= self.tamanho_bloco:
+            if self.ao_gravar is not None:
+                # Com consumidor das linhas gravadas, o merge é feito por bloco
+                self.descarregar()
+            else:
+                self._copiar()
+
+    @staticmethod
+    def _preparar(campo, valor):
+        # valor_campo já arredonda e barra o que o banco recusaria: no
+        # PostgreSQL o get_db_prep_save repassa o Decimal sem checar nada
+        return campo.get_db_prep_save(valor_campo(campo, valor), connection)
+
+    def _criar_staging(self, cursor):
+        # IF NOT EXISTS: com commit por bloco a tabela some a cada commit
+        qn = connection.ops.quote_name
+        colunas = ", ".join(
+            f"{qn(campo.column)} {campo.db_type(connection)}" for campo in self._campos
+        )
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {qn(self.STAGING)} (linha integer, id integer, {colunas}) ON COMMIT DROP"
+        )
+
+    def _copiar(self):
+        if not self._bloco:
+            return
+        bloco, self._bloco = self._bloco, []
+        qn = connection.ops.quote_name
+        colunas = ", ".join(["linha", "id"] + [qn(campo.column) for campo in self._campos])
+        # O COPY usa o cursor do psycopg direto; wrap_database_errors converte
+        # as exceções para as do Django (DatabaseError), como no resto
+        with connection.cursor() as cursor, connection.wrap_database_errors:
+            self._criar_staging(cursor)
+            with cursor.cursor.copy(f"COPY {qn(self.STAGING)} ({colunas}) FROM STDIN") as copy:
+                for registro in bloco:
+                    copy.write_row(registro)
+        self._linhas += len(bloco)
+
+    def descarregar(self):
+        with transaction.atomic():
+            self._mesclar()
+
+    def _mesclar(self):
+        self._copiar()
+        if not self._linhas:
+            return
+        qn = connection.ops.quote_name
+        tabela = qn(Truss._meta.db_table)
+        colunas = [qn(campo.column) for campo in self._campos]
+        created_at = qn(Truss._meta.get_field("created_at").column)
+        updated_at = qn(Truss._meta.get_field("updated_at").column)
+        atualiza = ", ".join(f"{c} = EXCLUDED.{c}" for c in colunas + [updated_at])
+        # Id repetido no arquivo: vale a última linha (DISTINCT ON ... linha DESC);
+        # o ON CONFLICT não aceita a mesma chave duas vezes no mesmo comando.
+        # O WHERE do DO UPDATE pula linhas iguais às do banco: não são
+        # regravadas nem voltam no RETURNING (são as inalteradas)
+        sql = f"""
+            WITH dados AS (
+                SELECT DISTINCT ON (id) id, {", ".join(colunas)}
+                FROM {qn(self.STAGING)}
+                ORDER BY id, linha DESC
+            ), merge AS (
+                INSERT INTO {tabela} (id, {", ".join(colunas)}, {created_at}, {updated_at})
+                SELECT id, {", ".join(colunas)}, now(), now() FROM dados
+                ON CONFLICT (id) DO UPDATE SET {atualiza}
+                WHERE ({", ".join(f"{tabela}.{c}" for c in colunas)})
+                    IS DISTINCT FROM ({", ".join(f"EXCLUDED.{c}" for c in colunas)})
+                RETURNING id, (xmax = 0) AS inserido
+            )
+            SELECT
+                (SELECT count(*) FROM dados),
+                count(*) FILTER (WHERE inserido),
+                count(*) FILTER (WHERE NOT inserido),
+                array_agg(id)
+            FROM merge
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            distintos, criados, atualizados, ids = cursor.fetchone()
+            cursor.execute(f"TRUNCATE {qn(self.STAGING)}")
+        repetidos = self._linhas - distintos
+        self.created += criados
+        self.updated += atualizados + repetidos
+        self.unchanged += distintos - criados - atualizados
+        self._linhas = 0
+        transaction.on_commit(partial(invalidar_cache_truss, ids or []))
+        if self.ao_gravar is not None and ids:
+            # Só as linhas que o merge gravou, lidas pela pk na mesma transação
+            registros = list(Truss.objects.filter(pk__in=ids).order_by("id").values("id", *CAMPOS_COMPARADOS))
+            transaction.on_commit(partial(self.ao_gravar, registros))
@@ -0,0 +1,110 @@
+from typing import Iterable, Optional, Union
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.utils.http import http_date
+
+from apps.django_apps.accounts.models import Truss
+from apps.qrcode_app.services.truss_bundles import dados_truss
+
+# Nome do {% cache %} de accounts/truss_detail.html
+FRAGMENTO_DETALHE = "truss_detail"
+CAMPOS_PUBLICOS = ("id", "job_number", "truss_number", "tipo", "quantidade", "ply", "endereco", "tamanho", "status")
+
+
+def parse_ids(ids: Union[str, Iterable[int], None]):
+    """Aceita "1,2,3" ou uma lista; ValueError se algum não for inteiro."""
+    if ids is None or ids == "":
+        return None
+    if isinstance(ids, str):
+        return [int(x.strip()) for x in ids.split(",") if x.strip()]
+    return [int(x) for x in ids]
+
+
+def filtrar_trusses(
+    qs,
+    ids: Union[str, Iterable[int], None] = None,
+    job_number: Optional[str] = None,
+    status: Optional[str] = None,
+    tipo: Optional[str] = None,
+    limit: Optional[int] = None,
+):
+    """Filtros do generate_truss_labels, compartilhados com a fila de jobs."""
+    id_list = parse_ids(ids)
+    if id_list is not None:
+        qs = qs.filter(id__in=id_list)
+    if job_number:
+        qs = qs.filter(job_number=job_number)
+    if status:
+        qs = qs.filter(status=status)
+    if tipo:
+        qs = qs.filter(tipo=tipo)
+    if limit:
+        qs = qs[:limit]
+    return qs
+
+
+def chave_cache_truss(tid: int) -> str:
+    return f"truss-api:{tid}"
+
+
+def _versao(tid: int, updated_at) -> dict:
+    return {
+        "etag": f'"{tid}-{int(updated_at.timestamp() * 1_000_000)}"',
+        "last_modified": http_date(updated_at.timestamp()),
+        "updated_at": updated_at.timestamp(),
+    }
+
+
+def versao_truss(tid: int) -> Optional[dict]:
+    """
+    ETag/Last-Modified de um truss, para responder 304 sem montar o JSON.
+    Com cache (TRUSS_API_CACHE_SECONDS > 0) vem da entrada em cache; sem,
+    é só o updated_at lido pela PK.
+    """
+    if settings.TRUSS_API_CACHE_SECONDS:
+        return truss_publico(tid)
+    updated_at = Truss.objects.filter(pk=tid).values_list("updated_at", flat=True).first()
+    return None if updated_at is None else _versao(tid, updated_at)
+
+
+def truss_publico(tid: int) -> Optional[dict]:
+    """
+    JSON público de um truss (mesmo formato dos arquivos de truss-data) com
+    ETag/Last-Modified derivados de `updated_at`.
+
+    Só passa pelo cache do Django com TRUSS_API_CACHE_SECONDS > 0 (padrão
+    quando há REDIS_URL): invalidado pelos signals de Truss e expira nesse
+    prazo, limite para escritas que não passam por save() (ex.:
+    queryset.update) em outros processos.
+    """
+    chave = chave_cache_truss(tid)
+    if settings.TRUSS_API_CACHE_SECONDS:
+        entrada = cache.get(chave)
+        if entrada is not None:
+            return entrada
+    reg = Truss.objects.filter(pk=tid).values(*CAMPOS_PUBLICOS, "updated_at").first()
+    if reg is None:
+        return None
+    updated_at = reg.pop("updated_at")
+    entrada = {"dados": dados_truss(reg), **_versao(tid, updated_at)}
+    if settings.TRUSS_API_CACHE_SECONDS:
+        cache.set(chave, entrada, settings.TRUSS_API_CACHE_SECONDS)
+    return entrada
+
+
+def invalidar_cache_truss(tids: Iterable[int]):
+    """
+    Descarta a entrada da API e o fragmento HTML da página de detalhe
+    (chaveado pelo updated_at que estava no cache) de cada truss. Sem cache
+    da API não há o que descartar: o fragmento já muda de chave com updated_at.
+    """
+    if not settings.TRUSS_API_CACHE_SECONDS:
+        return
+    chaves = [chave_cache_truss(t) for t in tids]
+    fragmentos = [
+        make_template_fragment_key(FRAGMENTO_DETALHE, [entrada["dados"]["id"], entrada["updated_at"]])
+        for entrada in cache.get_many(chaves).values()
+    ]
+    cache.delete_many(chaves + fragmentos)
@@ -0,0 +1,307 @@
+import math
+import socket
+from pathlib import Path
+from typing import Iterable, Tuple, Union
+from urllib.parse import urlparse
+
+from PIL import Image, ImageDraw, ImageOps
+
+from apps.qrcode_app.services.labels import (
+    ASSETS,
+    CENTRO_H,
+    CENTRO_W,
+    CENTRO_X,
+    CENTRO_Y,
+    FAIXA_H,
+    FAIXA_W,
+    FAIXA_X,
+    FAIXA_Y_BASE,
+    FAIXA_Y_TOPO,
+    FINAL_HEIGHT,
+    FINAL_WIDTH,
+    QR_BORDER,
+    QR_CACHE,
+    QR_CENTRO_SIZE,
+    QR_SMALL_SIZE,
+    SUB_W,
+    FontBundle,
+    _sanitize_quantidade,
+    build_fonts,
+)
+
+# Etiqueta 4x6" a 300 DPI (12 dots/mm): 1200x1800 dots, as mesmas
+# coordenadas do canvas raster, então o layout é reaproveitado 1:1.
+# Logos e a parte fixa do layout vão para a RAM da impressora uma vez por
+# job (~DG + formato ^DF); cada etiqueta só chama o formato (^XF) e traz
+# QR (^BQ), textos (^A0) e ^PQ com a quantidade de cópias.
+
+PORTA_ZPL = 9100
+LOGO_FAIXA = "R:LOGOS.GRF"
+LOGO_CENTRO = "R:LOGOC.GRF"
+FORMATO_FIXO = "R:ETIQUETA.ZPL"
+
+
+def _texto_zpl(texto: str) -> str:
+    # ^ e ~ são comandos em ZPL: com ^FH eles vão em hexadecimal
+    texto = str(texto)
+    if not any(c in texto for c in "^~_"):
+        return f"^FD{texto}^FS"
+    for c in "_^~":
+        texto = texto.replace(c, f"_{ord(c):02X}")
+    return f"^FH_^FD{texto}^FS"
+
+
+def _campo(x: int, y: int, largura: int, altura_fonte: int, texto: str, rotacao: str = "N") -> str:
+    # ^FB de uma linha centraliza como o (largura - textlength) // 2 do raster
+    return (
+        f"^FO{int(x)},{int(y)}^A0{rotacao},{altura_fonte},{altura_fonte}"
+        f"^FB{int(largura)},1,0,C,0{_texto_zpl(texto)}"
+    )
+
+
+def _repeticao(n: int, c: str) -> str:
+    # Compressão ASCII do ZPL: G..Y = 1..19 e g..z = 20..400 repetições
+    partes = []
+    while n > 0:
+        bloco = min(n, 419)
+        vinte, resto = divmod(bloco, 20)
+        if vinte:
+            partes.append(chr(ord("g") + vinte - 1))
+        if resto:
+            partes.append(chr(ord("G") + resto - 1))
+        partes.append(c)
+        n -= bloco
+    return "".join(partes)
+
+
+def _comprimir_linha(linha: str) -> str:
+    sufixo = ""
+    if linha.endswith("0"):
+        linha, sufixo = linha.rstrip("0"), ","  # "," = resto da linha em 0
+    elif linha.endswith("F"):
+        linha, sufixo = linha.rstrip("F"), "!"  # "!" = resto da linha em 1
+    partes = []
+    i = 0
+    while i < len(linha):
+        j = i
+        while j < len(linha) and linha[j] == linha[i]:
+            j += 1
+        n = j - i
+        partes.append(linha[i] * n if n <= 2 else _repeticao(n, linha[i]))
+        i = j
+    return "".join(partes) + sufixo
+
+
+def _grafico_dg(nome: str, img: Image.Image) -> str:
+    """~DG (download graphic) em hex ASCII com a compressão do ZPL; 1 = ponto preto."""
+    bits = ImageOps.invert(img.convert("L")).convert("1", dither=Image.Dither.NONE)
+    por_linha = math.ceil(bits.width / 8)
+    dados = bits.tobytes()
+    linhas = []
+    anterior = None
+    for i in range(0, len(dados), por_linha):
+        linha = dados[i:i + por_linha].hex().upper()
+        # ":" repete a linha anterior
+        linhas.append(":" if linha == anterior else _comprimir_linha(linha))
+        anterior = linha
+    return f"~DG{nome},{len(dados)},{por_linha},{''.join(linhas)}\n"
+
+
+def _qr(x: int, y: int, size: int, data: str) -> str:
+    # Magnificação = tamanho do módulo em dots; a borda fica por conta do ^FO
+    n, _ = QR_CACHE.matriz(data)
+    modulo = max(1, min(10, size // n))
+    offset = QR_BORDER * modulo
+    return f"^FO{x + offset},{y + offset}^BQN,2,{modulo}^FDHA,{data}^FS"
+
+
+class LabelTemplateZpl:
+    """
+    Equivalente ZPL de LabelTemplate: a parte fixa (logos, legendas e
+    endereço) é montada uma vez e cada etiqueta só acrescenta QR e textos.
+    """
+
+    def __init__(
+        self,
+        fonts: FontBundle,
+        logo_small: Image.Image,
+        logo_c: Image.Image,
+        empresa_endereco: str,
+        empresa_tel: str,
+    ):
+        self.fonts = fonts
+        self.logo_small = logo_small
+        # O sub-bloco central é rotacionado 90°: o logo já sobe rotacionado
+        self.logo_c_rot = logo_c.rotate(90, expand=True)
+        self.logo_c = logo_c
+        self._fixo = self._comandos_fixos(empresa_endereco, empresa_tel)
+
+    def cabecalho(self) -> str:
+        """Gráficos e formato fixo, enviados uma vez por job."""
+        return (
+            _grafico_dg(LOGO_FAIXA, self.logo_small)
+            + _grafico_dg(LOGO_CENTRO, self.logo_c_rot)
+            + f"^XA^DF{FORMATO_FIXO}^FS^CI28^PW{FINAL_WIDTH}^LL{FINAL_HEIGHT}{self._fixo}^XZ\n"
+        )
+
+    def _comandos_fixos(self, empresa_endereco: str, empresa_tel: str) -> str:
+        fonts = self.fonts
+        cmds = []
+        for y_pos in (FAIXA_Y_TOPO, FAIXA_Y_BASE):
+            logo_y = y_pos + (FAIXA_H - self.logo_small.height) // 2
+            cmds.append(f"^FO{FAIXA_X + 20},{logo_y}^XG{LOGO_FAIXA},1,1^FS")
+            cmds.append(_campo(FAIXA_X, y_pos + 5, FAIXA_W, fonts.reg22.size, "Truss ID:"))
+
+        # Endereço/telefone rotacionados, mesma caixa do raster
+        font_small = fonts.reg22
+        linhas = [str(empresa_endereco), str(empresa_tel)]
+        ddraw = ImageDraw.Draw(Image.new("L", (1, 1), 255))
+        bbox = ddraw.textbbox((0, 0), "\n".join(linhas), font=font_small)
+        text_w = bbox[2] - bbox[0]
+        text_h = bbox[3] - bbox[1]
+        sub_w, sub_h = text_w + 80, text_h + 60
+        end_y = (sub_h - text_h) // 2
+        espacamento = ddraw.textbbox((0, 0), "A", font=font_small)[3] + 4
+        x = CENTRO_X + CENTRO_W - sub_h - 5
+        y = CENTRO_Y + (CENTRO_H - sub_w) // 2
+        for i, linha in enumerate(linhas):
+            # Rotação "B" (270°): lê de baixo para cima, como o rotate(90) do Pillow
+            cmds.append(_campo(x + end_y + i * espacamento, y, sub_w, font_small.size, linha, "B"))
+
+        # Logo do sub-bloco central (mesma posição com ou sem job)
+        sub_x, sub_y = self._origem_sub_bloco()
+        lx = (SUB_W - self.logo_c.width) // 2
+        cmds.append(f"^FO{sub_x + 10},{sub_y + SUB_W - lx - self.logo_c.width}^XG{LOGO_CENTRO},1,1^FS")
+        return "".join(cmds)
+
+    @staticmethod
+    def _origem_sub_bloco() -> Tuple[int, int]:
+        # Canto do sub-bloco já rotacionado, ao lado do QR central
+        return CENTRO_X + 10 + QR_CENTRO_SIZE + 20, CENTRO_Y + (CENTRO_H - SUB_W) // 2
+
+    def etiqueta(
+        self,
+        truss_id: Union[int, str],
+        truss_number: str,
+        job_number: str,
+        base_url: str,
+        quantidade: int = 1,
+    ) -> str:
+        fonts = self.fonts
+        data = f"{base_url}/{truss_id}"
+        tn = str(truss_number or "")
+        cmds = [f"^XA^XF{FORMATO_FIXO}^FS"]
+
+        for y_pos in (FAIXA_Y_TOPO, FAIXA_Y_BASE):
+            cmds.append(_qr(
+                FAIXA_X + FAIXA_W - QR_SMALL_SIZE - 20,
+                y_pos + (FAIXA_H - QR_SMALL_SIZE) // 2,
+                QR_SMALL_SIZE,
+                data,
+            ))
+            cmds.append(_campo(FAIXA_X, y_pos + 35, FAIXA_W, fonts.bold85.size, tn))
+
+        qr_x = CENTRO_X + 10
+        cmds.append(_qr(qr_x, CENTRO_Y + (CENTRO_H - QR_CENTRO_SIZE) // 2, QR_CENTRO_SIZE, data))
+
+        # Sub-bloco rotacionado: (u, v) do bloco original vai para (x + v, y + SUB_W - u)
+        sub_x, sub_y = self._origem_sub_bloco()
+        ty = 10 + self.logo_c.height + 40
+        if job_number:
+            cmds.append(_campo(sub_x + ty, sub_y, SUB_W, fonts.reg30.size, f"Job: {job_number}", "B"))
+            ty += 70
+        cmds.append(_campo(sub_x + ty, sub_y, SUB_W, fonts.reg30.size, "Truss ID:", "B"))
+        ty += 50
+        cmds.append(_campo(sub_x + ty, sub_y, SUB_W, fonts.bold120.size, tn, "B"))
+
+        # Cópias são impressas pela própria impressora
+        cmds.append(f"^PQ{max(1, int(quantidade))}^XZ\n")
+        return "".join(cmds)
+
+
+def build_label_template_zpl(
+    logo_path: Path,
+    empresa_endereco: str,
+    empresa_tel: str,
+    fonts: FontBundle = None,
+) -> LabelTemplateZpl:
+    fonts = fonts or build_fonts()
+    return LabelTemplateZpl(
+        fonts,
+        ASSETS.logo(logo_path, 250, bilevel=True),
+        ASSETS.logo(logo_path, 400, bilevel=True),
+        empresa_endereco,
+        empresa_tel,
+    )
+
+
+class DestinoZpl:
+    """
+    Arquivo (.zpl) ou impressora via socket TCP cru ("tcp://host[:9100]").
+    Uso: with DestinoZpl(destino) as out: out.escrever(texto)
+    """
+
+    def __init__(self, destino: str, timeout: float = 10.0):
+        self.destino = str(destino)
+        self.timeout = timeout
+        self.bytes_enviados = 0
+        self._sock = None
+        self._f = None
+
+    def __enter__(self):
+        if self.destino.startswith("tcp://"):
+            url = urlparse(self.destino)
+            if not url.hostname:
+                raise ValueError(f"Destino ZPL inválido: {self.destino!r}")
+            self._sock = socket.create_connection((url.hostname, url.port or PORTA_ZPL), timeout=self.timeout)
+        else:
+            path = Path(self.destino)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._f = path.open("wb")
+        return self
+
+    def escrever(self, texto: str):
+        dados = texto.encode("utf-8")
+        if self._sock is not None:
+            self._sock.sendall(dados)
+        else:
+            self._f.write(dados)
+        self.bytes_enviados += len(dados)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._sock is not None:
+            self._sock.close()
+        if self._f is not None:
+            self._f.close()
+        return False
+
+
+def gerar_zpl(
+    registros: Iterable[dict],
+    destino: str,
+    logo_path: Path,
+    base_url: str,
+    empresa_endereco: str,
+    empresa_tel: str,
+) -> Tuple[int, int, int]:
+    """
+    Envia as etiquetas em ZPL para `destino` (arquivo ou tcp://host:porta).
+    Retorna (num_trusses, num_etiquetas, bytes_enviados).
+    """
+    template = build_label_template_zpl(logo_path, empresa_endereco, empresa_tel)
+    num_trusses = num_etiquetas = 0
+    with DestinoZpl(destino) as out:
+        out.escrever(template.cabecalho())
+        for reg in registros:
+            quantidade = _sanitize_quantidade(reg.get("quantidade"))
+            out.escrever(template.etiqueta(
+                int(reg["id"]),
+                reg.get("truss_number") or "",
+                reg.get("job_number") or "",
+                base_url,
+                quantidade,
+            ))
+            num_trusses += 1
+            num_etiquetas += quantidade
+    print(f"🖨️ ZPL: {num_etiquetas} etiquetas ({num_trusses} trusses), {out.bytes_enviados} bytes → {destino}")
+    return num_trusses, num_etiquetas, out.bytes_enviados
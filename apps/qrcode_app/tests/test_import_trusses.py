@@ -0,0 +1,125 @@
+import json
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import skipIf
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.django_apps.accounts.models import Truss
+from apps.qrcode_app.services.truss_import import openpyxl
+
+CABECALHO = ["ID", "Truss Number", "Truss Type", "Qty", "Ply", "Job Reference", "Size (ft)", "Status", "Job"]
+
+
+def linha(tid, numero=None, tipo="Common", qty="2", ply="1.5", job="J1"):
+    return [str(tid), numero or f"T{tid}", tipo, qty, ply, "Rua A", "30", "pending", job]
+
+
+class ImportTrussesTests(TestCase):
+    def setUp(self):
+        self.pasta = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.pasta, ignore_errors=True)
+
+    def _csv(self, linhas, nome="trusses.csv") -> Path:
+        path = self.pasta / nome
+        path.write_text(
+            "\n".join(",".join(campos) for campos in [CABECALHO] + linhas) + "\n", encoding="utf-8"
+        )
+        return path
+
+    def _importar(self, *args) -> str:
+        out = StringIO()
+        call_command("import_trusses", *args, stdout=out)
+        return out.getvalue()
+
+    def assertResumo(self, saida, criados, atualizados, inalterados, erros):
+        self.assertIn(
+            f"criados: {criados}, atualizados: {atualizados}, inalterados: {inalterados}, erros: {erros}",
+            saida,
+        )
+
+    def test_upsert_em_lotes_cria_e_atualiza(self):
+        csv = self._csv([linha(1), linha(2), linha(3, qty="4")])
+        self.assertResumo(self._importar("--csv", str(csv), "--batch-size", "2"), 3, 0, 0, 0)
+
+        t3 = Truss.objects.get(pk=3)
+        self.assertEqual((t3.truss_number, t3.quantidade, t3.ply), ("T3", 4, Decimal("1.5")))
+
+        csv = self._csv([linha(1), linha(2, tipo="Hip"), linha(3, qty="4")])
+        self.assertResumo(self._importar("--csv", str(csv), "--batch-size", "2"), 0, 1, 2, 0)
+        self.assertEqual(Truss.objects.get(pk=2).tipo, "Hip")
+
+    def test_linhas_inalteradas_nao_sao_regravadas(self):
+        csv = self._csv([linha(1), linha(2)])
+        self._importar("--csv", str(csv))
+        antes = dict(Truss.objects.values_list("id", "updated_at"))
+
+        self.assertResumo(self._importar("--csv", str(csv)), 0, 0, 2, 0)
+        self.assertEqual(dict(Truss.objects.values_list("id", "updated_at")), antes)
+
+    def test_linha_a_linha_conta_como_o_lote(self):
+        csv = self._csv([linha(1), linha(2)])
+        self.assertResumo(self._importar("--csv", str(csv), "--batch-size", "0"), 2, 0, 0, 0)
+
+        csv = self._csv([linha(1), linha(2, numero="T2b")])
+        self.assertResumo(self._importar("--csv", str(csv), "--batch-size", "0"), 0, 1, 1, 0)
+
+    def test_erros_por_linha(self):
+        csv = self._csv([
+            linha(1),
+            linha("abc"),
+            # Não cabe em DecimalField(max_digits=3, decimal_places=1)
+            linha(3, ply="123.4"),
+            # Arredondado como o save() fazia, não rejeitado
+            linha(4, ply="1.25"),
+        ])
+        # --fast só usa COPY no PostgreSQL; nos outros bancos cai no modo em lote
+        for modo in (["--batch-size", "1000"], ["--batch-size", "0"], ["--fast"]):
+            with self.subTest(modo=modo):
+                Truss.objects.all().delete()
+                saida = self._importar("--csv", str(csv), *modo)
+                self.assertResumo(saida, 2, 0, 0, 2)
+                self.assertIn("Linha 3: id inválido", saida)
+                self.assertIn("Linha 4:", saida)
+                self.assertEqual(sorted(Truss.objects.values_list("id", flat=True)), [1, 4])
+                self.assertEqual(Truss.objects.get(pk=4).ply, Decimal("1.2"))
+
+    def test_dry_run_grava_plano_sem_tocar_no_banco(self):
+        Truss.objects.create(id=1, truss_number="T1", tipo="Common", quantidade=2, ply=Decimal("1.5"),
+                             endereco="Rua A", tamanho="30", status="pending", job_number="J1")
+        Truss.objects.create(id=2, truss_number="T2", tipo="Common", quantidade=2, ply=Decimal("1.5"),
+                             endereco="Rua A", tamanho="30", status="pending", job_number="J1")
+        csv = self._csv([linha(1), linha(2, tipo="Hip"), linha(3), linha(4, ply="123.4")])
+        plano_path = self.pasta / "plano.json"
+
+        saida = self._importar("--csv", str(csv), "--dry-run", "--plan-json", str(plano_path))
+
+        self.assertIn("Plano: criar 1, atualizar 1, inalterados 1, erros 1", saida)
+        plano = json.loads(plano_path.read_text(encoding="utf-8"))
+        self.assertEqual(plano["resumo"], {"criar": 1, "atualizar": 1, "inalterados": 1, "erros": 1})
+        self.assertEqual(plano["criar"], [{"linha": 4, "id": 3}])
+        self.assertEqual(plano["atualizar"][0]["campos"], {"tipo": {"de": "Common", "para": "Hip"}})
+        self.assertEqual(plano["inalterados"], [1])
+        self.assertEqual(Truss.objects.count(), 2)
+        self.assertEqual(Truss.objects.get(pk=2).tipo, "Common")
+
+    @skipIf(openpyxl is None, "openpyxl não instalado")
+    def test_xlsx(self):
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append(CABECALHO)
+        # Números vêm como float do Excel: 2.0 -> "2"
+        ws.append([1, "T1", "Common", 2.0, 1.5, "Rua A", 30, "pending", "J1"])
+        ws.append([None] * len(CABECALHO))
+        ws.append([2, "T2", "Hip", 3, 2, "Rua B", 12.5, "pending", "J1"])
+        path = self.pasta / "trusses.xlsx"
+        wb.save(path)
+
+        self.assertResumo(self._importar("--xlsx", str(path)), 2, 0, 0, 0)
+        t1, t2 = Truss.objects.order_by("id")
+        self.assertEqual((t1.quantidade, t1.ply), (2, Decimal("1.5")))
+        self.assertEqual((t2.tipo, t2.tamanho), ("Hip", "12.5"))
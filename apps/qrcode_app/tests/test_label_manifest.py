@@ -0,0 +1,94 @@
+import re
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from apps.qrcode_app.services.label_manifest import MANIFESTO_NOME, PAGINAS_DIR
+from apps.qrcode_app.services.labels import gerar_imagens_e_pdf
+
+INICIO = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def registro(tid, quantidade=1, numero=None, minutos=0):
+    return {
+        "id": tid,
+        "truss_number": numero or f"T{tid}",
+        "job_number": "J1",
+        "quantidade": quantidade,
+        "updated_at": INICIO + timedelta(minutes=minutos),
+    }
+
+
+class ManifestoIncrementalTests(SimpleTestCase):
+    def setUp(self):
+        self.pasta = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.pasta, ignore_errors=True)
+
+    def _gerar(self, registros, **kwargs):
+        """Gera em modo incremental; retorna (renderizados, reaproveitados, removidos)."""
+        saida = StringIO()
+        with redirect_stdout(saida):
+            gerar_imagens_e_pdf(
+                registros,
+                self.pasta,
+                Path(settings.LABEL_LOGO_PATH),
+                "https://exemplo.test/truss",
+                "Rua Exemplo, 123",
+                "(11) 0000-0000",
+                incremental=True,
+                **kwargs,
+            )
+        m = re.search(r"Incremental: (\d+) renderizados, (\d+) reaproveitados, (\d+) removidos", saida.getvalue())
+        return tuple(int(n) for n in m.groups())
+
+    def _pngs(self):
+        return sorted(p.name for p in self.pasta.glob("truss_*.png"))
+
+    def test_primeira_geracao_renderiza_tudo(self):
+        self.assertEqual(self._gerar([registro(1), registro(2, quantidade=2)]), (2, 0, 0))
+        self.assertEqual(self._pngs(), ["truss_1_1.png", "truss_2_1.png", "truss_2_2.png"])
+        self.assertTrue((self.pasta / MANIFESTO_NOME).exists())
+        self.assertTrue((self.pasta / "labels.pdf").exists())
+
+    def test_inalterados_sao_reaproveitados(self):
+        self._gerar([registro(1), registro(2)])
+        mtime = (self.pasta / "truss_1_1.png").stat().st_mtime_ns
+        self.assertEqual(self._gerar([registro(1), registro(2)]), (0, 2, 0))
+        self.assertEqual((self.pasta / "truss_1_1.png").stat().st_mtime_ns, mtime)
+        self.assertTrue((self.pasta / "labels.pdf").exists())
+
+    def test_alterado_e_renderizado_de_novo(self):
+        self._gerar([registro(1), registro(2, quantidade=3)])
+        # Só updated_at mudou: o hash dos campos confirma que a etiqueta é a mesma
+        self.assertEqual(self._gerar([registro(1, minutos=5), registro(2, quantidade=3)]), (0, 2, 0))
+        # Menos cópias: refaz e apaga os PNGs que sobraram
+        self.assertEqual(self._gerar([registro(1), registro(2, quantidade=1, minutos=10)]), (1, 1, 0))
+        self.assertEqual(self._pngs(), ["truss_1_1.png", "truss_2_1.png"])
+
+    def test_orfaos_sao_removidos(self):
+        self._gerar([registro(1), registro(2), registro(3)])
+        self.assertEqual(self._gerar([registro(1), registro(2)]), (0, 2, 1))
+        self.assertEqual(self._pngs(), ["truss_1_1.png", "truss_2_1.png"])
+        self.assertFalse((self.pasta / PAGINAS_DIR / "3.pag").exists())
+
+    def test_parcial_mantem_os_de_fora(self):
+        self._gerar([registro(1), registro(2)])
+        self.assertEqual(self._gerar([registro(2, numero="T2-B", minutos=5)], parcial=True), (1, 0, 0))
+        self.assertEqual(self._pngs(), ["truss_1_1.png", "truss_2_1.png"])
+        # E o manifesto ainda conhece o truss 1
+        self.assertEqual(self._gerar([registro(1), registro(2, numero="T2-B", minutos=5)]), (0, 2, 0))
+
+    def test_pagina_corrompida_conta_como_miss(self):
+        self._gerar([registro(1), registro(2)])
+        (self.pasta / PAGINAS_DIR / "1.pag").write_bytes(b"lixo")
+        self.assertEqual(self._gerar([registro(1), registro(2)]), (1, 1, 0))
+
+    def test_configuracao_nova_refaz_tudo(self):
+        self._gerar([registro(1), registro(2)])
+        self.assertEqual(self._gerar([registro(1), registro(2)], bilevel=True), (2, 0, 0))
@@ -0,0 +1,72 @@
+import gc
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TransactionTestCase
+from django.utils.http import http_date
+from fastapi.testclient import TestClient
+
+from apps.qrcode_app.tests.test_views import criar_truss
+
+
+class TrussApiTests(TransactionTestCase):
+    # O FastAPI atende numa thread própria, com outra conexão: os dados
+    # precisam estar commitados (TransactionTestCase, não TestCase)
+
+    def setUp(self):
+        from cornerstone.asgi import application
+
+        self.truss = criar_truss(7)
+        user = get_user_model().objects.create_user("operador", password="senha")
+        django_client = Client()
+        django_client.force_login(user)
+        self.api = TestClient(application)
+        self.api.cookies.set("sessionid", django_client.cookies["sessionid"].value)
+
+    def tearDown(self):
+        # Conexões das threads do FastAPI que já terminaram só fecham quando
+        # coletadas; abertas, impedem o DROP do banco de testes no PostgreSQL
+        gc.collect()
+
+    def test_200_com_validadores(self):
+        resp = self.api.get("/api/truss/7")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["truss_number"], "T7")
+        self.assertEqual(resp.json()["quantidade"], 2)
+        self.assertTrue(resp.headers["etag"].startswith('"7-'))
+        self.assertIn("last-modified", resp.headers)
+        self.assertIn("no-cache", resp.headers["cache-control"])
+
+    def test_304_por_etag(self):
+        etag = self.api.get("/api/truss/7").headers["etag"]
+        resp = self.api.get("/api/truss/7", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.headers["etag"], etag)
+
+        self.truss.tipo = "Hip"
+        self.truss.save()
+        resp = self.api.get("/api/truss/7", headers={"If-None-Match": etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["tipo"], "Hip")
+
+    def test_304_por_if_modified_since(self):
+        last_modified = self.api.get("/api/truss/7").headers["last-modified"]
+        resp = self.api.get("/api/truss/7", headers={"If-Modified-Since": last_modified})
+        self.assertEqual(resp.status_code, 304)
+
+        antes = http_date((self.truss.updated_at - timedelta(hours=1)).timestamp())
+        resp = self.api.get("/api/truss/7", headers={"If-Modified-Since": antes})
+        self.assertEqual(resp.status_code, 200)
+
+    def test_404(self):
+        self.assertEqual(self.api.get("/api/truss/999").status_code, 404)
+
+    def test_401_sem_sessao(self):
+        self.api.cookies.clear()
+        self.assertEqual(self.api.get("/api/truss/7").status_code, 401)
+
+    def test_401_apos_troca_de_senha(self):
+        user = get_user_model().objects.get(username="operador")
+        user.set_password("outra")
+        user.save()
+        self.assertEqual(self.api.get("/api/truss/7").status_code, 401)
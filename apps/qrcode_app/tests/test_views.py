@@ -0,0 +1,71 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+
+from apps.django_apps.accounts.models import Truss
+from apps.qrcode_app import views
+
+
+def criar_truss(tid=1, **campos):
+    dados = {"truss_number": f"T{tid}", "job_number": "J1", "tipo": "Common", "quantidade": 2}
+    dados.update(campos)
+    return Truss.objects.create(id=tid, **dados)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class EtiquetaSobDemandaTests(TestCase):
+    def setUp(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        cache_dir = override_settings(LABEL_CACHE_DIR=Path(pasta))
+        cache_dir.enable()
+        self.addCleanup(cache_dir.disable)
+        # O cache é criado por processo no primeiro acesso
+        views._cache_etiquetas = None
+        self.addCleanup(setattr, views, "_cache_etiquetas", None)
+
+        self.user = get_user_model().objects.create_user("operador", password="senha")
+        self.client.force_login(self.user)
+        self.truss = criar_truss()
+
+    def test_png(self):
+        resp = self.client.get("/truss/1/label.png")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "image/png")
+        self.assertTrue(resp.content.startswith(b"\x89PNG"))
+        self.assertIn("no-cache", resp["Cache-Control"])
+
+    def test_pdf(self):
+        resp = self.client.get("/truss/1/label.pdf")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "application/pdf")
+        self.assertTrue(resp.content.startswith(b"%PDF"))
+
+    def test_etag_304_e_nova_versao(self):
+        etag = self.client.get("/truss/1/label.png")["ETag"]
+        resp = self.client.get("/truss/1/label.png", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp["ETag"], etag)
+
+        self.truss.truss_number = "T1-B"
+        self.truss.save()
+        resp = self.client.get("/truss/1/label.png", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+
+    def test_cache_em_disco(self):
+        self.client.get("/truss/1/label.png")
+        self.client.get("/truss/1/label.png")
+        stats = views._cache().stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits_memoria"], 1)
+
+    def test_404(self):
+        self.assertEqual(self.client.get("/truss/999/label.png").status_code, 404)
+
+    def test_login_obrigatorio(self):
+        resp = Client().get("/truss/1/label.png")
+        self.assertEqual(resp.status_code, 302)
@@ -2,6 +2,8 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
-    # Página acessada ao escanear o QR
-    path("truss/<int:truss_id>/", views.truss_detail_page, name="truss_detail"),
-]
\ No newline at end of file
+    # A página acessada ao escanear o QR (/truss/<id>/) fica em accounts.urls
+    # Reimpressão de uma etiqueta, renderizada sob demanda (com cache)
+    path("truss/<int:truss_id>/label.png", views.truss_label, {"formato": "png"}, name="truss_label_png"),
+    path("truss/<int:truss_id>/label.pdf", views.truss_label, {"formato": "pdf"}, name="truss_label_pdf"),
+]
@@ -1,5 +1,63 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_safe
 
-def truss_detail_page(request, truss_id: int):
-    # O template carrega os dados via JS a partir de /static/truss-data/<id>.json
-    return render(request, "accounts/truss_detail.html", {"truss_id": truss_id})
\ No newline at end of file
+from apps.django_apps.accounts.models import Truss
+from apps.qrcode_app.services.label_cache import CacheEtiquetas
+from apps.qrcode_app.services.labels import chave_etiqueta_unica, gerar_etiqueta_unica
+
+CONTENT_TYPES = {"png": "image/png", "pdf": "application/pdf"}
+
+_cache_etiquetas = None
+
+
+def _cache() -> CacheEtiquetas:
+    # Um por processo, criado no primeiro acesso (o índice do disco é lido uma vez)
+    global _cache_etiquetas
+    if _cache_etiquetas is None:
+        _cache_etiquetas = CacheEtiquetas(
+            settings.LABEL_CACHE_DIR,
+            settings.LABEL_CACHE_DISK_BYTES,
+            settings.LABEL_CACHE_MEMORY_BYTES,
+        )
+    return _cache_etiquetas
+
+
+@require_safe
+@login_required
+def truss_label(request, truss_id: int, formato: str):
+    reg = (
+        Truss.objects.filter(pk=truss_id)
+        .values("id", "truss_number", "job_number", "quantidade", "updated_at")
+        .first()
+    )
+    if reg is None:
+        raise Http404("Truss não encontrado")
+
+    render_args = (
+        settings.LABEL_LOGO_PATH,
+        settings.WEB_BASE_URL,
+        settings.LABEL_EMPRESA_ENDERECO,
+        settings.LABEL_EMPRESA_TEL,
+    )
+    chave = chave_etiqueta_unica(reg, formato, *render_args, bilevel=settings.LABEL_BILEVEL)
+    etag = f'"{chave[:32]}"'
+
+    # Revalidação: só o SELECT acima, sem render nem leitura do cache
+    if_none_match = request.headers.get("If-None-Match", "")
+    if etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*":
+        resp = HttpResponseNotModified()
+    else:
+        dados = _cache().obter(
+            f"{chave}.{formato}",
+            lambda destino: gerar_etiqueta_unica(
+                reg, destino, formato, *render_args, bilevel=settings.LABEL_BILEVEL
+            ),
+        )
+        resp = HttpResponse(dados, content_type=CONTENT_TYPES[formato])
+        resp["Content-Disposition"] = f'inline; filename="truss_{truss_id}.{formato}"'
+    resp["ETag"] = etag
+    patch_cache_control(resp, private=True, no_cache=True)
+    return resp
@@ -8,6 +8,9 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cornerstone.settings")
 
 django_app = get_asgi_application()
 
+# Depois do setup do Django (os routers usam o ORM)
+from apps.fastapi_app.routers import label_jobs, trusses  # noqa: E402
+
 api = FastAPI(
     title="Cornerstone API",
     version="0.1.0",
@@ -24,6 +27,9 @@ def ping():
 def health():
     return JSONResponse({"status": "ok"})
 
+api.include_router(label_jobs)
+api.include_router(trusses)
+
 api.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],   # Ajuste em produção
@@ -119,6 +119,20 @@ else:
         }
     }
 
+# --------------------------
+# Cache
+# --------------------------
+# Com REDIS_URL, cache compartilhado entre processos (workers do gunicorn,
+# import_trusses, label_worker) e o JSON de /api/truss/<id> passa a ser
+# cacheado; quem grava invalida. Sem Redis fica o LocMemCache (padrão do
+# Django), usado só pelo fragment cache da página de detalhe, cuja chave
+# inclui updated_at e por isso nunca fica velha.
+REDIS_URL = os.environ.get("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL}
+    }
+
 # --------------------------
 # Senhas
 # --------------------------
@@ -167,6 +181,27 @@ if DEBUG:
 else:
     STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
+# --------------------------
+# Etiquetas sob demanda (/truss/<id>/label.png|pdf)
+# --------------------------
+WEB_BASE_URL = os.getenv("WEB_BASE_URL", "https://cornerstone-app.onrender.com/truss")
+LABEL_LOGO_PATH = Path(os.getenv(
+    "LABEL_LOGO_PATH", BASE_DIR / "apps/django_apps/accounts/static/accounts/cornerstone_logo.png"
+))
+LABEL_EMPRESA_ENDERECO = os.getenv("LABEL_EMPRESA_ENDERECO", "Rua Exemplo, 123 - Cidade/UF")
+LABEL_EMPRESA_TEL = os.getenv("LABEL_EMPRESA_TEL", "(11) 99999-8888")
+LABEL_BILEVEL = env_bool("LABEL_BILEVEL", False)
+LABEL_CACHE_DIR = Path(os.getenv("LABEL_CACHE_DIR", BASE_DIR / ".label_cache"))
+LABEL_CACHE_DISK_BYTES = int(os.getenv("LABEL_CACHE_DISK_BYTES", 512 * 1024 * 1024))
+LABEL_CACHE_MEMORY_BYTES = int(os.getenv("LABEL_CACHE_MEMORY_BYTES", 32 * 1024 * 1024))
+# Saída dos jobs da fila (API /api/label-jobs + manage.py label_worker)
+LABEL_JOBS_DIR = Path(os.getenv("LABEL_JOBS_DIR", BASE_DIR / ".label_jobs"))
+# Cache do GET /api/truss/<id> (só com REDIS_URL; o save() invalida na hora).
+# 0 desliga: ETag/304 saem de uma leitura de updated_at pela PK
+TRUSS_API_CACHE_SECONDS = int(os.getenv("TRUSS_API_CACHE_SECONDS", 60 if REDIS_URL else 0))
+# Fragment cache do HTML de /truss/<id>/ (chave inclui updated_at)
+TRUSS_DETAIL_CACHE_SECONDS = int(os.getenv("TRUSS_DETAIL_CACHE_SECONDS", 3600))
+
 # --------------------------
 # Segurança extra / proxy
 # --------------------------